@@ -0,0 +1,48 @@
+"""
+Catalog module - One filter language over interchangeable catalog backends.
+
+CATALOG_BACKEND selects the implementation: memory (default), sqlite, postgres.
+"""
+
+import os
+import threading
+
+from .base import CatalogBackend, normalize_filters
+from .memory import MemoryCatalog
+
+BACKENDS = ("memory", "sqlite", "postgres")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def create_backend(name: str, **kwargs) -> CatalogBackend:
+    name = (name or "memory").lower()
+    if name == "memory":
+        return MemoryCatalog(**kwargs)
+    if name == "sqlite":
+        from .sqlite import SQLiteCatalog
+        return SQLiteCatalog(**kwargs)
+    if name == "postgres":
+        from .postgres import PostgresCatalog
+        return PostgresCatalog(**kwargs)
+    raise ValueError(f"Unknown catalog backend '{name}' (expected one of {', '.join(BACKENDS)})")
+
+
+def get_backend(name: str = None) -> CatalogBackend:
+    """Shared backend instance, chosen by name or the CATALOG_BACKEND env var."""
+    name = (name or os.getenv("CATALOG_BACKEND", "memory")).lower()
+    if name not in _backends:
+        with _backends_lock:
+            if name not in _backends:
+                _backends[name] = create_backend(name)
+    return _backends[name]
+
+
+__all__ = [
+    'CatalogBackend',
+    'MemoryCatalog',
+    'normalize_filters',
+    'create_backend',
+    'get_backend',
+]
@@ -0,0 +1,212 @@
+"""
+Catalog Backend - Shared filter language for every catalog implementation.
+
+Filters follow local_query.query semantics:
+- gender: exact match, unisex items always included
+- brand: compared as a brand key (lowercase, "-" and " " -> "_")
+- category, style: case-insensitive equality
+- colors: any filter color is a substring of an item color or vice versa
+- price_min / price_max: inclusive bounds (ignored when 0 / empty)
+- text: every word is a prefix of a word in brand, category, style or colors
+- color_near / color_tolerance: ΔE distance to a color (applied in Python)
+
+Results are always ordered by item id, so backends can be compared row for row.
+Pages use id cursors, which stay valid across catalog reloads.
+"""
+
+import base64
+import json
+import re
+import time
+from typing import Dict, Iterator, List, Optional
+
+from local.local_index import FACET_FIELDS, INDEXED_FIELDS, field_value
+from local.local_query import DEFAULT_COLOR_TOLERANCE, color_near_filter
+from local.local_store import brand_key
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+class InvalidCursor(ValueError):
+    """Cursor is not one returned by page()."""
+
+
+def text_terms(text: str) -> List[str]:
+    """Search words as the FTS5 unicode61 tokenizer splits them."""
+    return WORD_RE.findall((text or "").lower())
+
+
+def normalize_filters(filters: Optional[Dict]) -> Dict:
+    """
+    Canonical form of a filter dict: only active filters, values lowercased and
+    typed. Every backend builds its query from this, never from raw filters.
+    """
+    filters = filters or {}
+    normalized = {}
+
+    if filters.get("gender"):
+        normalized["gender"] = filters["gender"].lower()
+
+    if filters.get("brand"):
+        normalized["brand"] = brand_key(filters["brand"])
+
+    for field in ("category", "style"):
+        if filters.get(field):
+            normalized[field] = filters[field].lower()
+
+    if filters.get("colors"):
+        colors = filters["colors"]
+        if isinstance(colors, str):
+            colors = [colors]
+        normalized["colors"] = [c.lower() for c in colors]
+
+    if filters.get("price_min"):
+        normalized["price_min"] = float(filters["price_min"])
+
+    if filters.get("price_max"):
+        normalized["price_max"] = float(filters["price_max"])
+
+    if filters.get("text"):
+        terms = text_terms(filters["text"])
+        if terms:
+            normalized["text"] = terms
+
+    if filters.get("color_near"):
+        normalized["color_near"] = filters["color_near"]
+        normalized["color_tolerance"] = float(filters.get("color_tolerance") or DEFAULT_COLOR_TOLERANCE)
+        # Fail on an unknown color here, not halfway through a streamed response
+        color_near_filter(normalized)
+
+    return normalized
+
+
+def item_words(item: Dict) -> List[str]:
+    """Words the text filter searches (same fields as the SQLite FTS table)."""
+    colors = item.get("colors", [])
+    if isinstance(colors, str):
+        colors = [colors]
+    fields = [item.get("brand"), item.get("category"), item.get("style")] + list(colors)
+    return text_terms(" ".join(str(f) for f in fields if f))
+
+
+def matches_text(words: List[str], terms: List[str]) -> bool:
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def sort_key(item: Dict):
+    return str(item.get("id", ""))
+
+
+def encode_cursor(item_id: str) -> str:
+    raw = json.dumps({"id": item_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Id of the last item on the previous page (None for the first page)."""
+    if not cursor:
+        return None
+    try:
+        return str(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["id"])
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+
+
+def facet_counts(items: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """Facet counts with the same value normalization as CatalogIndex."""
+    facets: Dict[str, Dict[str, int]] = {field: {} for field in FACET_FIELDS}
+    for item in items:
+        for field in INDEXED_FIELDS:
+            value = field_value(item, field)
+            facets[field][value] = facets[field].get(value, 0) + 1
+        colors = item.get("colors", [])
+        if isinstance(colors, str):
+            colors = [colors]
+        for color in {c.lower() for c in colors}:
+            facets["colors"][color] = facets["colors"].get(color, 0) + 1
+    return facets
+
+
+class CatalogBackend:
+    """
+    Interface shared by the memory, SQLite and Postgres catalogs.
+    query() returns item dicts ordered by id, after the `after` id when given;
+    count() returns the match count. Paging, facets and the full-catalog
+    snapshot are built on those two unless a backend has something faster.
+    """
+
+    name = "base"
+
+    # Seconds all_items() reuses its snapshot when version() can't tell changes
+    SNAPSHOT_TTL = 60.0
+
+    def load(self, items: List[Dict]) -> int:
+        """Replace the catalog with items. Returns the number of items stored."""
+        raise NotImplementedError
+
+    def query(self, filters: Optional[Dict] = None, limit: Optional[int] = None,
+              after: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        return len(self.query(filters))
+
+    def ids(self, filters: Optional[Dict] = None) -> List[str]:
+        return [item["id"] for item in self.query(filters)]
+
+    def version(self):
+        """Value that changes whenever the catalog does (None: unknown, use SNAPSHOT_TTL)."""
+        return None
+
+    # -------------------------------------------------------------------------
+    # Browsing
+    # -------------------------------------------------------------------------
+
+    def page(self, filters: Optional[Dict] = None, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        items = self.query(filters, limit=limit + 1, after=decode_cursor(cursor))
+        has_more = len(items) > limit
+        items = items[:limit]
+
+        return {
+            "items": items,
+            "count": len(items),
+            "total": self.count(filters),
+            "next_cursor": encode_cursor(sort_key(items[-1])) if items and has_more else None,
+        }
+
+    def iter_from(self, filters: Optional[Dict] = None, cursor: Optional[str] = None) -> Iterator[Dict]:
+        """Every match after the cursor, in id order."""
+        yield from self.query(filters, after=decode_cursor(cursor))
+
+    def stats(self, filters: Optional[Dict] = None) -> Dict:
+        """Totals and facet counts (gender, brand, category, style, colors) of the matches."""
+        items = self.query(filters)
+        return {"total": len(items), "facets": facet_counts(items)}
+
+    # -------------------------------------------------------------------------
+    # Whole catalog (outfit pipeline)
+    # -------------------------------------------------------------------------
+
+    def _current_snapshot(self):
+        version = self.version()
+        if version is None:
+            version = int(time.monotonic() // self.SNAPSHOT_TTL)
+
+        snapshot = getattr(self, "_snapshot", None)
+        if snapshot is None or snapshot[0] != version:
+            items = self.query()
+            snapshot = self._snapshot = (version, items, {sort_key(item): item for item in items})
+        return snapshot
+
+    def all_items(self) -> List[Dict]:
+        """
+        Every item, as the same list object until the catalog changes, so
+        callers can key their derived structures on it (BrandSampler, dedup).
+        """
+        return self._current_snapshot()[1]
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        return self._current_snapshot()[2].get(str(item_id))
+
+    def close(self):
+        pass
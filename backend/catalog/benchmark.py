@@ -0,0 +1,118 @@
+"""
+Benchmark the catalog backends on the same workload.
+
+Loads the JSON catalog (optionally replicated to --items rows with fresh ids)
+into each backend, checks that every workload returns the same ids as
+local_query.query, then prints median latency per workload and backend.
+
+Run from backend/:
+    python -m catalog.benchmark [--items 100000] [--runs 20] [--postgres]
+
+The Postgres backend reads the clothes table as-is (load it with
+python -m database.dbwrite first); it is only checked against the JSON catalog
+when --items is not used.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from local.local_query import query as local_query
+from local.local_store import load_all_items
+from .base import normalize_filters, sort_key
+from .memory import MemoryCatalog
+from .sqlite import SQLiteCatalog
+
+WORKLOADS = [
+    {},
+    {"gender": "man"},
+    {"gender": "man", "style": "casual"},
+    {"gender": "woman", "category": "jacket", "style": "smart"},
+    {"brand": "massimo-dutti"},
+    {"colors": "blue"},
+    {"colors": ["black", "navy"], "gender": "man"},
+    {"gender": "woman", "price_max": 60},
+    {"price_min": 30, "price_max": 80, "style": "casual"},
+    {"text": "zara shirt"},
+    {"text": "bl", "gender": "man"},
+]
+
+
+def replicate(items, size):
+    """size items cycled from the catalog, with unique ids."""
+    if not items or size <= len(items):
+        return items[:size] if size else items
+    out = []
+    for n in range(size):
+        item = dict(items[n % len(items)])
+        item["id"] = f"{item['id']}__{n // len(items)}"
+        out.append(item)
+    return out
+
+
+def reference_ids(items, filters):
+    """Expected result: local_query semantics, plus the shared text filter, ordered by id."""
+    backend = MemoryCatalog(items)
+    if "text" not in normalize_filters(filters):
+        return [i["id"] for i in sorted(local_query(items, filters), key=sort_key)]
+    return backend.ids(filters)
+
+
+def time_backend(backend, runs):
+    results = {}
+    for filters in WORKLOADS:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            rows = backend.query(filters)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[str(filters)] = (statistics.median(timings), [r["id"] for r in rows])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=0, help="replicate the catalog to this many items")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--postgres", action="store_true", help="also benchmark the Postgres backend")
+    args = parser.parse_args()
+
+    items = replicate(load_all_items(), args.items)
+    print(f"Catalog: {len(items)} items")
+
+    backends = [MemoryCatalog(items)]
+
+    tmp = tempfile.TemporaryDirectory()
+    sqlite_backend = SQLiteCatalog(Path(tmp.name) / "catalog.sqlite3", auto_sync=False)
+    start = time.perf_counter()
+    sqlite_backend.load(items)
+    print(f"SQLite load: {time.perf_counter() - start:.2f}s (FTS5: {sqlite_backend.fts})")
+    backends.append(sqlite_backend)
+
+    if args.postgres:
+        from .postgres import PostgresCatalog
+        backends.append(PostgresCatalog())
+
+    expected = {str(f): reference_ids(items, f) for f in WORKLOADS}
+    timings = {}
+    for backend in backends:
+        timings[backend.name] = time_backend(backend, args.runs)
+
+    names = [b.name for b in backends]
+    print(f"\n{'workload':60s}" + "".join(f"{n:>12s}" for n in names) + "   rows  same")
+    for filters in WORKLOADS:
+        key = str(filters)
+        cells = "".join(f"{timings[n][key][0]:10.2f}ms" for n in names)
+        # Postgres holds its own copy of the catalog; only compare it on the real one
+        compared = [n for n in names if n != "postgres" or not args.items]
+        same = all(timings[n][key][1] == expected[key] for n in compared)
+        print(f"{key:60s}{cells} {len(expected[key]):6d}  {'yes' if same else 'NO'}")
+
+    sqlite_backend.close()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Memory Catalog - Backend over the in-memory CatalogIndex.
+
+Structured filters are answered from the index postings; the text filter is
+applied as a residual over the matched items. Without its own items the
+backend follows the shared index, so all_items() is load_all_items() itself.
+
+The id-ordered matches of a filter combination are cached per index, so a page
+is a bisect and a slice; total comes from the same match list.
+"""
+
+import json
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from local.local_index import CatalogIndex, get_index
+from local.local_store import get_item_by_id, unique_ids
+from .base import (CatalogBackend, decode_cursor, encode_cursor, item_words, matches_text,
+                   normalize_filters, sort_key)
+
+# Id-ordered match lists kept per index (dropped with the index on reload)
+MAX_CACHED_MATCHES = 256
+
+
+class MemoryCatalog(CatalogBackend):
+
+    name = "memory"
+
+    def __init__(self, items: Optional[List[Dict]] = None):
+        # Without items the backend follows the shared index (and its reloads)
+        self._index = CatalogIndex(list(unique_ids(items)), 0) if items is not None else None
+        # Text-search words per position and id-ordered matches, dropped when the index changes
+        self._words: Dict[int, List[str]] = {}
+        self._matches: Dict[str, Tuple[List[Dict], List[str]]] = {}
+        self._cached_for = None
+
+    @property
+    def index(self) -> CatalogIndex:
+        index = self._index or get_index()
+        if index is not self._cached_for:
+            self._words, self._matches, self._cached_for = {}, {}, index
+        return index
+
+    def load(self, items: List[Dict]) -> int:
+        self._index = CatalogIndex(list(unique_ids(items)), 0)
+        return len(self._index.items)
+
+    def _positions(self, normalized: Dict) -> List[int]:
+        index = self.index
+        positions = index.match_positions(normalized)
+
+        terms = normalized.get("text")
+        if terms:
+            kept = []
+            for pos in positions:
+                words = self._words.get(pos)
+                if words is None:
+                    words = self._words[pos] = item_words(index.items[pos])
+                if matches_text(words, terms):
+                    kept.append(pos)
+            positions = kept
+
+        return positions
+
+    def _ordered(self, filters: Optional[Dict]) -> Tuple[List[Dict], List[str]]:
+        """Matching items in id order and their ids (ids are unique, see unique_ids)."""
+        index = self.index
+        normalized = normalize_filters(filters)
+        key = json.dumps(normalized, sort_keys=True)
+        cached = self._matches.get(key)
+        if cached is None:
+            items = [index.items[p] for p in index.by_id(self._positions(normalized))]
+            cached = (items, [sort_key(item) for item in items])
+            if len(self._matches) >= MAX_CACHED_MATCHES:
+                self._matches.clear()
+            self._matches[key] = cached
+        return cached
+
+    def query(self, filters: Optional[Dict] = None, limit: Optional[int] = None,
+              after: Optional[str] = None) -> List[Dict]:
+        items, ids = self._ordered(filters)
+        start = bisect_right(ids, after) if after is not None else 0
+        return items[start:start + limit] if limit is not None else items[start:]
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        return len(self._ordered(filters)[0])
+
+    def page(self, filters: Optional[Dict] = None, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        items, ids = self._ordered(filters)
+        after = decode_cursor(cursor)
+        start = bisect_right(ids, after) if after is not None else 0
+        chunk = items[start:start + limit]
+        has_more = start + limit < len(items)
+
+        return {
+            "items": chunk,
+            "count": len(chunk),
+            "total": len(items),
+            "next_cursor": encode_cursor(ids[start + len(chunk) - 1]) if chunk and has_more else None,
+        }
+
+    def version(self):
+        return self.index.version if self._index is None else id(self._index)
+
+    def stats(self, filters: Optional[Dict] = None) -> Dict:
+        normalized = normalize_filters(filters)
+        if "text" in normalized:
+            return super().stats(filters)
+        # Precomputed / cached facets of the index
+        return self.index.stats(normalized)
+
+    def all_items(self) -> List[Dict]:
+        return self.index.items
+
+    def get_item(self, item_id: str) -> Optional[Dict]:
+        if self._index is None:
+            return get_item_by_id(item_id)
+        return super().get_item(item_id)
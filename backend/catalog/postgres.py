@@ -0,0 +1,122 @@
+"""
+Postgres Catalog - Backend on the clothes table through the read pool.
+
+The SQL reproduces local_query semantics (unisex fallback, brand keys,
+substring colors, price bounds) instead of queryfactory's exact matching, and
+orders by id in byte order so results line up with the other backends.
+color_near is applied in Python to the rows the SQL filters return.
+"""
+
+from typing import Dict, List, Optional
+
+from local.local_query import color_near_filter
+from .base import CatalogBackend, normalize_filters
+
+COLUMNS = ["id", "brand", "category", "gender", "url", "colors", "style", "price_eur"]
+
+TEXT_DOCUMENT = "concat_ws(' ', brand, category, style, array_to_string(colors, ' '))"
+
+
+def build_where(normalized: Dict):
+    conditions = []
+    parameters = []
+
+    if "gender" in normalized:
+        conditions.append("lower(gender) IN (%s, 'unisex')")
+        parameters.append(normalized["gender"])
+
+    if "brand" in normalized:
+        conditions.append("replace(replace(lower(brand), '-', '_'), ' ', '_') = %s")
+        parameters.append(normalized["brand"])
+
+    for field in ("category", "style"):
+        if field in normalized:
+            conditions.append(f"lower({field}) = %s")
+            parameters.append(normalized[field])
+
+    if "colors" in normalized:
+        conditions.append(
+            "EXISTS (SELECT 1 FROM unnest(colors) AS c, unnest(%s::text[]) AS f "
+            "WHERE strpos(lower(c), f) > 0 OR strpos(f, lower(c)) > 0)"
+        )
+        parameters.append(normalized["colors"])
+
+    if "price_min" in normalized:
+        conditions.append("price_eur >= %s")
+        parameters.append(normalized["price_min"])
+
+    if "price_max" in normalized:
+        conditions.append("price_eur <= %s")
+        parameters.append(normalized["price_max"])
+
+    # Word-prefix match, like the FTS5 "term"* queries of the SQLite backend
+    for term in normalized.get("text", []):
+        conditions.append(f"{TEXT_DOCUMENT} ~* %s")
+        parameters.append(f"(^|[^[:alnum:]]){term}")
+
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return where, parameters
+
+
+def _to_item(columns, row) -> Dict:
+    item = dict(zip(columns, row))
+    if item.get("price_eur") is not None:
+        item["price_eur"] = float(item["price_eur"])
+    item["colors"] = list(item.get("colors") or [])
+    return item
+
+
+class PostgresCatalog(CatalogBackend):
+
+    name = "postgres"
+
+    def load(self, items: List[Dict]) -> int:
+        """Bulk upsert items (dbwrite.bulk_upload), then delete rows whose id isn't among them."""
+        from database import dbcache, dbpool, dbwrite
+
+        with dbpool.connection() as (conn, cur):
+            result = dbwrite.bulk_upload(conn, cur, items=items)
+            ids = [str(item["id"]) for item in items if item.get("id")]
+            cur.execute("DELETE FROM clothes WHERE NOT (id = ANY(%s))", (ids,))
+            conn.commit()
+        dbcache.invalidate()
+        return result["total"]
+
+    def query(self, filters: Optional[Dict] = None, limit: Optional[int] = None,
+              after: Optional[str] = None) -> List[Dict]:
+        from database import dbpool
+
+        normalized = normalize_filters(filters)
+        where, parameters = build_where(normalized)
+        if after is not None:
+            where += ' AND id COLLATE "C" > %s' if where else ' WHERE id COLLATE "C" > %s'
+            parameters.append(after)
+
+        near = color_near_filter(normalized)
+        sql = f'SELECT {", ".join(COLUMNS)} FROM clothes{where} ORDER BY id COLLATE "C"'
+        if limit is not None and near is None:
+            sql += " LIMIT %s"
+            parameters.append(limit)
+
+        with dbpool.connection() as (conn, cur):
+            cur.execute(sql, parameters)
+            columns = [col[0] for col in cur.description]
+            items = [_to_item(columns, row) for row in cur.fetchall()]
+
+        if near is not None:
+            items = [item for item in items if near(item)]
+            if limit is not None:
+                items = items[:limit]
+        return items
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        from database import dbpool
+
+        normalized = normalize_filters(filters)
+        if "color_near" in normalized:
+            return len(self.query(filters))
+
+        where, parameters = build_where(normalized)
+        with dbpool.connection() as (conn, cur):
+            cur.execute(f"SELECT count(*) FROM clothes{where}", parameters)
+            return cur.fetchone()[0]
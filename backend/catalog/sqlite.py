@@ -0,0 +1,288 @@
+"""
+SQLite Catalog - Backend on a stdlib sqlite3 database file.
+
+Filter columns are stored pre-normalized (lowercase, brand key) and indexed;
+colors live in their own table so color filters are index lookups after the
+substring match is resolved against the (small) color vocabulary. Text search
+uses an FTS5 table when the SQLite build has it, a Python residual otherwise.
+
+With auto_sync, every query stats the brand files (and the dominant colors
+sidecar) and rebuilds the file first if any of them changed. The rebuild reads
+the JSON directly and leaves the shared load_all_items cache alone.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from local.local_query import color_near_filter
+from local.local_store import (DOMINANT_COLORS_FILE, brand_key, get_haine_folder, iter_items,
+                               list_catalog_files, unique_ids)
+from .base import CatalogBackend, item_words, matches_text, normalize_filters
+
+SCHEMA = """
+    DROP TABLE IF EXISTS items;
+    DROP TABLE IF EXISTS item_colors;
+    DROP TABLE IF EXISTS items_fts;
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+
+    CREATE TABLE items (
+        pos       INTEGER PRIMARY KEY,
+        id        TEXT NOT NULL,
+        gender    TEXT,
+        brand     TEXT,
+        category  TEXT,
+        style     TEXT,
+        price     REAL,
+        data      TEXT NOT NULL
+    );
+    CREATE TABLE item_colors (
+        color  TEXT NOT NULL,
+        pos    INTEGER NOT NULL,
+        PRIMARY KEY (color, pos)
+    ) WITHOUT ROWID;
+"""
+
+INDEXES = """
+    CREATE INDEX items_gender_category_style_idx ON items (gender, category, style);
+    CREATE INDEX items_brand_idx ON items (brand);
+    CREATE INDEX items_style_idx ON items (style);
+    CREATE INDEX items_id_idx ON items (id, pos);
+"""
+
+FTS_TABLE = "CREATE VIRTUAL TABLE items_fts USING fts5(words, content='', tokenize='unicode61 remove_diacritics 0')"
+
+
+def get_default_path() -> Path:
+    return Path(os.getenv("CATALOG_SQLITE_PATH", str(get_haine_folder() / "_index" / "catalog.sqlite3")))
+
+
+def catalog_signature() -> str:
+    """Changes whenever a brand JSON file or the dominant colors sidecar is added, removed or modified."""
+    digest = hashlib.sha1()
+    paths = list_catalog_files() + [get_haine_folder() / DOMINANT_COLORS_FILE]
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path}|{stat.st_mtime_ns}|{stat.st_size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _row(pos: int, item: Dict):
+    try:
+        price = float(item.get("price_eur", 0))
+    except (TypeError, ValueError):
+        price = 0.0
+
+    return (
+        pos,
+        str(item["id"]),
+        str(item.get("gender", "") or "").lower(),
+        brand_key(str(item.get("brand", "") or "")),
+        str(item.get("category", "") or "").lower(),
+        str(item.get("style", "") or "").lower(),
+        price,
+        json.dumps(item, ensure_ascii=False),
+    )
+
+
+def _item_colors(item: Dict) -> List[str]:
+    colors = item.get("colors", [])
+    if isinstance(colors, str):
+        colors = [colors]
+    return sorted({c.lower() for c in colors})
+
+
+class SQLiteCatalog(CatalogBackend):
+
+    name = "sqlite"
+
+    def __init__(self, path=None, auto_sync: bool = True):
+        """
+        path: database file (":memory:" for a throwaway catalog).
+        auto_sync: rebuild from the JSON catalog when it changed since the last load.
+        """
+        self.path = str(path or get_default_path())
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.auto_sync = auto_sync
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._color_vocabulary: Optional[List[str]] = None
+        self.signature = self._meta("signature")
+        self.fts = self._meta("fts") == "1"
+
+    # -------------------------------------------------------------------------
+    # Loading
+    # -------------------------------------------------------------------------
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, items: List[Dict], signature: str = "") -> int:
+        with self._lock:
+            conn = self._conn
+            conn.executescript(SCHEMA)
+
+            try:
+                conn.execute(FTS_TABLE)
+                fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: text filter falls back to Python
+                fts = False
+
+            items = list(unique_ids(item for item in items if item.get("id") is not None))
+            conn.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (_row(pos, item) for pos, item in enumerate(items)))
+            conn.executemany("INSERT INTO item_colors VALUES (?, ?)",
+                             ((color, pos) for pos, item in enumerate(items) for color in _item_colors(item)))
+            if fts:
+                conn.executemany("INSERT INTO items_fts (rowid, words) VALUES (?, ?)",
+                                 ((pos, " ".join(item_words(item))) for pos, item in enumerate(items)))
+
+            conn.executescript(INDEXES)
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [("signature", signature), ("fts", "1" if fts else "0")])
+            conn.commit()
+            conn.execute("ANALYZE")
+
+            self.fts = fts
+            self._color_vocabulary = None
+            self.signature = signature
+
+        return len(items)
+
+    def sync(self, force: bool = False) -> bool:
+        """Rebuild from the JSON catalog if it changed. Returns True if rebuilt."""
+        signature = catalog_signature()
+        if not force and self.signature == signature:
+            return False
+        with self._sync_lock:
+            # Another thread may have rebuilt while this one waited
+            if not force and self.signature == signature:
+                return False
+            # Straight from the files: load_all_items(force_reload) would drop the
+            # in-memory catalog and its index under the other backends and /items
+            self.load(iter_items(), signature)
+        return True
+
+    def _ensure_synced(self):
+        # A stat per brand file: cheap next to the query itself
+        if self.auto_sync:
+            self.sync()
+
+    def version(self):
+        self._ensure_synced()
+        return self.signature
+
+    # -------------------------------------------------------------------------
+    # Querying
+    # -------------------------------------------------------------------------
+
+    def _colors_matching(self, filter_colors: List[str]) -> List[str]:
+        if self._color_vocabulary is None:
+            self._color_vocabulary = [row[0] for row in self._conn.execute("SELECT DISTINCT color FROM item_colors")]
+        return [
+            color for color in self._color_vocabulary
+            if any(fc in color or color in fc for fc in filter_colors)
+        ]
+
+    def _where(self, normalized: Dict):
+        """WHERE clause and parameters, or None when nothing can match."""
+        conditions = []
+        parameters = []
+
+        if "gender" in normalized:
+            conditions.append("gender IN (?, 'unisex')")
+            parameters.append(normalized["gender"])
+
+        for field in ("brand", "category", "style"):
+            if field in normalized:
+                conditions.append(f"{field} = ?")
+                parameters.append(normalized[field])
+
+        if "colors" in normalized:
+            colors = self._colors_matching(normalized["colors"])
+            if not colors:
+                return None
+            conditions.append(f"pos IN (SELECT pos FROM item_colors WHERE color IN ({', '.join('?' * len(colors))}))")
+            parameters.extend(colors)
+
+        if "price_min" in normalized:
+            conditions.append("price >= ?")
+            parameters.append(normalized["price_min"])
+
+        if "price_max" in normalized:
+            conditions.append("price <= ?")
+            parameters.append(normalized["price_max"])
+
+        if "text" in normalized and self.fts:
+            conditions.append("pos IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+            # Terms are plain words (see base.text_terms), safe to quote as-is
+            parameters.append(" AND ".join(f'"{term}"*' for term in normalized["text"]))
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, parameters
+
+    def _residual(self, normalized: Dict) -> bool:
+        return ("text" in normalized and not self.fts) or "color_near" in normalized
+
+    def query(self, filters: Optional[Dict] = None, limit: Optional[int] = None,
+              after: Optional[str] = None) -> List[Dict]:
+        self._ensure_synced()
+        normalized = normalize_filters(filters)
+
+        with self._lock:
+            clause = self._where(normalized)
+            if clause is None:
+                return []
+            where, parameters = clause
+
+            if after is not None:
+                where += " AND id > ?" if where else " WHERE id > ?"
+                parameters = parameters + [after]
+
+            sql = f"SELECT data FROM items{where} ORDER BY id, pos"
+            residual = self._residual(normalized)
+            if limit is not None and not residual:
+                sql += " LIMIT ?"
+                parameters = parameters + [limit]
+            rows = self._conn.execute(sql, parameters).fetchall()
+
+        items = [json.loads(row[0]) for row in rows]
+        if residual:
+            if "text" in normalized and not self.fts:
+                items = [item for item in items if matches_text(item_words(item), normalized["text"])]
+            near = color_near_filter(normalized)
+            if near is not None:
+                items = [item for item in items if near(item)]
+            if limit is not None:
+                items = items[:limit]
+        return items
+
+    def count(self, filters: Optional[Dict] = None) -> int:
+        normalized = normalize_filters(filters)
+        if self._residual(normalized):
+            return len(self.query(filters))
+
+        self._ensure_synced()
+        with self._lock:
+            clause = self._where(normalized)
+            if clause is None:
+                return 0
+            where, parameters = clause
+            return self._conn.execute(f"SELECT count(*) FROM items{where}", parameters).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
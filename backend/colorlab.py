@@ -0,0 +1,191 @@
+"""
+Color Lab - Catalog color names, hex values and item colors in CIE Lab.
+
+Shared by the catalog filters (local_query color_near), the outfit scoring
+(processor.colorharmony) and prompt canonicalization; depends on nothing else
+in the backend.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+Lab = Tuple[float, float, float]
+
+# Base hue words found in the brand catalogs (tokens of names like "dark_khaki")
+COLOR_HEX = {
+    "black": "#111111", "balck": "#111111", "anthracite": "#383E42", "charcoal": "#36454F",
+    "graphite": "#383428", "grey": "#8C8C8C", "gray": "#8C8C8C", "rey": "#8C8C8C",
+    "silver": "#C0C0C0", "ash": "#B2BEB5", "stone": "#A79F91", "pebble": "#B8B09E",
+    "white": "#F5F5F5", "chalk": "#EDEAE0", "ecru": "#E8E0CC", "ivory": "#FFFFF0",
+    "cream": "#FFFDD0", "vanilla": "#F3E5AB", "oyster": "#DDD6C7", "pearl": "#EAE0C8",
+    "beige": "#D8C8A8", "sand": "#C2B280", "mink": "#8A7968", "camel": "#C19A6B",
+    "caramel": "#AF6F09", "cashew": "#D6B48C", "khaki": "#8F8654", "kaki": "#8F8654",
+    "taupe": "#483C32", "brown": "#6B4423", "chocolate": "#3B2414", "coffee": "#4B3621",
+    "caribou": "#816D5E", "russet": "#80461B", "clay": "#B66325", "peanut": "#795C34",
+    "navy": "#1F2A44", "indigo": "#3F4A7A", "denim": "#4F6D8F", "blue": "#2F5DA8",
+    "cobalt": "#0047AB", "sky": "#87CEEB", "teal": "#008080", "ink": "#252A3A",
+    "green": "#3A7D44", "olive": "#6B6B2E", "moss": "#6B7A3A", "forest": "#228B22",
+    "fores": "#228B22", "ivy": "#3B5E3B", "jungle": "#29AB87", "mint": "#98D8B0",
+    "pistachio": "#93C572", "lime": "#9ACD32", "sage": "#9CAF88", "camo": "#5B6142",
+    "red": "#B22222", "scarlet": "#D21F1B", "burgundy": "#800020", "maroon": "#6E1E2B",
+    "wine": "#722F37", "pink": "#F4A7B9", "fuchsia": "#C2185B", "coral": "#FF7F50",
+    "orange": "#E87722", "terracotta": "#E2725B", "rust": "#B7410E", "mustard": "#D9A93A",
+    "yellow": "#F2D13A", "gold": "#D4AF37", "golden": "#D4AF37", "plum": "#673147",
+    "purple": "#6A4C93", "violet": "#7F5AA8", "lavender": "#B7A6D9", "lilac": "#C8A2C8",
+}
+
+# Modifiers shift lightness of the base hue (L* units)
+LIGHTNESS_MODIFIERS = {
+    "dark": -18.0, "deep": -14.0, "night": -20.0, "captain": -10.0,
+    "light": 16.0, "pale": 20.0, "pastel": 18.0, "faded": 10.0, "washed": 8.0,
+    "dusty": 6.0, "off": 4.0,
+}
+
+_HEX_RE = re.compile(r"#([0-9a-fA-F]{6})")
+_name_cache: Dict[str, Optional[Lab]] = {}
+
+
+# =============================================================================
+# CONVERSIONS
+# =============================================================================
+
+def hex_to_lab(hex_color: str) -> Lab:
+    """Convert '#RRGGBB' to CIE Lab (D65)."""
+    h = hex_color.lstrip("#")
+    rgb = [int(h[i:i + 2], 16) / 255.0 for i in (0, 2, 4)]
+
+    lin = [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in rgb]
+    x = (lin[0] * 0.4124 + lin[1] * 0.3576 + lin[2] * 0.1805) / 0.95047
+    y = (lin[0] * 0.2126 + lin[1] * 0.7152 + lin[2] * 0.0722)
+    z = (lin[0] * 0.0193 + lin[1] * 0.1192 + lin[2] * 0.9505) / 1.08883
+
+    def f(t):
+        return t ** (1 / 3) if t > 0.008856 else 7.787 * t + 16 / 116
+
+    fx, fy, fz = f(x), f(y), f(z)
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+
+def lab_to_hex(lab: Lab) -> str:
+    """Convert CIE Lab (D65) back to '#RRGGBB'."""
+    L, a, b = lab
+    fy = (L + 16) / 116
+    fx = fy + a / 500
+    fz = fy - b / 200
+
+    def finv(t):
+        return t ** 3 if t ** 3 > 0.008856 else (t - 16 / 116) / 7.787
+
+    x, y, z = finv(fx) * 0.95047, finv(fy), finv(fz) * 1.08883
+    lin = (
+        x * 3.2406 + y * -1.5372 + z * -0.4986,
+        x * -0.9689 + y * 1.8758 + z * 0.0415,
+        x * 0.0557 + y * -0.2040 + z * 1.0570,
+    )
+    rgb = [
+        12.92 * c if c <= 0.0031308 else 1.055 * (max(c, 0) ** (1 / 2.4)) - 0.055
+        for c in lin
+    ]
+    return "#" + "".join(f"{min(255, max(0, round(c * 255))):02X}" for c in rgb)
+
+
+def parse_color_name(name: str) -> Optional[Lab]:
+    """
+    Map a catalog color name ("dark_khaki", "black_cream_white") or a palette
+    entry ("Deep Navy (#000080)") to Lab. Returns None for unknown names.
+    """
+    if not name:
+        return None
+    if name in _name_cache:
+        return _name_cache[name]
+
+    lab = None
+    hex_match = _HEX_RE.search(name)
+    if hex_match:
+        lab = hex_to_lab(hex_match.group(0))
+    else:
+        tokens = re.split(r"[_\s\-/]+", name.lower())
+        shift = 0.0
+        for token in tokens:
+            if token in LIGHTNESS_MODIFIERS and lab is None:
+                shift += LIGHTNESS_MODIFIERS[token]
+            elif token in COLOR_HEX:
+                # First hue word is the dominant color ("black_cream_white" -> black)
+                lab = hex_to_lab(COLOR_HEX[token])
+                break
+        if lab is not None and shift:
+            lab = (min(100.0, max(0.0, lab[0] + shift)), lab[1], lab[2])
+
+    _name_cache[name] = lab
+    return lab
+
+
+# =============================================================================
+# ITEM / PALETTE COLORS
+# =============================================================================
+
+def parse_color_value(value) -> Lab:
+    """Lab from '#RRGGBB', 'RRGGBB', a color name or an (L, a, b) sequence. Raises ValueError."""
+    if isinstance(value, (list, tuple)) and len(value) == 3:
+        return tuple(float(v) for v in value)
+    if isinstance(value, str):
+        text = value.strip()
+        if re.fullmatch(r"#?[0-9a-fA-F]{6}", text):
+            return hex_to_lab(text)
+        lab = parse_color_name(text)
+        if lab is not None:
+            return lab
+    raise ValueError(f"Unrecognized color '{value}'")
+
+
+def item_labs(item: Dict) -> List[Lab]:
+    """
+    All known Lab colors of an item: measured dominant colors when the
+    dominantcolors job has run, otherwise the parsable color names.
+    """
+    dominant = item.get("dominant_colors")
+    if dominant:
+        return [tuple(c["lab"]) for c in dominant]
+
+    colors = item.get("colors") or []
+    if isinstance(colors, str):
+        colors = [colors]
+    labs = [parse_color_name(color) for color in colors]
+    return [lab for lab in labs if lab is not None]
+
+
+def item_primary_lab(item: Dict) -> Optional[Lab]:
+    """
+    Lab of the color shown for the item: the heaviest dominant color from the
+    product image if measured, else the first listed color name.
+    """
+    dominant = item.get("dominant_colors")
+    if dominant:
+        return tuple(dominant[0]["lab"])
+
+    colors = item.get("colors") or []
+    if isinstance(colors, str):
+        colors = [colors]
+    for color in colors:
+        lab = parse_color_name(color)
+        if lab is not None:
+            return lab
+    return None
+
+
+def palette_labs(palette: Optional[Dict]) -> List[Lab]:
+    """Lab values of a Sanzo Wada palette's colors."""
+    if not palette:
+        return []
+    labs = [parse_color_name(c) for c in palette.get("colors", [])]
+    return [lab for lab in labs if lab is not None]
+
+
+# =============================================================================
+# DISTANCE
+# =============================================================================
+
+def delta_e(a: Lab, b: Lab) -> float:
+    """CIE76 color difference."""
+    return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
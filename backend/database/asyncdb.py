@@ -0,0 +1,168 @@
+"""
+Async Postgres access for the FastAPI event loop (asyncpg).
+
+Mirrors dbread (query / sample / stream) without blocking the loop, so DB reads
+can overlap with LLM and image calls. Queries come from queryfactory; their
+%s placeholders are rewritten to asyncpg's $n form once per shape. asyncpg
+prepares each statement once per connection and keeps it in the connection's
+statement cache, so repeated filter shapes skip parse/plan.
+"""
+
+import asyncio
+import os
+import re
+import time
+
+import asyncpg
+from dotenv import load_dotenv
+from . import dbcache
+from . import dblogger
+from . import queryfactory
+
+load_dotenv()
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+STREAM_PREFETCH = int(os.getenv("DB_STREAM_PREFETCH", "500"))
+
+_PLACEHOLDER = re.compile(r"%s")
+_converted = {}
+
+_pool = None
+_pool_lock = None
+
+
+def to_dollar(full_query):
+    """Rewrite psycopg2 %s placeholders to $1..$n (cached per query shape)."""
+    converted = _converted.get(full_query)
+    if converted is None:
+        counter = iter(range(1, full_query.count("%s") + 1))
+        converted = _PLACEHOLDER.sub(lambda _: f"${next(counter)}", full_query)
+        _converted[full_query] = converted
+    return converted
+
+
+async def get_pool():
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = await asyncpg.create_pool(
+                        host=os.getenv("DB_HOST"),
+                        database=os.getenv("DB_NAME"),
+                        user=os.getenv("DB_USER"),
+                        password=os.getenv("DB_PASSWORD"),
+                        port=5432,
+                        timeout=5,
+                        min_size=POOL_MIN,
+                        max_size=POOL_MAX,
+                        statement_cache_size=STATEMENT_CACHE_SIZE
+                    )
+                except Exception as e:
+                    print("ASYNC DB POOL ERROR:", e)
+                    dblogger.log(e)
+                    raise
+    return _pool
+
+
+async def _cache_call(func, *args):
+    # The SQLite cache does file I/O: keep it off the event loop
+    if dbcache.does_io():
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+async def query(filters):
+    full_query, parameters = queryfactory.create(filters)
+    pool = await get_pool()
+
+    async with pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        rows = await conn.fetch(to_dollar(full_query), *parameters)
+    return [dict(row) for row in rows]
+
+
+async def sample(filters, slot_categories, per_category=1, seed=None, use_cache=True):
+    # Same contract as dbread.sample (seeded samples share its cache entries);
+    # setseed and the query share one connection
+    full_query, parameters = queryfactory.create_sampled(filters, slot_categories, per_category)
+    key_parameters = list(parameters) + [seed]
+    if seed is not None and use_cache:
+        cached = await _cache_call(dbcache.lookup, full_query, key_parameters)
+        if cached is not dbcache.MISS:
+            return list(cached)
+
+    pool = await get_pool()
+
+    async with pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        async with conn.transaction():
+            if seed is not None:
+                await conn.execute("SELECT setseed($1)", float(seed))
+            rows = await conn.fetch(to_dollar(full_query), *parameters)
+
+    rows = [
+        {col: value for col, value in row.items() if col != 'slot_rank'}
+        for row in rows
+    ]
+    if seed is not None and use_cache:
+        await _cache_call(dbcache.store, full_query, key_parameters, rows)
+    return list(rows)
+
+
+async def sample_pool(filters, slot_categories, per_category=1):
+    # Same pool as dbread.sample_pool (shares its cache entries)
+    return await sample(filters, slot_categories, per_category=max(per_category, dbcache.SAMPLE_POOL),
+                        seed=dbcache.POOL_SEED)
+
+
+async def stream(filters, prefetch=STREAM_PREFETCH):
+    # Async generator over a server-side cursor, prefetch rows per round trip.
+    # The connection is held until the generator is exhausted or closed.
+    full_query, parameters = queryfactory.create(filters)
+    pool = await get_pool()
+
+    async with pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        async with conn.transaction():
+            async for row in conn.cursor(to_dollar(full_query), *parameters, prefetch=prefetch):
+                yield dict(row)
+
+
+def metrics():
+    if _pool is None:
+        return None
+    return {
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+    }
+
+
+async def close():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    async def main():
+        filters = {"gender": sys.argv[1]} if len(sys.argv) > 1 else {}
+        start = time.perf_counter()
+        rows = await query(filters)
+        print(f"query {filters}: {len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        count = 0
+        async for _ in stream(filters):
+            count += 1
+        print(f"stream {filters}: {count} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+        await close()
+
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""
+Benchmark the queryfactory query shapes on a synthetic clothes table.
+
+Creates a scratch schema, fills it with N random rows (1M by default) using
+generate_series, then prints EXPLAIN ANALYZE plans and median latency for each
+workload, first without and then with the migration indexes.
+
+Run against a local Postgres (DB_* env vars as for dbconn):
+    python -m database.benchmark_queries [--rows 1000000] [--runs 20] [--keep]
+"""
+
+import argparse
+import statistics
+import time
+
+from . import dbconn
+from . import queryfactory
+from .migrations import MIGRATIONS
+
+SCHEMA = "clothes_bench"
+
+BRANDS = ["zara", "hm", "mango", "bershka", "pullandbear", "adidas", "massimo_dutti", "tom_tailor"]
+CATEGORIES = ["t-shirt", "shirt", "hoodie", "sweater", "jeans", "trousers", "jacket", "coat", "blazer", "dress"]
+GENDERS = ["man", "woman", "unisex"]
+STYLES = ["casual", "smart", "sporty", "street", "grunge", "classy"]
+COLORS = ["black", "white", "grey", "navy", "beige", "brown", "blue", "green", "burgundy", "ecru",
+          "khaki", "olive", "red", "pink", "camel", "charcoal", "cream", "denim", "sand", "stone"]
+
+# Same filter dicts the pipeline passes to queryfactory.create
+WORKLOADS = [
+    {"gender": "man"},
+    {"gender": "man", "style": "casual"},
+    {"gender": "woman", "category": "jacket", "style": "smart"},
+    {"gender": "man", "brand": "zara"},
+    {"brand": "mango"},
+    {"colors": "burgundy"},
+    {"gender": "woman", "colors": "navy", "category": "coat"},
+]
+
+FILL_QUERY = """
+    INSERT INTO clothes (id, brand, category, gender, url, colors, style, price_eur)
+    SELECT
+        'item_' || n,
+        (%(brands)s::text[])[1 + floor(random() * array_length(%(brands)s::text[], 1))::int],
+        (%(categories)s::text[])[1 + floor(random() * array_length(%(categories)s::text[], 1))::int],
+        (%(genders)s::text[])[1 + floor(random() * array_length(%(genders)s::text[], 1))::int],
+        'https://example.com/item_' || n,
+        ARRAY[
+            (%(colors)s::text[])[1 + floor(random() * array_length(%(colors)s::text[], 1))::int],
+            (%(colors)s::text[])[1 + floor(random() * array_length(%(colors)s::text[], 1))::int]
+        ],
+        (%(styles)s::text[])[1 + floor(random() * array_length(%(styles)s::text[], 1))::int],
+        round((10 + random() * 250)::numeric, 2)
+    FROM generate_series(1, %(rows)s) AS n
+"""
+
+INDEX_NAMES = ["clothes_gender_category_style_idx", "clothes_brand_idx", "clothes_colors_gin_idx"]
+
+
+def setup(conn, cur, rows):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute(dict(MIGRATIONS)["0001_create_clothes"])
+
+    start = time.perf_counter()
+    cur.execute(FILL_QUERY, {
+        "brands": BRANDS, "categories": CATEGORIES, "genders": GENDERS,
+        "styles": STYLES, "colors": COLORS, "rows": rows
+    })
+    conn.commit()
+    print(f"Inserted {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+def create_indexes(conn, cur):
+    start = time.perf_counter()
+    cur.execute(dict(MIGRATIONS)["0002_clothes_indexes"])
+    cur.execute("ANALYZE clothes")
+    conn.commit()
+    print(f"Built indexes in {time.perf_counter() - start:.1f}s")
+
+
+def drop_indexes(conn, cur):
+    for name in INDEX_NAMES:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+    cur.execute("ANALYZE clothes")
+    conn.commit()
+
+
+def run_workloads(cur, runs, label):
+    print(f"\n{'=' * 70}\n{label}\n{'=' * 70}")
+    results = {}
+
+    for filters in WORKLOADS:
+        full_query, parameters = queryfactory.create(filters)
+
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + full_query, parameters)
+        plan = "\n    ".join(row[0] for row in cur.fetchall())
+
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            cur.execute(full_query, parameters)
+            rows = cur.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        median = statistics.median(timings)
+        results[str(filters)] = median
+        print(f"\n{filters}: {len(rows)} rows, median {median:.1f} ms")
+        print(f"    {plan}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    conn, cur = dbconn.connect()
+    try:
+        setup(conn, cur, args.rows)
+
+        drop_indexes(conn, cur)
+        before = run_workloads(cur, args.runs, "WITHOUT INDEXES (primary key only)")
+
+        create_indexes(conn, cur)
+        after = run_workloads(cur, args.runs, "WITH MIGRATION INDEXES")
+
+        print(f"\n{'=' * 70}\nSUMMARY (median ms)\n{'=' * 70}")
+        for key in before:
+            speedup = before[key] / after[key] if after[key] else float("inf")
+            print(f"{key:55s} {before[key]:9.1f} -> {after[key]:8.1f}  ({speedup:.1f}x)")
+    finally:
+        if not args.keep:
+            conn.rollback()
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        dbconn.disconnect(conn, cur)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Read-through cache for dbread queries.
+
+Entries are keyed by the (full_query, parameters) pair from queryfactory and
+expire after DB_CACHE_TTL seconds. Writers (upload_data, bulk_upload, dbsync)
+call invalidate() when they commit. That also replaces a generation marker file
+(DB_CACHE_DIR/generation) which every process checks on lookup, so a CLI load
+empties the server's cache too, as long as both run on the same host.
+
+Sampled reads are cached per seed. sample_pool() in dbread / asyncdb draws one
+candidate pool per filter combination (DB_SAMPLE_POOL rows per slot under
+POOL_SEED), so repeated filters hit the cache; the caller's rng then picks
+from the pool, so requests vary by up to DB_SAMPLE_POOL items per slot.
+
+DB_CACHE selects the implementation:
+    local  - in-process LRU (default)
+    sqlite - shared file (DB_CACHE_DIR/db_cache.sqlite3), one copy per host
+    off    - no caching
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("DB_CACHE", "local").lower()
+CACHE_TTL = float(os.getenv("DB_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "1024"))
+# Outside the source tree by default; every process on the host must agree on it
+CACHE_DIR = Path(os.getenv("DB_CACHE_DIR", str(Path(tempfile.gettempdir()) / "outfit-db-cache")))
+CACHE_PATH = os.getenv("DB_CACHE_PATH", str(CACHE_DIR / "db_cache.sqlite3"))
+GENERATION_PATH = CACHE_DIR / "generation"
+SAMPLE_POOL = int(os.getenv("DB_SAMPLE_POOL", "32"))
+POOL_SEED = 0.0
+
+MISS = object()
+
+
+def make_key(full_query, parameters):
+    raw = json.dumps([full_query, list(parameters)], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def current_generation():
+    """Identity of the marker file; changes on every invalidate() on this host."""
+    try:
+        stat = GENERATION_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def bump_generation():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = GENERATION_PATH.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(str(time.time_ns()))
+    # New inode on every bump, so readers notice even within one mtime tick
+    os.replace(tmp, GENERATION_PATH)
+
+
+class CacheStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+class LocalCache:
+    """In-process LRU with per-entry expiry."""
+
+    name = "local"
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = current_generation()
+
+    def _check_generation(self):
+        # A writer in another process bumped the marker: drop everything
+        generation = current_generation()
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key):
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats.record(True)
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        self.stats.record(False)
+        return MISS
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = current_generation()
+        self.stats.record_invalidation()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache in a SQLite file shared by every process on the host.
+    Values are pickled rows; expiry uses wall-clock time.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_cache "
+            "(key TEXT PRIMARY KEY, expires REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM query_cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            self.stats.record(False)
+            return MISS
+        self.stats.record(True)
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?)",
+                (key, now + self.ttl, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            )
+            # Drop expired rows, then the soonest-expiring beyond max_entries
+            self._conn.execute("DELETE FROM query_cache WHERE expires <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM query_cache WHERE key IN (SELECT key FROM query_cache "
+                "ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def invalidate(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_cache")
+            self._conn.commit()
+        self.stats.record_invalidation()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM query_cache").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Configured cache instance, or None when DB_CACHE=off."""
+    global _cache
+    if _cache is None and CACHE_BACKEND != "off":
+        with _cache_lock:
+            if _cache is None:
+                _cache = SQLiteCache() if CACHE_BACKEND == "sqlite" else LocalCache()
+    return _cache
+
+
+def does_io():
+    """True when lookups and stores hit a file (DB_CACHE=sqlite); async callers use a thread."""
+    return CACHE_BACKEND == "sqlite"
+
+
+def lookup(full_query, parameters):
+    """Cached rows for (full_query, parameters), or MISS."""
+    cache = get_cache()
+    if cache is None:
+        return MISS
+    return cache.get(make_key(full_query, parameters))
+
+
+def store(full_query, parameters, value):
+    cache = get_cache()
+    if cache is not None:
+        cache.set(make_key(full_query, parameters), value)
+
+
+def cached(full_query, parameters, loader):
+    """Rows for (full_query, parameters), calling loader() only on a miss."""
+    value = lookup(full_query, parameters)
+    if value is MISS:
+        value = loader()
+        store(full_query, parameters, value)
+    return value
+
+
+def invalidate():
+    """
+    Drop every cached result; called by writers after they commit.
+    Bumps the generation marker first so other processes drop theirs too,
+    even when this one (say, a CLI run with DB_CACHE=off) caches nothing.
+    """
+    try:
+        bump_generation()
+    except OSError as e:
+        print(f"⚠️ Could not bump DB cache generation at {GENERATION_PATH}: {e}")
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate()
+
+
+def metrics():
+    cache = get_cache()
+    if cache is None:
+        return {"backend": "off"}
+    return {"backend": cache.name, "entries": len(cache), "ttl": cache.ttl, **cache.stats.snapshot()}
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+from dotenv import load_dotenv
+from . import dblogger
+
+load_dotenv()
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+class PoolMetrics:
+    """Checkout counters and wait times (seconds) for the connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.replaced = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_replaced(self):
+        with self._lock:
+            self.replaced += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "replaced_connections": self.replaced,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class ConnectionPool:
+    """
+    Thread-safe Postgres pool with blocking checkout.
+    psycopg2's ThreadedConnectionPool raises when exhausted, so a semaphore bounds
+    checkouts to maxconn and callers wait (up to timeout) for a free connection.
+    Every checkout is health-checked; broken connections are replaced.
+    """
+
+    def __init__(self, minconn=POOL_MIN, maxconn=POOL_MAX, timeout=POOL_TIMEOUT, **conn_kwargs):
+        self.timeout = timeout
+        self.metrics = PoolMetrics()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.metrics.record_timeout()
+            raise TimeoutError(f"No database connection available within {self.timeout}s")
+
+        try:
+            conn = self._pool.getconn()
+            if not self._healthy(conn):
+                self._pool.putconn(conn, close=True)
+                self.metrics.record_replaced()
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self.metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not close and not conn.closed:
+                conn.rollback()
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as (conn, cur): ..."""
+        conn = self.getconn()
+        cur = None
+        broken = False
+        try:
+            cur = conn.cursor()
+            yield conn, cur
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if cur is not None and not cur.closed:
+                cur.close()
+            self.putconn(conn, close=broken)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = ConnectionPool(
+                        host=os.getenv("DB_HOST"),
+                        dbname=os.getenv("DB_NAME"),
+                        user=os.getenv("DB_USER"),
+                        password=os.getenv("DB_PASSWORD"),
+                        port=5432,
+                        connect_timeout=5
+                    )
+                except Exception as e:
+                    print("DB POOL ERROR:", e)
+                    dblogger.log(e)
+                    raise
+    return _pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+def metrics():
+    return get_pool().metrics.snapshot() if _pool is not None else PoolMetrics().snapshot()
+
+
+def close():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
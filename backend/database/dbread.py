@@ -1,10 +1,79 @@
+import uuid
+from . import dbcache
 from . import dbconn
+from . import dbpool
 from . import queryfactory
 
-def query(filters):
-    conn, cur = dbconn.connect()
+def query(filters, pooled=True, use_cache=True):
     full_query, parameters = queryfactory.create(filters)
-    cur.execute(full_query, parameters)
-    results = cur.fetchall()
-    dbconn.disconnect(conn, cur)
-    return results
\ No newline at end of file
+
+    def load():
+        if pooled:
+            with dbpool.connection() as (conn, cur):
+                cur.execute(full_query, parameters)
+                return cur.fetchall()
+
+        conn, cur = dbconn.connect()
+        try:
+            cur.execute(full_query, parameters)
+            results = cur.fetchall()
+        finally:
+            dbconn.disconnect(conn, cur)
+        return results
+
+    if not use_cache:
+        return load()
+    # Copy so callers can't mutate the cached rows
+    return list(dbcache.cached(full_query, parameters, load))
+
+
+def sample(filters, slot_categories, per_category=1, seed=None, use_cache=True):
+    # At most per_category random rows per canonical slot, as dicts.
+    # seed (-1..1) makes Postgres random() repeatable for this query, so seeded
+    # samples are cached like query().
+    full_query, parameters = queryfactory.create_sampled(filters, slot_categories, per_category)
+
+    def load():
+        with dbpool.connection() as (conn, cur):
+            if seed is not None:
+                cur.execute("SELECT setseed(%s)", (seed,))
+            cur.execute(full_query, parameters)
+            columns = [col[0] for col in cur.description]
+            rows = cur.fetchall()
+
+        return [
+            {col: value for col, value in zip(columns, row) if col != 'slot_rank'}
+            for row in rows
+        ]
+
+    if seed is None or not use_cache:
+        return load()
+    return list(dbcache.cached(full_query, list(parameters) + [seed], load))
+
+
+def sample_pool(filters, slot_categories, per_category=1):
+    # Cached candidate pool for the filters: at least dbcache.SAMPLE_POOL random
+    # rows per slot under one fixed seed. Callers pick from it with their own rng.
+    return sample(filters, slot_categories, per_category=max(per_category, dbcache.SAMPLE_POOL),
+                  seed=dbcache.POOL_SEED)
+
+
+def stream(filters, itersize=2000):
+    # Yield matching rows as dicts from a server-side (named) cursor,
+    # fetching itersize rows per round trip. The pooled connection is held
+    # until the generator is exhausted or closed.
+    full_query, parameters = queryfactory.create(filters)
+    pool = dbpool.get_pool()
+    conn = pool.getconn()
+
+    try:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(full_query, parameters)
+            columns = None
+            for row in cur:
+                if columns is None:
+                    columns = [col[0] for col in cur.description]
+                yield dict(zip(columns, row))
+    finally:
+        pool.putconn(conn)
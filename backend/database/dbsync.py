@@ -0,0 +1,142 @@
+"""
+Incremental sync from the Haine JSON catalog into the clothes table.
+
+Every item is hashed over the columns it is stored with; the hashes are
+compared with clothes.content_hash and only the differences are sent:
+inserts for new ids, updates for changed hashes, deletes for ids that left the
+catalog. All batches run in one transaction, so readers see either the old or
+the new catalog. upload_data and bulk_upload store the same hash; rows without
+one (loaded before migration 0003) are rewritten once and then compare as
+unchanged.
+
+Run:  python -m database.dbsync [--folder PATH] [--batch-size N] [--dry-run] [--keep-deleted]
+"""
+
+import os
+
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from . import dbcache
+from . import dblogger
+from . import migrations
+from .dbwrite import COLUMNS, item_to_row, read_items, row_hash
+
+load_dotenv()
+
+SYNC_BATCH_SIZE = int(os.getenv("DB_SYNC_BATCH_SIZE", "1000"))
+
+ROW_TEMPLATE = "(" + ", ".join(
+    "%s::text[]" if col == "colors" else "%s::numeric" if col == "price_eur" else "%s"
+    for col in COLUMNS + ["content_hash"]
+) + ")"
+
+INSERT_QUERY = f"INSERT INTO clothes ({', '.join(COLUMNS)}, content_hash) VALUES %s"
+
+UPDATE_QUERY = f"""
+    UPDATE clothes AS c SET
+        {', '.join(f"{col} = v.{col}" for col in COLUMNS[1:])},
+        content_hash = v.content_hash
+    FROM (VALUES %s) AS v ({', '.join(COLUMNS)}, content_hash)
+    WHERE c.id = v.id
+"""
+
+
+def catalog_rows(folder=None):
+    """{id: (row, hash)} for the JSON catalog; the last occurrence of an id wins."""
+    rows = {}
+    for filename, item in read_items(folder):
+        row = item_to_row(item)
+        rows[row[0]] = row
+    return {item_id: (row, row_hash(row)) for item_id, row in rows.items()}
+
+
+def stored_hashes(cur):
+    cur.execute("SELECT id, content_hash FROM clothes")
+    return dict(cur.fetchall())
+
+
+def diff(local, stored, delete=True):
+    """Ids to insert, update and delete to turn stored into local."""
+    inserts = [item_id for item_id in local if item_id not in stored]
+    updates = [
+        item_id for item_id, (row, digest) in local.items()
+        if item_id in stored and stored[item_id] != digest
+    ]
+    deletes = [item_id for item_id in stored if item_id not in local] if delete else []
+    return inserts, updates, deletes
+
+
+def _batches(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def sync(conn, cur, folder=None, batch_size=SYNC_BATCH_SIZE, dry_run=False, delete=True):
+    """
+    Bring the clothes table in line with the JSON catalog.
+    Returns {"inserted", "updated", "deleted", "unchanged", "total"}.
+    """
+    # content_hash arrives with migration 0003
+    migrations.migrate(conn, cur)
+
+    local = catalog_rows(folder)
+    stored = stored_hashes(cur)
+    inserts, updates, deletes = diff(local, stored, delete)
+
+    result = {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(deletes),
+        "unchanged": len(local) - len(inserts) - len(updates),
+        "total": len(local)
+    }
+
+    if dry_run or not (inserts or updates or deletes):
+        conn.rollback()
+        dblogger.log(f"Sync{' (dry run)' if dry_run else ''}: {result}")
+        return result
+
+    try:
+        for batch in _batches(inserts, batch_size):
+            execute_values(cur, INSERT_QUERY, [local[i][0] + (local[i][1],) for i in batch],
+                           template=ROW_TEMPLATE, page_size=batch_size)
+
+        for batch in _batches(updates, batch_size):
+            execute_values(cur, UPDATE_QUERY, [local[i][0] + (local[i][1],) for i in batch],
+                           template=ROW_TEMPLATE, page_size=batch_size)
+
+        for batch in _batches(deletes, batch_size):
+            cur.execute("DELETE FROM clothes WHERE id = ANY(%s)", (batch,))
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        dblogger.log(f"Sync failed, nothing applied: {e}")
+        raise
+
+    dbcache.invalidate()
+
+    dblogger.log(f"Sync: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from . import dbconn
+    from .dbwrite import CATALOG_JSON_FOLDER
+
+    parser = argparse.ArgumentParser(description="Apply JSON catalog changes to the clothes table")
+    parser.add_argument("--folder", default=None, help=f"JSON folder (default: {CATALOG_JSON_FOLDER})")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only report the changes")
+    parser.add_argument("--keep-deleted", action="store_true", help="keep rows missing from the catalog")
+    args = parser.parse_args()
+
+    conn, cur = dbconn.connect()
+    try:
+        start = time.perf_counter()
+        print(sync(conn, cur, args.folder, args.batch_size, args.dry_run, delete=not args.keep_deleted))
+        print(f"Done in {time.perf_counter() - start:.2f}s")
+    finally:
+        dbconn.disconnect(conn, cur)
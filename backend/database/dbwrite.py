@@ -1,47 +1,238 @@
+import csv
+import hashlib
+import io
 import json
 import os
 import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+from . import dbcache
+from . import dblogger
+from . import migrations
 
-def upload_data(conn, cur):
-    FOLDER_PATH = r"D:\ETTI\Anul_4\Proiect IA\Json_Script_Creator\json_files"
-    files = [f for f in os.listdir(FOLDER_PATH) if f.endswith(".json")]
-    total_inserted = 0
+load_dotenv()
+
+# Source folder for the brand JSON files (defaults to the repo's Haine folder)
+CATALOG_JSON_FOLDER = os.getenv(
+    "CATALOG_JSON_FOLDER",
+    str(Path(__file__).resolve().parent.parent.parent / "Haine")
+)
+BULK_CHUNK_SIZE = int(os.getenv("DB_BULK_CHUNK_SIZE", "5000"))
+
+COLUMNS = ["id", "brand", "category", "gender", "url", "colors", "style", "price_eur"]
+
+# Columns written by upload_data / bulk_upload: the item columns plus their
+# row_hash, so dbsync sees freshly loaded rows as unchanged
+STORED_COLUMNS = COLUMNS + ["content_hash"]
+
+
+def get_folder_path(folder=None):
+    return folder or CATALOG_JSON_FOLDER
+
+
+def read_items(folder=None):
+    """
+    Yield (filename, item) for every item in the folder's JSON files.
+    Unreadable files are logged and skipped.
+    """
+    folder_path = get_folder_path(folder)
+    files = sorted(f for f in os.listdir(folder_path) if f.endswith(".json"))
 
     for filename in files:
-        file_path = os.path.join(FOLDER_PATH, filename)
-
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-
-            for item in data:
-                item_id = item.get('id')
-                brand = item.get('brand')
-                category = item.get('category')
-                gender = item.get('gender')
-                url = item.get('url')
-                colors = item.get('colors', [])
-                style = item.get('style')
-
-                price_raw = item.get('price_eur', '0')
-                try:
-                    price = float(price_raw)
-                except ValueError:
-                    price = 0.0
-
-                try:
-                    insert_query = """
-                                   INSERT INTO clothes (id, brand, category, gender, url, colors, style, price_eur)
-                                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING; \
-                                   """
-
-                    cur.execute(insert_query, (
-                        item_id, brand, category, gender, url, colors, style, price
-                    ))
-                    total_inserted += 1
-
-                except Exception as e:
-                    with open("db.log.txt", "a") as db_log:
-                        db_log.write(str(datetime.datetime.now()) + str(e) + "\n")
+        file_path = os.path.join(folder_path, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            dblogger.log(f"{filename}: {e}")
+            continue
+
+        if isinstance(data, dict):
+            data = data.get("items", [data])
+
+        for item in data:
+            if isinstance(item, dict) and item.get('id'):
+                yield filename, item
+
+
+def item_to_row(item):
+    """Column values for the clothes table, in COLUMNS order."""
+    colors = item.get('colors', [])
+    if isinstance(colors, str):
+        colors = [colors]
+
+    price_raw = item.get('price_eur', '0')
+    try:
+        price = float(price_raw)
+    except (TypeError, ValueError):
+        price = 0.0
+
+    return (
+        item.get('id'),
+        item.get('brand'),
+        item.get('category'),
+        item.get('gender'),
+        item.get('url'),
+        list(colors),
+        item.get('style'),
+        price
+    )
+
+
+def row_hash(row):
+    """Stable hash of a clothes row (item_to_row output), stored as clothes.content_hash."""
+    payload = json.dumps(list(row), ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def upload_data(conn, cur, folder=None):
+    total_inserted = 0
+    errors = []
+
+    # content_hash arrives with migration 0003
+    migrations.migrate(conn, cur)
+
+    insert_query = """
+                   INSERT INTO clothes (id, brand, category, gender, url, colors, style, price_eur, content_hash)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT (id) DO NOTHING; \
+                   """
+
+    for filename, item in read_items(folder):
+        try:
+            row = item_to_row(item)
+            cur.execute(insert_query, row + (row_hash(row),))
+            # rowcount is 0 when the id already existed
+            total_inserted += cur.rowcount
+
+        except Exception as e:
+            errors.append(str(datetime.datetime.now()) + str(e))
     conn.commit()
+    dbcache.invalidate()
+
     with open("db.log.txt", "a") as db_log:
+        for error in errors:
+            db_log.write(error + "\n")
         db_log.write(f"Succefuly inserted {total_inserted} items!!! <3")
+
+    return total_inserted
+
+
+# =============================================================================
+# BULK INGESTION (COPY -> staging -> set-based upsert)
+# =============================================================================
+
+def _pg_array(values):
+    """Postgres text[] literal for COPY csv input."""
+    escaped = []
+    for value in values:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        escaped.append(f'"{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _copy_rows(cur, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        digest = row_hash(row)
+        row = list(row)
+        row[5] = _pg_array(row[5])
+        writer.writerow(["" if v is None else v for v in row] + [digest])
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY clothes_staging ({', '.join(STORED_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+# A row loaded before it had a hash gets one even if its data is unchanged
+UPSERT_QUERY = f"""
+    INSERT INTO clothes AS c ({', '.join(STORED_COLUMNS)})
+    SELECT {', '.join(STORED_COLUMNS)} FROM clothes_staging
+    ON CONFLICT (id) DO UPDATE SET
+        {', '.join(f"{col} = EXCLUDED.{col}" for col in STORED_COLUMNS[1:])}
+    WHERE ({', '.join(f"c.{col}" for col in STORED_COLUMNS[1:])})
+          IS DISTINCT FROM ({', '.join(f"EXCLUDED.{col}" for col in STORED_COLUMNS[1:])})
+    RETURNING (xmax = 0) AS inserted
+"""
+
+
+def bulk_upload(conn, cur, folder=None, chunk_size=BULK_CHUNK_SIZE, items=None):
+    """
+    Load every JSON item (or the given items) with COPY into a temp staging
+    table, then upsert set-based. Commits once per chunk_size rows. Unchanged
+    rows are left untouched.
+
+    Returns {"inserted", "updated", "unchanged", "total"} with exact counts.
+    """
+    if items is None:
+        items = (item for filename, item in read_items(folder))
+
+    # Last occurrence of an id wins; a duplicate inside one upsert would fail it
+    rows = {}
+    for item in items:
+        if not item.get('id'):
+            continue
+        row = item_to_row(item)
+        rows[row[0]] = row
+    rows = list(rows.values())
+
+    # content_hash arrives with migration 0003
+    migrations.migrate(conn, cur)
+
+    cur.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS clothes_staging "
+        "(LIKE clothes INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    )
+
+    inserted = updated = 0
+    try:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            _copy_rows(cur, chunk)
+            cur.execute(UPSERT_QUERY)
+            for (was_insert,) in cur.fetchall():
+                if was_insert:
+                    inserted += 1
+                else:
+                    updated += 1
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        dblogger.log(f"Bulk upload failed after {inserted + updated} changes: {e}")
+        raise
+    finally:
+        # Chunks commit on their own, so even a failed run may have changed rows
+        dbcache.invalidate()
+
+    result = {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(rows) - inserted - updated,
+        "total": len(rows)
+    }
+    dblogger.log(f"Bulk upload: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from . import dbconn
+
+    parser = argparse.ArgumentParser(description="Load the brand JSON catalog into Postgres")
+    parser.add_argument("--folder", default=None, help=f"JSON folder (default: {CATALOG_JSON_FOLDER})")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--row-by-row", action="store_true", help="use the old per-item INSERT path")
+    args = parser.parse_args()
+
+    conn, cur = dbconn.connect()
+    try:
+        start = time.perf_counter()
+        if args.row_by_row:
+            print(f"Inserted: {upload_data(conn, cur, args.folder)}")
+        else:
+            print(bulk_upload(conn, cur, args.folder, args.chunk_size))
+        print(f"Done in {time.perf_counter() - start:.2f}s")
+    finally:
+        dbconn.disconnect(conn, cur)
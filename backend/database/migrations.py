@@ -0,0 +1,109 @@
+"""
+Schema migrations for the clothes table.
+
+Each migration runs once, in order, and is recorded in schema_migrations.
+Statements use unqualified names so they apply to the current search_path
+(the benchmark script points it at a scratch schema).
+
+Run:  python -m database.migrations [--status]
+"""
+
+from . import dblogger
+
+MIGRATIONS = [
+    ("0001_create_clothes", """
+        CREATE TABLE IF NOT EXISTS clothes (
+            id         TEXT PRIMARY KEY,
+            brand      TEXT,
+            category   TEXT,
+            gender     TEXT,
+            url        TEXT,
+            colors     TEXT[] NOT NULL DEFAULT '{}',
+            style      TEXT,
+            price_eur  NUMERIC(10, 2) NOT NULL DEFAULT 0
+        );
+    """),
+
+    # Shapes from queryfactory.create: equality on gender/category/style/brand
+    # and colors @> ARRAY[...]
+    ("0002_clothes_indexes", """
+        CREATE INDEX IF NOT EXISTS clothes_gender_category_style_idx
+            ON clothes (gender, category, style);
+        CREATE INDEX IF NOT EXISTS clothes_brand_idx
+            ON clothes (brand);
+        CREATE INDEX IF NOT EXISTS clothes_colors_gin_idx
+            ON clothes USING GIN (colors);
+    """),
+
+    # Row hash written by dbsync; NULL until a row is synced once
+    ("0003_clothes_content_hash", """
+        ALTER TABLE clothes ADD COLUMN IF NOT EXISTS content_hash TEXT;
+    """),
+]
+
+MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     TEXT PRIMARY KEY,
+        applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+
+def applied_versions(cur):
+    cur.execute(MIGRATIONS_TABLE)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate(conn, cur, target=None):
+    """
+    Apply pending migrations in order (up to and including target, if given).
+    Each migration commits on its own. Returns the versions applied.
+    """
+    done = applied_versions(cur)
+    conn.commit()
+
+    applied = []
+    for version, sql in MIGRATIONS:
+        if version not in done:
+            try:
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                dblogger.log(f"Migration {version} failed: {e}")
+                raise
+            applied.append(version)
+            dblogger.log(f"Applied migration {version}")
+
+        if version == target:
+            break
+
+    return applied
+
+
+def status(cur):
+    done = applied_versions(cur)
+    return [(version, version in done) for version, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    import argparse
+    from . import dbconn
+
+    parser = argparse.ArgumentParser(description="Apply clothes table migrations")
+    parser.add_argument("--status", action="store_true", help="only list migrations")
+    parser.add_argument("--target", default=None, help="stop after this version")
+    args = parser.parse_args()
+
+    conn, cur = dbconn.connect()
+    try:
+        if args.status:
+            for version, is_applied in status(cur):
+                print(f"{'x' if is_applied else ' '} {version}")
+        else:
+            applied = migrate(conn, cur, args.target)
+            print(f"Applied: {applied or 'nothing to do'}")
+    finally:
+        dbconn.disconnect(conn, cur)
@@ -1,5 +1,4 @@
-def create(filters):
-    BASE_QUERY = "SELECT * FROM clothes"
+def conditions_for(filters):
     conditions = []
     parameters = []
 
@@ -18,6 +17,13 @@ def create(filters):
         conditions.append("colors @> %s")
         parameters.append([filters['colors']])
 
+    return conditions, parameters
+
+
+def create(filters):
+    BASE_QUERY = "SELECT * FROM clothes"
+    conditions, parameters = conditions_for(filters)
+
     if conditions:
         full_query = BASE_QUERY + " WHERE " + " AND ".join(conditions)
     else:
@@ -25,3 +31,42 @@ def create(filters):
 
     return full_query, parameters
 
+
+def _like_pattern(variant):
+    escaped = variant.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def slot_expression(slot_categories):
+    # SQL CASE mapping category -> canonical slot (e.g. clotheselector.CATEGORY_MAP).
+    # Same rule as normalize_category: a variant inside the category, or the category inside a variant.
+    cases = []
+    parameters = []
+
+    for slot, variants in slot_categories.items():
+        cases.append("WHEN lower(category) LIKE ANY(%s) OR strpos(%s, lower(category)) > 0 THEN %s")
+        parameters.append([_like_pattern(v) for v in variants])
+        parameters.append("|" + "|".join(variants) + "|")
+        parameters.append(slot)
+
+    return "CASE " + " ".join(cases) + " END", parameters
+
+
+def create_sampled(filters, slot_categories, per_category=1):
+    # Same filters as create(), but only per_category random rows per canonical slot
+    # leave the database instead of every matching row.
+    conditions, where_parameters = conditions_for(filters)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    slot_sql, slot_parameters = slot_expression(slot_categories)
+
+    full_query = (
+        "SELECT * FROM ("
+        "SELECT s.*, row_number() OVER (PARTITION BY slot ORDER BY random()) AS slot_rank FROM ("
+        f"SELECT c.*, {slot_sql} AS slot FROM clothes c{where}"
+        ") s WHERE slot IS NOT NULL"
+        ") sampled WHERE slot_rank <= %s"
+    )
+    parameters = slot_parameters + where_parameters + [per_category]
+
+    return full_query, parameters
@@ -372,8 +372,10 @@ def get_accessories_rules(age: int, style_vibe: str) -> str:
     return "Practical accessories: premium sunglasses or a structured backpack."
 
 
-def get_shoe_styling_prompt(body_type: str, style: str, gender: str, outfit_colors: list) -> str:
+def get_shoe_styling_prompt(body_type: str, style: str, gender: str, outfit_colors: list, rng=None) -> str:
     #shoe recommendation
+    import random
+    rng = rng or random
     rec = get_shoe_recommendation(body_type, style, gender)
 
     if outfit_colors:
@@ -388,12 +390,10 @@ def get_shoe_styling_prompt(body_type: str, style: str, gender: str, outfit_colo
         else:
             shoe_color = "neutral (black, white, or brown)"
     else:
-        import random
-        shoe_color = random.choice(rec["colors"])
+        shoe_color = rng.choice(rec["colors"])
 
-    import random
-    shoe_type = random.choice(rec["shoe_types"])
-    material = random.choice(rec["materials"])
+    shoe_type = rng.choice(rec["shoe_types"])
+    material = rng.choice(rec["materials"])
 
     return f"""
 SHOE SPECIFICATION:
@@ -0,0 +1,114 @@
+"""
+Image Jobs - Background full-quality renders for progressive generation.
+
+The pipeline returns a cheap preview right away and submits the full render
+here. Clients poll GET /image-jobs/{id} or follow GET /image-jobs/{id}/events
+(SSE). Jobs live in memory for IMAGE_JOB_TTL seconds.
+
+Jobs are per process: with several workers (uvicorn --workers, gunicorn) a
+poll that lands on a worker other than the one that ran the pipeline gets a
+404. Run a single worker for progressive mode, or route clients stickily.
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+IMAGE_JOB_WORKERS = int(os.getenv("IMAGE_JOB_WORKERS", "4"))
+IMAGE_JOB_TTL = float(os.getenv("IMAGE_JOB_TTL", "3600"))
+
+# SSE streams check job.version this often and send a keep-alive when idle
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_KEEPALIVE = 15.0
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+
+class ImageJob:
+
+    def __init__(self, preview_url: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.status = PENDING
+        self.preview_url = preview_url
+        self.image_url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.updated = self.created
+        # Bumped on every change; event streams poll it
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _set(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.updated = time.time()
+            self.version += 1
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def snapshot(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "preview_url": self.preview_url,
+            "image_url": self.image_url,
+            "error": self.error,
+            "elapsed_s": round((self.updated if self.finished else time.time()) - self.created, 3),
+            "version": self.version,
+        }
+
+
+_jobs: Dict[str, ImageJob] = {}
+_jobs_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _run(job: ImageJob, render: Callable[[], str]):
+    job._set(status=RUNNING)
+    try:
+        job._set(status=DONE, image_url=render())
+    except Exception as e:
+        traceback.print_exc()
+        job._set(status=FAILED, error=str(e))
+
+
+def _expire():
+    cutoff = time.time() - IMAGE_JOB_TTL
+    with _jobs_lock:
+        for job_id in [j.id for j in _jobs.values() if j.finished and j.updated < cutoff]:
+            del _jobs[job_id]
+
+
+def submit(render: Callable[[], str], preview_url: Optional[str] = None) -> ImageJob:
+    """Run render() (returns the final image URL) in the background."""
+    global _executor
+    _expire()
+
+    job = ImageJob(preview_url)
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_JOB_WORKERS, thread_name_prefix="image-job")
+        _jobs[job.id] = job
+    _executor.submit(_run, job, render)
+    return job
+
+
+def get(job_id: str) -> Optional[ImageJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def stats() -> Dict:
+    with _jobs_lock:
+        counts = {status: 0 for status in (PENDING, RUNNING, DONE, FAILED)}
+        for job in _jobs.values():
+            counts[job.status] += 1
+    return counts
@@ -1,82 +1,96 @@
 import os
 import json
+import random
 import requests
 from dotenv import load_dotenv
 from openai import OpenAI
-from random import choice
+
+import image_jobs
+from media_store import MediaError, media_url, store_from_url, touch as media_touch
+from prompt_canonical import cached_image, observe, store_image
+from processor.brandsampler import BrandSampler, favorite_brands
+from processor.clotheselector import get_category
 
 load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
+# USE_STUB_APIS=1 points both clients at stub_servers.py (explicit base URLs still win)
+USE_STUB_APIS = os.getenv("USE_STUB_APIS") == "1"
+STUB_BASE_URL = os.getenv("STUB_BASE_URL", "http://127.0.0.1:8100/v1")
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or ("stub" if USE_STUB_APIS else None)
+TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY") or ("stub" if USE_STUB_APIS else None)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or (STUB_BASE_URL if USE_STUB_APIS else None)
+TOGETHER_BASE_URL = (os.getenv("TOGETHER_BASE_URL")
+                     or (STUB_BASE_URL if USE_STUB_APIS else "https://api.together.xyz/v1")).rstrip("/")
 
+openai_client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) if OPENAI_API_KEY else None
 
-# CATEGORY MAPPING
+# Download generated images into media_store instead of returning provider URLs
+SELF_HOST_IMAGES = os.getenv("SELF_HOST_IMAGES", "1") == "1"
 
-CATEGORIES = {
-    "top": ["t-shirt", "shirt", "hoodie", "jumper", "sweater", "top", "sweatshirt",
-            "tank_top", "cardigan", "blouse", "bodysuit", "polo"],
-    "pants": ["pants", "trousers", "jeans", "jorts", "skirt", "leggings",
-              "joggers", "jogger", "shorts", "dress"],
-    "layer": ["jacket", "coat", "blazer", "overshirt", "parka", "vest", "bomber"]
+# Progressive mode: cheap preview first, full render as a background image job
+FULL_IMAGE = {"width": 768, "height": 1024, "steps": 4}
+PREVIEW_IMAGE = {
+    "width": int(os.getenv("PREVIEW_IMAGE_WIDTH", "384")),
+    "height": int(os.getenv("PREVIEW_IMAGE_HEIGHT", "512")),
+    "steps": int(os.getenv("PREVIEW_IMAGE_STEPS", "1")),
 }
 
-def get_category(raw: str) -> str | None:
-    raw = raw.lower().strip()
-    for cat, variants in CATEGORIES.items():
-        if raw in variants or any(v in raw for v in variants):
-            return cat
-    return None
+# Collapse near-duplicate products (same image across URLs/brands) before selection
+COLLAPSE_DUPLICATES = os.getenv("COLLAPSE_DUPLICATES", "1") == "1"
 
 
 # ITEM SELECTION
-def select_item(items: list, category: str, filters: dict) -> dict | None:
-    gender = filters.get("gender", "man")
-    style = filters.get("style", "casual")
-    brand = filters.get("brand")
-
-    matches = [i for i in items
-               if get_category(i.get("category", "")) == category
-               and i.get("gender") == gender]
-
-    if not matches:
-        matches = [i for i in items if get_category(i.get("category", "")) == category]
-
-    if not matches:
-        return None
-
-    # Prefer brand
-    if brand:
-        branded = [m for m in matches if m.get("brand", "").lower() == brand.lower()]
-        if branded:
-            matches = branded
 
-    # Prefer style
-    styled = [m for m in matches if m.get("style") == style]
-    if styled:
-        matches = styled
-
-    return choice(matches)
+# Partitioned by (slot, gender, style); rebuilt when the catalog backend reloads
+_brand_sampler = BrandSampler(categorize=get_category)
+
+
+def select_item(items: list, category: str, filters: dict, rng=None, clusters: dict | None = None) -> dict | None:
+    """
+    Pick one item for a slot. Gender and style are preferred as before; brands are
+    weighted by favorite rank (other brands keep a fallback weight) instead of
+    hard-filtering to the first favorite. clusters: near-duplicates to collapse.
+    """
+    _brand_sampler.ensure(items, clusters)
+    return _brand_sampler.sample(
+        category,
+        filters.get("gender", "man"),
+        filters.get("style", "casual"),
+        favorite_brands(filters),
+        rng
+    )
 
 
 # MAIN PIPELINE
 
-def generate_outfit_pipeline(user_data: dict) -> dict:
+def generate_outfit_pipeline(user_data: dict, seed: int | None = None, progressive: bool = False) -> dict:
+    """
+    seed: optional; one random.Random(seed) drives every random choice in the request
+    (palettes, items, shoe), so the same request + seed yields the same outfit and prompt.
+    progressive: return a low-step preview as image_url and render the full image in
+    the background; poll image_jobs via image_job_id for the final URL.
+    """
 
     if not openai_client:
         raise RuntimeError("OPENAI_API_KEY missing")
 
+    rng = random.Random(seed)
+
     from body_measurements import compute_body_measurements
     from sanzo_wada_colors import get_current_season, get_two_color_palettes, format_color_palette_for_prompt
     from prompts import (
         build_style_extraction_prompt, build_semantic_filters,
-        build_image_prompt, build_styling_tips_prompt,
+        build_styling_tips_prompt,
         build_outfit_description, validate_user_data,
         generate_ai_shoe_description, safe_get_colors
     )
-    from local.local_store import load_all_items
+    from catalog import get_backend
+    from processor.outfitassembler import (
+        MAX_REPEATS, SAMPLE_TOP_N, assemble_outfits, assemble_from_graph, pick_outfit
+    )
+    from processor.compatgraph import get_graph
+    from processor.imagededup import get_representatives
 
     # Validate
     validate_user_data(user_data)
@@ -96,11 +110,15 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
 
     # Style extraction
     style_prompt = build_style_extraction_prompt(user_data)
-    style_keywords = extract_style_keywords(style_prompt)
+    style_keywords = extract_style_keywords(style_prompt, seed)
     print(f"Style keywords: {style_keywords.get('style_keywords', [])}")
 
     # Get Sanzo Wada color palettes
-    primary_palette, alt_palette = get_two_color_palettes(style_keywords.get('style_keywords', ['casual']))
+    primary_palette, alt_palette = get_two_color_palettes(
+        style_keywords.get('style_keywords', ['casual']),
+        rng=rng,
+        avoid_recent=seed is None
+    )
     print(f"Palette: {primary_palette['name']} ({primary_palette['mood']})")
     print(f"Alt palette: {alt_palette['name']}")
 
@@ -108,16 +126,36 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
     filters = build_semantic_filters(style_keywords, user_data, season)
     print(f"Filters: {filters}")
 
-    # Load items
-    all_items = load_all_items()
+    # Load items (CATALOG_BACKEND; the memory default is load_all_items itself)
+    catalog = get_backend()
+    all_items = catalog.all_items()
     print(f"Loaded {len(all_items)} items")
 
-    # Select outfit
-    selected_items = {
-        "top": select_item(all_items, "top", filters),
-        "pants": select_item(all_items, "pants", filters),
-        "layer": select_item(all_items, "layer", filters)
-    }
+    # One item per near-duplicate cluster, chosen after the gender/style filtering
+    # inside the assemblers (no-op until processor.imagededup has run)
+    clusters = (get_representatives() or None) if COLLAPSE_DUPLICATES else None
+
+    # Select outfit - ranked combinations scored against the primary palette, then a
+    # score-weighted pick among the best (diversified) ones so requests vary.
+    # The precomputed compatibility graph (if built) replaces the cross-slot scan.
+    graph = get_graph()
+    outfits = []
+    if graph is not None:
+        outfits = assemble_from_graph(graph, catalog.get_item, filters, primary_palette, rng=rng,
+                                      max_results=SAMPLE_TOP_N, max_repeats=MAX_REPEATS, clusters=clusters)
+    if not outfits:
+        outfits = assemble_outfits(all_items, filters, primary_palette, rng=rng,
+                                   max_results=SAMPLE_TOP_N, max_repeats=MAX_REPEATS, clusters=clusters)
+    if outfits:
+        outfit = pick_outfit(outfits, rng)
+        print(f"Outfit score: {outfit['score']} (best {outfits[0]['score']} of {len(outfits)})")
+        selected_items = {key: outfit.get(key) for key in ("top", "pants", "layer")}
+    else:
+        selected_items = {
+            "top": select_item(all_items, "top", filters, rng, clusters),
+            "pants": select_item(all_items, "pants", filters, rng, clusters),
+            "layer": select_item(all_items, "layer", filters, rng, clusters)
+        }
 
     # Log with colors and URLs
     for key, item in selected_items.items():
@@ -141,24 +179,47 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
         gender=filters.get('gender', 'man'),
         outfit_colors=outfit_colors,
         season=season,
-        body_type=user_data.get('body_type', 'average')
+        body_type=user_data.get('body_type', 'average'),
+        rng=rng
     )
     print(f"Shoe: {ai_shoe.get('description')} ({ai_shoe.get('fit')})")
 
     # Generate image with all features
     image_url = None
+    image_job = None
+    prompt_key = None
     if TOGETHER_API_KEY:
         try:
-            prompt = build_image_prompt(
+            # Quantized prompt (see prompt_canonical) so similar requests reuse one image
+            prompt_key, prompt = observe(
                 user_data,
                 selected_items,
                 ai_shoe,
                 measurements,
                 primary_palette
             )
-            print(f"Prompt ({len(prompt)} chars)")
-            image_url = generate_image(prompt)
-            print(f"Image generated!")
+            print(f"Prompt ({len(prompt)} chars), key {prompt_key}")
+            image_url = cached_image(prompt_key, seed)
+            if image_url and not media_touch(image_url):
+                # Self-hosted file was pruned since it was cached
+                image_url = None
+            if image_url:
+                print("Image cache hit!")
+            elif progressive:
+                try:
+                    image_url = render_image(prompt, seed, **PREVIEW_IMAGE)
+                except Exception as e:
+                    # The full render is still worth having without a preview
+                    print(f"⚠️ Preview failed, full image only: {e}")
+                    image_url = None
+                image_job = image_jobs.submit(
+                    lambda: render_image(prompt, seed, cache_key=prompt_key, **FULL_IMAGE),
+                    preview_url=image_url
+                )
+                print(f"Full image job {image_job.id} (preview: {'yes' if image_url else 'no'})")
+            else:
+                image_url = render_image(prompt, seed, cache_key=prompt_key, **FULL_IMAGE)
+                print(f"Image generated!")
         except Exception as e:
             print(f"Image failed: {e}")
 
@@ -171,6 +232,9 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
     return {
         "outfit_description": build_outfit_description(selected_items, ai_shoe),
         "image_url": image_url,
+        "image_job_id": image_job.id if image_job else None,
+        "image_status": image_job.status if image_job else ("done" if image_url else None),
+        "prompt_key": prompt_key,
         "styling_tips": tips,
         "measurements": measurements,
         "product_links": product_links,
@@ -178,7 +242,8 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
         "ai_shoe": ai_shoe,
         "season": season,
         "color_palette": format_color_palette_for_prompt(primary_palette),
-        "alternative_palette": format_color_palette_for_prompt(alt_palette)
+        "alternative_palette": format_color_palette_for_prompt(alt_palette),
+        "seed": seed
     }
 
 
@@ -186,14 +251,17 @@ def generate_outfit_pipeline(user_data: dict) -> dict:
 # LLM CALLS
 # =============================================================================
 
-def extract_style_keywords(prompt: str) -> dict:
+def extract_style_keywords(prompt: str, seed: int | None = None) -> dict:
     try:
+        # OpenAI's seed is best-effort determinism for the keyword extraction
+        extra = {"seed": seed} if seed is not None else {}
         resp = openai_client.chat.completions.create(
             model="gpt-5-mini",
             messages=[
                 {"role": "system", "content": "Return JSON only."},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            **extra
         )
         content = resp.choices[0].message.content.strip()
         if "```" in content:
@@ -203,24 +271,50 @@ def extract_style_keywords(prompt: str) -> dict:
         return {"style_keywords": ["casual"], "color_preferences": ["black"]}
 
 
-def generate_image(prompt: str) -> str:
+def generate_image(prompt: str, seed: int | None = None,
+                   width: int = 768, height: int = 1024, steps: int = 4) -> str:
+    payload = {
+        "model": "black-forest-labs/FLUX.1-schnell",
+        "prompt": prompt,
+        "width": width,
+        "height": height,
+        "steps": steps,
+        "n": 1
+    }
+    if seed is not None:
+        payload["seed"] = seed
+
     resp = requests.post(
-        "https://api.together.xyz/v1/images/generations",
+        f"{TOGETHER_BASE_URL}/images/generations",
         headers={"Authorization": f"Bearer {TOGETHER_API_KEY}", "Content-Type": "application/json"},
-        json={
-            "model": "black-forest-labs/FLUX.1-schnell",
-            "prompt": prompt,
-            "width": 768,
-            "height": 1024,
-            "steps": 4,
-            "n": 1
-        },
+        json=payload,
         timeout=60
     )
     resp.raise_for_status()
     return resp.json()["data"][0]["url"]
 
 
+def self_host(image_url: str) -> str:
+    """Provider URLs expire: keep our own copy and hand out /media/... (if enabled)."""
+    if not SELF_HOST_IMAGES:
+        return image_url
+    try:
+        return media_url(store_from_url(image_url))
+    except MediaError as e:
+        print(f"Image self-hosting failed, using provider URL: {e}")
+        return image_url
+
+
+def render_image(prompt: str, seed: int | None = None, cache_key: str | None = None, **size) -> str:
+    """generate_image + self_host; self-hosted results are cached under cache_key."""
+    provider_url = generate_image(prompt, seed, **size)
+    image_url = self_host(provider_url)
+    if cache_key and image_url != provider_url:
+        # Provider URLs expire, so only our own copies are worth caching
+        store_image(cache_key, image_url, seed)
+    return image_url
+
+
 def generate_tips(prompt: str) -> str:
     try:
         resp = openai_client.chat.completions.create(
@@ -2,14 +2,18 @@
 Local module - JSON-based clothing database.
 """
 
-from .local_store import load_all_items, get_items_by_category, get_items_by_brand, get_items_by_gender
+from .local_store import load_all_items, iter_items, get_items_by_category, get_items_by_brand, get_items_by_gender
 from .local_query import query, semantic_query
+from .local_index import get_index, CatalogIndex
 
 __all__ = [
     'load_all_items',
+    'iter_items',
     'get_items_by_category', 
     'get_items_by_brand',
     'get_items_by_gender',
     'query',
-    'semantic_query'
+    'semantic_query',
+    'get_index',
+    'CatalogIndex'
 ]
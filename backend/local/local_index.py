@@ -0,0 +1,216 @@
+"""
+Local Index - In-memory inverted index over the loaded catalog.
+
+Postings (sorted catalog positions) per gender, brand, category, style and color
+name. Filters have the same semantics as local_query.query, but are answered by
+intersecting postings instead of rescanning every item.
+"""
+
+import json
+from typing import Dict, List, Optional
+
+from .local_query import color_near_filter
+from .local_store import brand_key, load_all_items
+
+INDEXED_FIELDS = ("gender", "brand", "category", "style")
+FACET_FIELDS = INDEXED_FIELDS + ("colors",)
+
+# Filtered facet results kept per index (dropped with the index on reload)
+MAX_CACHED_STATS = 256
+
+_index = None
+_index_version = 0
+
+
+def field_value(item: Dict, field: str) -> str:
+    """Facet / posting value of an indexed field (brands as brand keys)."""
+    value = str(item.get(field, "") or "")
+    return brand_key(value) if field == "brand" else value.lower()
+
+
+class CatalogIndex:
+
+    def __init__(self, items: List[Dict], version: int):
+        self.items = items
+        self.version = version
+        self.postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in INDEXED_FIELDS}
+        self.color_postings: Dict[str, List[int]] = {}
+        self.prices: List[float] = []
+        self.item_colors: List[List[str]] = []
+
+        # Facet counts are accumulated in the same pass that builds the postings
+        self.facets: Dict[str, Dict[str, int]] = {field: {} for field in FACET_FIELDS}
+        self._stats_cache: Dict[str, Dict] = {}
+        self._id_order: Optional[List[int]] = None
+        self._id_rank: List[int] = []
+
+        for pos, item in enumerate(items):
+            for field in INDEXED_FIELDS:
+                value = field_value(item, field)
+                self.postings[field].setdefault(value, []).append(pos)
+                self.facets[field][value] = self.facets[field].get(value, 0) + 1
+
+            colors = item.get("colors", [])
+            if isinstance(colors, str):
+                colors = [colors]
+            unique_colors = sorted({c.lower() for c in colors})
+            self.item_colors.append(unique_colors)
+            for color in unique_colors:
+                self.color_postings.setdefault(color, []).append(pos)
+                self.facets["colors"][color] = self.facets["colors"].get(color, 0) + 1
+
+            try:
+                self.prices.append(float(item.get("price_eur", 0)))
+            except (TypeError, ValueError):
+                self.prices.append(0.0)
+
+    # -------------------------------------------------------------------------
+    # Postings per filter
+    # -------------------------------------------------------------------------
+
+    def _filter_postings(self, filters: Dict) -> List[List[int]]:
+        """One posting list per active filter; the result is their intersection."""
+        lists = []
+
+        if filters.get("gender"):
+            gender = filters["gender"].lower()
+            by_gender = self.postings["gender"]
+            merged = set(by_gender.get(gender, [])) | set(by_gender.get("unisex", []))
+            lists.append(sorted(merged))
+
+        if filters.get("brand"):
+            lists.append(self.postings["brand"].get(brand_key(filters["brand"]), []))
+
+        for field in ("category", "style"):
+            if filters.get(field):
+                lists.append(self.postings[field].get(filters[field].lower(), []))
+
+        if filters.get("colors"):
+            color_filter = filters["colors"]
+            if isinstance(color_filter, str):
+                color_filter = [color_filter]
+            color_filter = [c.lower() for c in color_filter]
+
+            # Substring semantics of local_query, resolved against the color vocabulary
+            merged = set()
+            for color, positions in self.color_postings.items():
+                if any(fc in color or color in fc for fc in color_filter):
+                    merged.update(positions)
+            lists.append(sorted(merged))
+
+        return lists
+
+    def match_positions(self, filters: Dict) -> List[int]:
+        """Sorted catalog positions matching filters (local_query.query semantics)."""
+        lists = self._filter_postings(filters)
+
+        if lists:
+            lists.sort(key=len)
+            result = set(lists[0])
+            for postings in lists[1:]:
+                if not result:
+                    break
+                result.intersection_update(postings)
+            positions = sorted(result)
+        else:
+            positions = list(range(len(self.items)))
+
+        if filters.get("price_min"):
+            min_price = float(filters["price_min"])
+            positions = [p for p in positions if self.prices[p] >= min_price]
+
+        if filters.get("price_max"):
+            max_price = float(filters["price_max"])
+            positions = [p for p in positions if self.prices[p] <= max_price]
+
+        near = color_near_filter(filters)
+        if near is not None:
+            positions = [p for p in positions if near(self.items[p])]
+
+        return positions
+
+    def query(self, filters: Dict) -> List[Dict]:
+        return [self.items[p] for p in self.match_positions(filters)]
+
+    def by_id(self, positions: List[int]) -> List[int]:
+        """
+        Positions re-sorted by item id. The id order of the whole catalog is
+        built once per index; a subset is then sorted by precomputed rank.
+        """
+        if self._id_order is None:
+            order = sorted(range(len(self.items)), key=lambda p: str(self.items[p].get("id", "")))
+            rank = [0] * len(order)
+            for r, p in enumerate(order):
+                rank[p] = r
+            self._id_order, self._id_rank = order, rank
+        if len(positions) == len(self._id_order):
+            return self._id_order
+        return sorted(positions, key=self._id_rank.__getitem__)
+
+    # -------------------------------------------------------------------------
+    # Facets
+    # -------------------------------------------------------------------------
+
+    def stats(self, filters: Optional[Dict] = None) -> Dict:
+        """
+        Totals and facet counts (gender, brand, category, style, colors).
+        Unfiltered stats are precomputed at load (O(1) per call). Filtered stats
+        cost O(matching items) the first time a filter combination is seen, since
+        every match is counted once; repeats come from a per-index cache
+        (MAX_CACHED_STATS entries, dropped on reload).
+        """
+        active = {k: v for k, v in (filters or {}).items() if v}
+        if not active:
+            return {"total": len(self.items), "facets": self.facets}
+
+        key = json.dumps(active, sort_keys=True, default=str)
+        cached = self._stats_cache.get(key)
+        if cached is not None:
+            return cached
+
+        positions = self.match_positions(active)
+        facets: Dict[str, Dict[str, int]] = {field: {} for field in FACET_FIELDS}
+        for pos in positions:
+            item = self.items[pos]
+            for field in INDEXED_FIELDS:
+                value = field_value(item, field)
+                facets[field][value] = facets[field].get(value, 0) + 1
+            for color in self.item_colors[pos]:
+                facets["colors"][color] = facets["colors"].get(color, 0) + 1
+
+        result = {"total": len(positions), "facets": facets}
+        if len(self._stats_cache) >= MAX_CACHED_STATS:
+            self._stats_cache.clear()
+        self._stats_cache[key] = result
+        return result
+
+
+def get_index(force_reload: bool = False) -> CatalogIndex:
+    """Index over load_all_items(); rebuilt whenever the catalog is reloaded."""
+    global _index, _index_version
+
+    items = load_all_items(force_reload=force_reload)
+    if _index is None or _index.items is not items:
+        _index_version += 1
+        _index = CatalogIndex(items, _index_version)
+
+    return _index
+
+
+# =============================================================================
+# TESTING
+# =============================================================================
+
+if __name__ == "__main__":
+    from .local_query import query
+
+    index = get_index()
+    items = index.items
+
+    for filters in [{"gender": "man"}, {"brand": "massimo-dutti"}, {"colors": ["blue", "grey"]},
+                    {"gender": "woman", "style": "smart", "price_max": 60}]:
+        same = index.query(filters) == query(items, filters)
+        print(f"{filters}: {len(index.query(filters))} items, matches local_query: {same}")
+
+    stats = index.stats({"gender": "man"})
+    print(f"Stats gender=man: {stats['total']} items, styles: {stats['facets']['style']}")
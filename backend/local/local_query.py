@@ -5,6 +5,31 @@ Replaces PostgreSQL queries for local development.
 
 from typing import List, Dict, Optional
 
+from .local_store import brand_key
+
+# Default max CIE76 distance for the color_near filter
+DEFAULT_COLOR_TOLERANCE = 20.0
+
+
+def color_near_filter(filters: Dict):
+    """
+    Predicate for the numeric color filter (None if not set).
+    Matches items with any color within color_tolerance ΔE of color_near,
+    using dominant image colors when present and color names otherwise.
+    """
+    if not filters.get("color_near"):
+        return None
+
+    from colorlab import delta_e, item_labs, parse_color_value
+
+    target = parse_color_value(filters["color_near"])
+    tolerance = float(filters.get("color_tolerance") or DEFAULT_COLOR_TOLERANCE)
+
+    def near(item):
+        return any(delta_e(lab, target) <= tolerance for lab in item_labs(item))
+
+    return near
+
 
 def query(items: List[Dict], filters: Dict) -> List[Dict]:
     """
@@ -18,6 +43,8 @@ def query(items: List[Dict], filters: Dict) -> List[Dict]:
     - colors: single color or list of colors
     - price_min: minimum price (EUR)
     - price_max: maximum price (EUR)
+    - color_near: hex ("#1F2A44"), color name or Lab triple
+    - color_tolerance: max ΔE for color_near (default 20)
     """
     results = items.copy()
 
@@ -32,10 +59,10 @@ def query(items: List[Dict], filters: Dict) -> List[Dict]:
 
     # Filter by brand
     if filters.get("brand"):
-        brand = filters["brand"].lower().replace("-", "_").replace(" ", "_")
+        brand = brand_key(filters["brand"])
         results = [
             i for i in results
-            if i.get("brand", "").lower().replace("-", "_").replace(" ", "_") == brand
+            if brand_key(i.get("brand", "")) == brand
         ]
 
     # Filter by category
@@ -91,6 +118,11 @@ def query(items: List[Dict], filters: Dict) -> List[Dict]:
             if float(i.get("price_eur", 0)) <= max_price
         ]
 
+    # Filter by numeric color distance
+    near = color_near_filter(filters)
+    if near is not None:
+        results = [i for i in results if near(i)]
+
     return results
 
 
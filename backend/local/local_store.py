@@ -6,12 +6,20 @@ Replaces PostgreSQL database for local development.
 import os
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 
 # Cache for loaded items
 _items_cache: List[Dict] = []
+_items_by_id_cache: Dict[str, Dict] = {}
 _cache_loaded: bool = False
 
+# Tooling folders that may sit inside Haine; generated data lives in "_"-prefixed
+# folders (e.g. _index), which list_catalog_files skips separately
+SKIP_PARTS = ["node_modules", ".next", "__pycache__"]
+
+# Sidecar written by processor.dominantcolors, relative to the Haine folder
+DOMINANT_COLORS_FILE = Path("_index") / "dominant_colors.json"
+
 
 def get_haine_folder() -> Path:
     """Find the Haine folder relative to the backend."""
@@ -34,58 +42,43 @@ def get_haine_folder() -> Path:
     return fallback
 
 
-def load_all_items(force_reload: bool = False) -> List[Dict]:
-    """
-    Load all items from JSON files in the Haine folder and its subfolders.
-
-    Structure expected:
-    Haine/
-    ├── zara.json
-    ├── bershka.json
-    ├── hm.json
-    └── brand_folders/
-        └── items.json
-    """
-    global _items_cache, _cache_loaded
-
-    if _cache_loaded and not force_reload:
-        return _items_cache
-
-    items = []
-    haine_folder = get_haine_folder()
-
-    if not haine_folder.exists():
-        print(f"⚠️ Haine folder not found at {haine_folder}")
-        return []
-
+def list_catalog_files(haine_folder: Path = None) -> List[Path]:
+    """All brand JSON files under the Haine folder, in a stable order."""
+    haine_folder = haine_folder or get_haine_folder()
     json_files = []
 
-    # Find all JSON files
-    for file in haine_folder.rglob("*.json"):
-        # Skip node_modules, .next, etc.
-        if any(skip in str(file) for skip in ["node_modules", ".next", "__pycache__"]):
+    for file in sorted(haine_folder.rglob("*.json")):
+        relative = file.relative_to(haine_folder)
+        # Skip node_modules, .next, etc. and generated folders like _index
+        if any(skip in str(file) for skip in SKIP_PARTS):
+            continue
+        if any(part.startswith("_") for part in relative.parts[:-1]):
             continue
         json_files.append(file)
 
-    # Load each JSON file
-    for json_file in json_files:
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-                if isinstance(data, list):
-                    items.extend(data)
-                elif isinstance(data, dict):
-                    # Single item or wrapped list
-                    if "items" in data:
-                        items.extend(data["items"])
-                    else:
-                        items.append(data)
-
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON error in {json_file.name}: {e}")
-        except Exception as e:
-            print(f"⚠️ Error loading {json_file.name}: {e}")
+    return json_files
+
+
+def read_catalog_file(json_file: Path) -> List[Dict]:
+    """Load and normalize the items of one brand JSON file."""
+    items = []
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+            if isinstance(data, list):
+                items.extend(data)
+            elif isinstance(data, dict):
+                # Single item or wrapped list
+                if "items" in data:
+                    items.extend(data["items"])
+                else:
+                    items.append(data)
+
+    except json.JSONDecodeError as e:
+        print(f"⚠️ JSON error in {json_file.name}: {e}")
+    except Exception as e:
+        print(f"⚠️ Error loading {json_file.name}: {e}")
 
     # Ensure all items have required fields
     valid_items = []
@@ -119,7 +112,72 @@ def load_all_items(force_reload: bool = False) -> List[Dict]:
 
         valid_items.append(item)
 
+    return valid_items
+
+
+def load_dominant_colors(haine_folder: Path = None) -> Dict[str, Dict]:
+    """Item id -> {"brand", "colors"} from the dominant colors sidecar ({} if not built)."""
+    path = (haine_folder or get_haine_folder()) / DOMINANT_COLORS_FILE
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("items", {})
+    except Exception as e:
+        print(f"⚠️ Error loading {path.name}: {e}")
+        return {}
+
+
+def brand_key(brand: str) -> str:
+    """Brand as matched everywhere: lowercase, "-" and " " -> "_" ("Massimo Dutti" -> "massimo_dutti")."""
+    return (brand or "").lower().replace("-", "_").replace(" ", "_")
+
+
+def merge_dominant_colors(items: List[Dict], dominant: Dict[str, Dict]) -> None:
+    """Attach item["dominant_colors"] (hex + Lab, heaviest first) next to the color names."""
+    if not dominant:
+        return
+    for item in items:
+        entry = dominant.get(str(item["id"]))
+        brand = brand_key(str(item.get("brand", "")))
+        if entry and entry.get("colors") and entry.get("brand") == brand:
+            item["dominant_colors"] = entry["colors"]
+
+
+def load_all_items(force_reload: bool = False) -> List[Dict]:
+    """
+    Load all items from JSON files in the Haine folder and its subfolders.
+
+    Structure expected:
+    Haine/
+    ├── zara.json
+    ├── bershka.json
+    ├── hm.json
+    └── brand_folders/
+        └── items.json
+    """
+    global _items_cache, _items_by_id_cache, _cache_loaded
+
+    if _cache_loaded and not force_reload:
+        return _items_cache
+
+    haine_folder = get_haine_folder()
+
+    if not haine_folder.exists():
+        print(f"⚠️ Haine folder not found at {haine_folder}")
+        return []
+
+    json_files = list_catalog_files(haine_folder)
+
+    valid_items = []
+    seen_ids = set()
+    for json_file in json_files:
+        valid_items.extend(unique_ids(read_catalog_file(json_file), seen_ids))
+
+    merge_dominant_colors(valid_items, load_dominant_colors(haine_folder))
+
     _items_cache = valid_items
+    _items_by_id_cache = {item["id"]: item for item in valid_items}
     _cache_loaded = True
 
     print(f"✓ Loaded {len(valid_items)} items from {len(json_files)} JSON files")
@@ -127,6 +185,40 @@ def load_all_items(force_reload: bool = False) -> List[Dict]:
     return valid_items
 
 
+def iter_items() -> Iterator[Dict]:
+    """
+    Stream items file by file without filling the cache.
+    Memory is bounded by the largest brand file, not the whole catalog.
+    """
+    dominant = load_dominant_colors()
+    seen_ids = set()
+    for json_file in list_catalog_files():
+        items = read_catalog_file(json_file)
+        merge_dominant_colors(items, dominant)
+        yield from unique_ids(items, seen_ids)
+
+
+def unique_ids(items: Iterable[Dict], seen: Optional[Set[str]] = None) -> Iterator[Dict]:
+    """
+    Items whose id was not seen before; later duplicates are skipped with a
+    warning, so every backend can page by id alone.
+    """
+    seen = set() if seen is None else seen
+    for item in items:
+        item_id = str(item["id"])
+        if item_id in seen:
+            print(f"⚠️ Duplicate item id {item_id}, keeping the first")
+            continue
+        seen.add(item_id)
+        yield item
+
+
+def get_item_by_id(item_id: str) -> Optional[Dict]:
+    """Get a single item by its catalog id."""
+    load_all_items()
+    return _items_by_id_cache.get(item_id)
+
+
 def get_items_by_category(category: str) -> List[Dict]:
     """Get all items matching a category."""
     items = load_all_items()
@@ -147,8 +239,9 @@ def get_items_by_gender(gender: str) -> List[Dict]:
 
 def clear_cache():
     """Clear the items cache."""
-    global _items_cache, _cache_loaded
+    global _items_cache, _items_by_id_cache, _cache_loaded
     _items_cache = []
+    _items_by_id_cache = {}
     _cache_loaded = False
 
 
@@ -1,21 +1,39 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
+from urllib.parse import urlencode
+from contextlib import asynccontextmanager
+import asyncio
+import random
 import traceback
+import json
 import os
 
+import image_jobs
 from input_parser import parse_user_input_flexible
 from body_measurements import compute_body_measurements
 from llm_service import generate_outfit_pipeline
 from sanzo_wada_colors import get_current_season
 from prompts import VALID_BODY_TYPES
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the async DB pool if a request opened it
+    try:
+        from database import asyncdb
+    except Exception:
+        return
+    await asyncdb.close()
+
+
 app = FastAPI(
     title="AI Fashion Outfit Generator",
     version="1.6.7",
-    description="Outfit generation with real products + AI-generated shoes"
+    description="Outfit generation with real products + AI-generated shoes",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -36,6 +54,8 @@ class GenerateOutfitRequest(BaseModel):
     user_message: str = Field(..., description="Natural language style description")
     body_type: str = Field(..., description="Body type from dropdown")
     user_name: str = Field(default="User", description="Optional user name")
+    seed: Optional[int] = Field(default=None, description="Optional seed for reproducible outfit, palette and prompt")
+    progressive: bool = Field(default=False, description="Return a fast preview image; full image via /image-jobs/{id}")
 
 
 class OutfitItem(BaseModel):
@@ -81,6 +101,10 @@ class GenerateOutfitResponse(BaseModel):
     product_links: ProductLinks
     selected_items: Optional[SelectedItems] = None
     ai_shoe: Optional[Dict[str, Any]] = None  # AI generated shoe
+    seed: Optional[int] = None
+    preview_url: Optional[str] = None  # Instant composite of the product images
+    image_job_id: Optional[str] = None  # Progressive mode: full image still rendering
+    image_status: Optional[str] = None
 
 
 # =============================================================================
@@ -100,13 +124,33 @@ async def root():
             "Clothing overlay rendering",
             "Product link integration (clothing only)"
         ],
-        "endpoints": ["/generate-outfit", "/health", "/docs"]
+        "endpoints": ["/generate-outfit", "/items", "/catalog/stats", "/db/outfit", "/outfit-preview",
+                      "/product-image/{item_id}", "/media/{name}", "/image-jobs/{job_id}", "/image-jobs/{job_id}/events",
+                      "/prompt-cache/metrics", "/health", "/docs"]
     }
 
 
 @app.get("/health")
 async def health_check():
     """Health check with system status."""
+    try:
+        from database import dbpool
+        db_pool = dbpool.metrics()
+    except Exception:
+        db_pool = None
+
+    try:
+        from database import dbcache
+        db_cache = dbcache.metrics()
+    except Exception:
+        db_cache = None
+
+    try:
+        from database import asyncdb
+        async_db_pool = asyncdb.metrics()
+    except Exception:
+        async_db_pool = None
+
     return {
         "status": "healthy",
         "model": "gpt-5-mini",
@@ -114,8 +158,13 @@ async def health_check():
             "openai": "configured" if os.getenv("OPENAI_API_KEY") else "missing",
             "together": "configured" if os.getenv("TOGETHER_API_KEY") else "missing"
         },
+        "stub_apis": os.getenv("USE_STUB_APIS") == "1",
         "current_season": get_current_season(),
-        "shoe_source": "AI Generated"
+        "shoe_source": "AI Generated",
+        "db_pool": db_pool,
+        "async_db_pool": async_db_pool,
+        "db_cache": db_cache,
+        "image_jobs": image_jobs.stats()
     }
 
 
@@ -151,8 +200,10 @@ async def generate_outfit(request: GenerateOutfitRequest):
             sex=user_data["sex"]
         )
 
-        # Generate outfit through pipeline
-        result = generate_outfit_pipeline(user_data)
+        # Generate outfit through pipeline (blocking LLM/image calls: run off the event loop)
+        result = await asyncio.to_thread(
+            generate_outfit_pipeline, user_data, seed=request.seed, progressive=request.progressive
+        )
 
         if not result or "outfit_description" not in result:
             raise ValueError("Outfit generation failed - no description returned")
@@ -187,7 +238,11 @@ async def generate_outfit(request: GenerateOutfitRequest):
                 pants=selected.get('pants'),
                 layer=selected.get('layer')
             ),
-            ai_shoe=ai_shoe
+            ai_shoe=ai_shoe,
+            seed=request.seed,
+            preview_url=outfit_preview_url(selected),
+            image_job_id=result.get("image_job_id"),
+            image_status=result.get("image_status")
         )
 
     except ValueError as e:
@@ -218,20 +273,15 @@ async def generate_outfit(request: GenerateOutfitRequest):
 async def test_local_store():
     """Test local JSON store loading."""
     try:
-        from local.local_store import load_all_items
-
-        items = load_all_items()
+        from local.local_index import get_index
 
-        # Count by category
-        categories = {}
-        for item in items:
-            cat = item.get('category', 'unknown')
-            categories[cat] = categories.get(cat, 0) + 1
+        index = get_index()
+        items = index.items
 
         return {
             "status": "success",
             "total_items": len(items),
-            "categories": categories,
+            "categories": index.facets["category"],
             "sample_items": items[:3] if items else [],
             "note": "Shoes are AI-generated, not from database"
         }
@@ -242,6 +292,301 @@ async def test_local_store():
         }
 
 
+@app.get("/catalog/stats")
+def catalog_stats(
+    gender: Optional[str] = None,
+    brand: Optional[str] = None,
+    category: Optional[str] = None,
+    style: Optional[str] = None,
+    colors: Optional[List[str]] = Query(None),
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    color_near: Optional[str] = Query(None, description="Hex like #1F2A44 or a color name"),
+    color_tolerance: Optional[float] = Query(None, gt=0, description="Max ΔE for color_near (default 20)")
+):
+    """
+    Catalog totals and facet counts by gender, brand, category, style and color,
+    from the CATALOG_BACKEND catalog. On the memory backend unfiltered counts are
+    precomputed at catalog load, and filtered counts cost one pass over the
+    matching items the first time, then are cached until the next reload.
+    Plain def: the backends block (file stats, SQLite, psycopg2), so FastAPI
+    runs this in its threadpool.
+    """
+    from catalog import get_backend
+
+    try:
+        return get_backend().stats({
+            "gender": gender,
+            "brand": brand,
+            "category": category,
+            "style": style,
+            "colors": colors,
+            "price_min": price_min,
+            "price_max": price_max,
+            "color_near": color_near,
+            "color_tolerance": color_tolerance
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "type": "ValueError"})
+
+
+@app.get("/items")
+def list_items(
+    gender: Optional[str] = Query(None, description="man / woman (unisex always included)"),
+    brand: Optional[str] = None,
+    category: Optional[str] = None,
+    style: Optional[str] = None,
+    colors: Optional[List[str]] = Query(None, description="Any-match, substring like local_query"),
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    color_near: Optional[str] = Query(None, description="Hex like #1F2A44 or a color name"),
+    color_tolerance: Optional[float] = Query(None, gt=0, description="Max ΔE for color_near (default 20)"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    stream: bool = Query(False, description="Stream all remaining matches as NDJSON")
+):
+    """
+    Browse the CATALOG_BACKEND catalog with local_query.query filters, in id order.
+    Pages are cursor-based; stream=true returns every match after the cursor as NDJSON.
+    Plain def like catalog_stats: backend calls stay off the event loop.
+    """
+    from catalog import get_backend
+    from catalog.base import InvalidCursor
+
+    filters = {
+        "gender": gender,
+        "brand": brand,
+        "category": category,
+        "style": style,
+        "colors": colors,
+        "price_min": price_min,
+        "price_max": price_max,
+        "color_near": color_near,
+        "color_tolerance": color_tolerance
+    }
+
+    backend = get_backend()
+
+    try:
+        if stream:
+            matches = backend.iter_from(filters, cursor)
+            # Pull the first match now so a bad cursor fails with 400 before streaming starts
+            first = next(matches, None)
+
+            def ndjson():
+                if first is None:
+                    return
+                yield json.dumps(first) + "\n"
+                for item in matches:
+                    yield json.dumps(item) + "\n"
+
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        return backend.page(filters, limit=limit, cursor=cursor)
+
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "type": "InvalidCursor"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "type": "ValueError"})
+
+
+@app.get("/db/outfit")
+async def db_outfit(
+    gender: Optional[str] = None,
+    brand: Optional[str] = None,
+    category: Optional[str] = None,
+    style: Optional[str] = None,
+    per_category: int = Query(1, ge=1, le=100, description="Minimum candidate rows per slot (default pool: DB_SAMPLE_POOL)"),
+    seed: Optional[int] = None
+):
+    """
+    One item per outfit slot sampled from the Postgres clothes table (queryfactory
+    exact-match filters), read through the asyncpg pool so the query doesn't hold
+    the event loop. Same sampling as processquery.process_async, without images:
+    a cached candidate pool per filter combination (DB_SAMPLE_POOL rows per slot),
+    one item per slot picked from it with the seed's rng.
+    """
+    from processor.clotheselector import CATEGORY_MAP, select_outfit_items, validate_outfit
+
+    filters = {k: v for k, v in (("gender", gender), ("brand", brand), ("category", category),
+                                  ("style", style)) if v is not None}
+    rng = random.Random(seed)
+
+    try:
+        from database import asyncdb
+        rows = await asyncdb.sample_pool(filters, CATEGORY_MAP, per_category=per_category)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail={"error": str(e), "type": type(e).__name__,
+                                                     "message": "Database unavailable"})
+
+    outfit = select_outfit_items(rows, rng)
+    is_valid, missing = validate_outfit(outfit)
+    return {"items": outfit, "valid": is_valid, "missing": missing, "seed": seed}
+
+
+def outfit_preview_url(selected: Dict) -> Optional[str]:
+    """
+    Relative /outfit-preview URL for the selected items, or None when no selected
+    item has a product image (the preview would only 404).
+    """
+    from processor.imagestore import get_store
+
+    store = get_store()
+    slots = [
+        (slot, item) for slot, item in (selected or {}).items()
+        if slot in ("top", "pants", "layer") and item and item.get("id")
+    ]
+    if not any(store.path_for(item) for slot, item in slots):
+        return None
+    return f"/outfit-preview?{urlencode({slot: item['id'] for slot, item in slots})}"
+
+
+@app.get("/outfit-preview")
+def outfit_preview(
+        top: Optional[str] = None,
+        pants: Optional[str] = None,
+        layer: Optional[str] = None
+):
+    """
+    WebP board composed from the product images of the given item ids.
+    Plain def: FastAPI runs the disk reads and compositing in its threadpool.
+    """
+    from local.local_store import get_item_by_id
+    from processor.outfitrenderer import render_outfit
+
+    items = {
+        slot: get_item_by_id(item_id) if item_id else None
+        for slot, item_id in (("top", top), ("pants", pants), ("layer", layer))
+    }
+
+    data = render_outfit(items)
+    if data is None:
+        raise HTTPException(status_code=404, detail={"error": "No product images for these items"})
+
+    return Response(
+        content=data,
+        media_type="image/webp",
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+
+@app.get("/product-image/{item_id}")
+def product_image(item_id: str, size: str = Query("card", pattern="^(thumb|card|full|source)$")):
+    """
+    Product image file as stored: the WebP derivative of the requested size when
+    one was built (python -m processor.imagederivatives), the source otherwise.
+    Sent straight from disk, never decoded.
+    """
+    from local.local_store import get_item_by_id
+    from processor.imagestore import get_store
+
+    item = get_item_by_id(item_id)
+    path = get_store().path_for(item, None if size == "source" else size) if item else None
+    if path is None:
+        raise HTTPException(status_code=404, detail={"error": f"No image for item '{item_id}'"})
+
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=86400"})
+
+
+@app.get("/media/{name}")
+def media(
+        name: str,
+        range_header: Optional[str] = Header(None, alias="Range"),
+        if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """
+    Self-hosted generated images (see media_store). Names are content hashes,
+    so the ETag is strong and the response is cacheable forever.
+    """
+    import media_store
+
+    resolved = media_store.resolve(name)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail={"error": f"Unknown media '{name}'"})
+    path, etag, content_type = resolved
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if media_store.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    size = path.stat().st_size
+    try:
+        byte_range = media_store.parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        media_store.iter_file(path, start, end),
+        status_code=status,
+        media_type=content_type,
+        headers=headers
+    )
+
+
+def _get_image_job(job_id: str):
+    job = image_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail={"error": f"Unknown image job '{job_id}'"})
+    return job
+
+
+@app.get("/image-jobs/{job_id}")
+async def image_job_status(job_id: str):
+    """Poll a progressive render: status is pending, running, done or failed."""
+    return _get_image_job(job_id).snapshot()
+
+
+@app.get("/image-jobs/{job_id}/events")
+async def image_job_events(job_id: str):
+    """
+    Server-Sent Events for a progressive render: one "status" event per change,
+    ending with "done" or "failed". Comments keep idle connections alive.
+    Jobs are per process, so this (like polling) needs the worker that ran
+    the pipeline.
+    """
+    job = _get_image_job(job_id)
+    loop = asyncio.get_running_loop()
+
+    async def events():
+        version = -1
+        sent_at = loop.time()
+        while True:
+            if job.version != version:
+                version = job.version
+                snapshot = job.snapshot()
+                event = snapshot["status"] if job.finished else "status"
+                yield f"event: {event}\ndata: {json.dumps(snapshot)}\n\n"
+                if job.finished:
+                    return
+                sent_at = loop.time()
+            elif loop.time() - sent_at >= image_jobs.EVENTS_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                sent_at = loop.time()
+            # Polling keeps idle streams off the thread pool
+            await asyncio.sleep(image_jobs.EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/prompt-cache/metrics")
+async def prompt_cache_metrics():
+    """Image cache hits and the would-be hit rate of every prompt precision (see prompt_canonical)."""
+    import prompt_canonical
+    return prompt_canonical.metrics()
+
+
 # =============================================================================
 # ERROR HANDLERS
 # =============================================================================
@@ -0,0 +1,279 @@
+"""
+Media Store - Self-hosted copies of generated images.
+
+Provider (Flux / Together) URLs are temporary, so each generated image is
+streamed into MEDIA_ROOT right after generation, optionally transcoded to
+WebP, and stored under its content hash. The /media/{name} route serves it
+with a strong ETag (the hash), immutable caching and byte ranges.
+
+Files unused for MEDIA_MAX_AGE_DAYS are pruned, oldest first, and so are
+files beyond MEDIA_MAX_MB in total. Storing checks this at most once per
+PRUNE_INTERVAL; touch() marks a file as used again (prompt cache hits).
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import requests
+
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", str(Path(__file__).resolve().parent.parent / "media")))
+# Prefix for returned URLs, e.g. a CDN origin; empty -> relative /media/... paths
+MEDIA_BASE_URL = os.getenv("MEDIA_BASE_URL", "").rstrip("/")
+MEDIA_WEBP = os.getenv("MEDIA_WEBP", "1") == "1"
+WEBP_QUALITY = int(os.getenv("MEDIA_WEBP_QUALITY", "85"))
+MAX_DOWNLOAD_BYTES = 32 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+MAX_AGE = float(os.getenv("MEDIA_MAX_AGE_DAYS", "30")) * 86400
+MAX_TOTAL_BYTES = int(float(os.getenv("MEDIA_MAX_MB", "2048")) * 1024 * 1024)
+PRUNE_INTERVAL = 3600.0
+STORED_URLS_MAX = 1024
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp"}
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/jpg": "jpg", "image/webp": "webp"}
+NAME_RE = re.compile(r"^([0-9a-f]{64})\.(png|jpg|webp)$")
+
+# Provider URL -> stored name (LRU), so a repeated URL is not downloaded again
+_stored_urls: "OrderedDict[str, str]" = OrderedDict()
+_stored_urls_lock = threading.Lock()
+_pruned_at = 0.0
+
+
+class MediaError(Exception):
+    """Download or transcode failed."""
+
+
+def _finalize(tmp_path: Path, extension: str, digest: str) -> str:
+    name = f"{digest}.{extension}"
+    target = MEDIA_ROOT / name
+    if target.exists():
+        # Same content already stored; keep it from being pruned
+        tmp_path.unlink(missing_ok=True)
+        os.utime(target)
+    else:
+        os.replace(tmp_path, target)
+    return name
+
+
+def _transcode_webp(source: Path) -> Tuple[Path, str]:
+    from PIL import Image
+
+    fd, tmp_name = tempfile.mkstemp(dir=MEDIA_ROOT, suffix=".tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    with Image.open(source) as image:
+        image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+
+    digest = hashlib.sha256()
+    with open(tmp_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return tmp_path, digest.hexdigest()
+
+
+def store_from_url(url: str, webp: bool = MEDIA_WEBP, timeout: float = 60) -> str:
+    """
+    Stream url into the store and return the stored name ("<sha256>.<ext>").
+    The download is hashed while it is written, never held in memory.
+    """
+    with _stored_urls_lock:
+        name = _stored_urls.get(url)
+        if name is not None and (MEDIA_ROOT / name).is_file():
+            _stored_urls.move_to_end(url)
+            return name
+
+    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+    maybe_prune()
+    fd, tmp_name = tempfile.mkstemp(dir=MEDIA_ROOT, suffix=".tmp")
+    tmp_path = Path(tmp_name)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out, requests.get(url, stream=True, timeout=timeout) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            extension = EXTENSIONS.get(content_type, "png")
+
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_DOWNLOAD_BYTES:
+                    raise MediaError(f"Image larger than {MAX_DOWNLOAD_BYTES} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+
+        if webp and extension != "webp":
+            webp_path, webp_digest = _transcode_webp(tmp_path)
+            tmp_path.unlink(missing_ok=True)
+            tmp_path = webp_path
+            name = _finalize(tmp_path, "webp", webp_digest)
+        else:
+            name = _finalize(tmp_path, extension, digest.hexdigest())
+
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        if isinstance(e, MediaError):
+            raise
+        raise MediaError(f"Could not store {url}: {e}") from e
+
+    with _stored_urls_lock:
+        _stored_urls[url] = name
+        _stored_urls.move_to_end(url)
+        while len(_stored_urls) > STORED_URLS_MAX:
+            _stored_urls.popitem(last=False)
+    return name
+
+
+def touch(url: str) -> bool:
+    """
+    Mark a self-hosted URL as used so pruning keeps it. False if it points to
+    a file that is gone; other URLs are left alone and count as present.
+    """
+    prefix = f"{MEDIA_BASE_URL}/media/"
+    if not url or not url.startswith(prefix):
+        return True
+    resolved = resolve(url[len(prefix):])
+    if resolved is None:
+        return False
+    try:
+        os.utime(resolved[0])
+    except OSError:
+        return False
+    return True
+
+
+def prune(max_age: float = MAX_AGE, max_bytes: int = MAX_TOTAL_BYTES) -> int:
+    """
+    Delete stored files unused for max_age seconds, then the oldest ones
+    until the rest fit in max_bytes; stale temp files go too. Returns the
+    number of files deleted.
+    """
+    if not MEDIA_ROOT.is_dir():
+        return 0
+
+    now = time.time()
+    files = []
+    removed = 0
+    for path in MEDIA_ROOT.iterdir():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if path.suffix == ".tmp":
+            # Left behind by a crashed download
+            if now - stat.st_mtime > PRUNE_INTERVAL:
+                path.unlink(missing_ok=True)
+                removed += 1
+        elif NAME_RE.match(path.name):
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for mtime, size, path in files:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def maybe_prune():
+    """prune() at most once per PRUNE_INTERVAL per process."""
+    global _pruned_at
+    with _stored_urls_lock:
+        if time.monotonic() - _pruned_at < PRUNE_INTERVAL:
+            return
+        _pruned_at = time.monotonic()
+    try:
+        removed = prune()
+    except OSError as e:
+        print(f"⚠️ Media prune failed: {e}")
+        return
+    if removed:
+        print(f"Pruned {removed} media files from {MEDIA_ROOT}")
+
+
+def media_url(name: str) -> str:
+    return f"{MEDIA_BASE_URL}/media/{name}"
+
+
+def resolve(name: str) -> Optional[Tuple[Path, str, str]]:
+    """(path, strong ETag, content type) for a stored name, None if unknown."""
+    match = NAME_RE.match(name)
+    if not match:
+        return None
+    path = MEDIA_ROOT / name
+    if not path.is_file():
+        return None
+    return path, f'"{match.group(1)}"', CONTENT_TYPES[match.group(2)]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison for If-None-Match (RFC 9110 13.1.2)
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Single byte range from a Range header as inclusive (start, end).
+    None when absent, malformed or not a single bytes range: the header is
+    ignored and the whole file served (RFC 9110 14.2). Raises ValueError only
+    for a well-formed range the file can't satisfy (416).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    start_text, _, end_text = header[6:].strip().partition("-")
+    if not (start_text or end_text) or not all(t.isdigit() for t in (start_text, end_text) if t):
+        return None
+
+    if start_text == "":
+        # Suffix range: last N bytes
+        length = int(end_text)
+        if length == 0 or size == 0:
+            raise ValueError(f"Range '{header}' not satisfiable for {size} bytes")
+        return max(0, size - length), size - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        raise ValueError(f"Range '{header}' not satisfiable for {size} bytes")
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def iter_file(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Bytes start..end (inclusive) of path in CHUNK_SIZE pieces."""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prune self-hosted media files")
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE / 86400)
+    parser.add_argument("--max-mb", type=float, default=MAX_TOTAL_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+
+    print(f"Removed {prune(args.max_age_days * 86400, int(args.max_mb * 1024 * 1024))} files from {MEDIA_ROOT}")
@@ -7,17 +7,21 @@ from .clotheselector import (
     validate_outfit,
     get_product_links,
     normalize_category,
+    get_category,
     filter_by_style,
     filter_by_gender,
     filter_by_brand
 )
+from .outfitassembler import assemble_outfits
 
 __all__ = [
     'select_outfit_items',
     'validate_outfit',
     'get_product_links',
     'normalize_category',
+    'get_category',
     'filter_by_style',
     'filter_by_gender',
-    'filter_by_brand'
+    'filter_by_brand',
+    'assemble_outfits'
 ]
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Brand Sampler - Weighted multi-brand item picks using Walker alias tables.
+
+Items are bucketed once per catalog load by (slot, gender, style) and brand.
+A pick draws a brand from an alias table (favorite brands weighted by rank,
+every other brand with a small fallback weight) and then a uniform item from
+that brand's bucket, so each pick is O(1) with no list filtering. Weights are
+per brand, not per item: a large non-favorite brand can't outweigh a small
+favorite one, and without favorites every brand is equally likely.
+
+Near-duplicates (imagededup clusters) are collapsed per partition: only the
+first cluster member that falls into a (slot, gender, style) partition is kept.
+"""
+
+import random
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from local.local_store import brand_key
+
+# Weight of the favorite brand at rank r is RANK_DECAY ** r (1.0, 0.5, 0.25, ...)
+RANK_DECAY = 0.5
+FALLBACK_WEIGHT = 0.1
+
+# Alias tables cached per (partition, favorites); cleared on catalog reload
+MAX_CACHED_TABLES = 512
+
+
+def favorite_brands(filters: Dict) -> List[str]:
+    """Ranked favorite brands from build_semantic_filters output."""
+    brands = filters.get("brands")
+    if brands is None:
+        brands = [filters["brand"]] if filters.get("brand") else []
+    return [brand_key(b) for b in brands if b]
+
+
+def brand_weights(favorites: Sequence[str]) -> Dict[str, float]:
+    """Rank-decayed weight per favorite brand (first occurrence wins)."""
+    weights = {}
+    for rank, brand in enumerate(favorites):
+        weights.setdefault(brand_key(brand), RANK_DECAY ** rank)
+    return weights
+
+
+# =============================================================================
+# ALIAS TABLE
+# =============================================================================
+
+class AliasTable:
+    """Walker/Vose alias method: O(n) build, O(1) sample."""
+
+    def __init__(self, outcomes: Sequence, weights: Sequence[float]):
+        n = len(outcomes)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one outcome")
+
+        total = float(sum(weights))
+        if total <= 0:
+            weights = [1.0] * n
+            total = float(n)
+
+        self.outcomes = list(outcomes)
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Leftovers are 1.0 up to float error
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def sample(self, rng=None):
+        rng = rng or random
+        i = rng.randrange(len(self.outcomes))
+        return self.outcomes[i] if rng.random() < self.prob[i] else self.outcomes[self.alias[i]]
+
+
+# =============================================================================
+# SAMPLER
+# =============================================================================
+
+PartitionKey = Tuple[str, Optional[str], Optional[str]]
+
+
+class BrandSampler:
+    """
+    Partitions the catalog by (slot, gender, style) with per-brand buckets.
+    gender/style of None are the wider fallback partitions.
+    """
+
+    def __init__(self, categorize: Callable[[str], Optional[str]]):
+        self.categorize = categorize
+        self._source = None
+        self._size = 0
+        self._clusters = None
+        self.partitions: Dict[PartitionKey, Dict[str, List[Dict]]] = {}
+        self._tables: Dict[tuple, AliasTable] = {}
+
+    def ensure(self, items: List[Dict], clusters: Optional[Dict[str, str]] = None):
+        """Rebuild partitions when the catalog list or the duplicate clusters change."""
+        if items is self._source and len(items) == self._size and clusters is self._clusters:
+            return
+        self.rebuild(items, clusters)
+
+    def rebuild(self, items: List[Dict], clusters: Optional[Dict[str, str]] = None):
+        partitions: Dict[PartitionKey, Dict[str, List[Dict]]] = {}
+        slot_of = {}
+        seen_clusters = set()
+
+        for item in items:
+            raw = item.get("category", "")
+            if raw not in slot_of:
+                slot_of[raw] = self.categorize(raw)
+            slot = slot_of[raw]
+            if slot is None:
+                continue
+
+            gender = item.get("gender")
+            style = item.get("style")
+            brand = brand_key(item.get("brand", ""))
+            cluster = clusters.get(str(item.get("id"))) if clusters else None
+            for key in ((slot, gender, style), (slot, gender, None),
+                        (slot, None, style), (slot, None, None)):
+                if cluster is not None:
+                    if (key, cluster) in seen_clusters:
+                        continue
+                    seen_clusters.add((key, cluster))
+                partitions.setdefault(key, {}).setdefault(brand, []).append(item)
+
+        self.partitions = partitions
+        self._tables = {}
+        self._source = items
+        self._size = len(items)
+        self._clusters = clusters
+
+    def resolve_partition(self, slot: str, gender: Optional[str],
+                          style: Optional[str]) -> Optional[PartitionKey]:
+        """Same preference order as select_item: gender first, then style."""
+        if (slot, gender, None) in self.partitions:
+            if (slot, gender, style) in self.partitions:
+                return slot, gender, style
+            return slot, gender, None
+        if (slot, None, style) in self.partitions:
+            return slot, None, style
+        if (slot, None, None) in self.partitions:
+            return slot, None, None
+        return None
+
+    def table(self, key: PartitionKey, favorites: Sequence[str]) -> AliasTable:
+        cache_key = (key, tuple(favorites))
+        table = self._tables.get(cache_key)
+        if table is None:
+            buckets = self.partitions[key]
+            weights = brand_weights(favorites)
+            brands = list(buckets.keys())
+            # Bucket size is deliberately ignored (see module docstring)
+            masses = [weights.get(b, FALLBACK_WEIGHT) for b in brands]
+            table = AliasTable(brands, masses)
+            if len(self._tables) >= MAX_CACHED_TABLES:
+                self._tables.clear()
+            self._tables[cache_key] = table
+        return table
+
+    def sample(self, slot: str, gender: Optional[str], style: Optional[str],
+               favorites: Sequence[str] = (), rng=None) -> Optional[Dict]:
+        rng = rng or random
+        key = self.resolve_partition(slot, gender, style)
+        if key is None:
+            return None
+        brand = self.table(key, favorites).sample(rng)
+        bucket = self.partitions[key][brand]
+        return bucket[rng.randrange(len(bucket))]
+
+
+# =============================================================================
+# TESTING
+# =============================================================================
+
+if __name__ == "__main__":
+    from collections import Counter
+
+    table = AliasTable(["a", "b", "c"], [0.6, 0.3, 0.1])
+    counts = Counter(table.sample() for _ in range(100000))
+    print("Alias a/b/c:", {k: round(v / 100000, 3) for k, v in sorted(counts.items())})
+
+    sample_items = [
+        {"id": str(n), "brand": brand, "category": "t-shirt", "gender": "man", "style": "casual"}
+        for n, brand in enumerate(["zara"] * 10 + ["hm"] * 10 + ["mango"] * 10)
+    ]
+    sampler = BrandSampler(categorize=lambda raw: "top")
+    sampler.ensure(sample_items)
+    picks = Counter(sampler.sample("top", "man", "casual", ["hm", "zara"])["brand"] for _ in range(10000))
+    print("Favorites hm, zara:", dict(picks))
+
+    # A big non-favorite brand must not outweigh a small favorite
+    sample_items = [
+        {"id": str(n), "brand": brand, "category": "t-shirt", "gender": "man", "style": "casual"}
+        for n, brand in enumerate(["zara"] * 200 + ["hm"] * 15)
+    ]
+    sampler.ensure(sample_items)
+    picks = Counter(sampler.sample("top", "man", "casual", ["hm"])["brand"] for _ in range(10000))
+    print("Favorite hm (15 items) vs zara (200 items):", dict(picks))
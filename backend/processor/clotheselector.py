@@ -2,8 +2,14 @@
 Clothes Selector - Selects outfit items from available inventory.
 """
 
-from random import choice
-from typing import Dict, List, Optional, Tuple
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from local.local_store import brand_key
+except ImportError:
+    # Imported top-level with processor/ on sys.path and the repo root as cwd (processquery)
+    from backend.local.local_store import brand_key
 
 CATEGORY_MAP = {
     "top": [
@@ -38,29 +44,53 @@ def normalize_category(raw: str) -> Optional[str]:
     return None
 
 
-def select_outfit_items(items: List[Dict]) -> Dict[str, Optional[Dict]]:
+# Slots of the generation pipeline (llm_service): no shoe slot, and bodysuits
+# and dresses are kept. The compatibility graph and both assemblers use this
+# mapping so the graph and fallback paths see the same items.
+OUTFIT_CATEGORIES = {
+    "top": ["t-shirt", "shirt", "hoodie", "jumper", "sweater", "top", "sweatshirt",
+            "tank_top", "cardigan", "blouse", "bodysuit", "polo"],
+    "pants": ["pants", "trousers", "jeans", "jorts", "skirt", "leggings",
+              "joggers", "jogger", "shorts", "dress"],
+    "layer": ["jacket", "coat", "blazer", "overshirt", "parka", "vest", "bomber"]
+}
+
+
+def get_category(raw: str) -> Optional[str]:
+    """Map raw category to an outfit slot (top, pants, layer)."""
+    raw = raw.lower().strip()
+    for cat, variants in OUTFIT_CATEGORIES.items():
+        if raw in variants or any(v in raw for v in variants):
+            return cat
+    return None
+
+
+def select_outfit_items(items: Iterable[Dict], rng=None) -> Dict[str, Optional[Dict]]:
     """
     Select one item from each category.
     Returns dict with keys: top, pants, shoe, layer (any can be None).
+    rng: per-request random.Random for reproducible picks (global RNG if None).
+
+    Single pass with one reservoir-sampled candidate per slot, so items can be
+    any iterator (DB cursor, streamed JSON) and memory stays O(slots).
     """
-    buckets = {
-        "top": [],
-        "pants": [],
-        "shoe": [],
-        "layer": []
-    }
+    rng = rng or random
+    outfit = {key: None for key in CATEGORY_MAP}
+    seen = {key: 0 for key in CATEGORY_MAP}
+    slot_of = {}
 
     for item in items:
-        category = normalize_category(item.get("category", ""))
-        if category and category in buckets:
-            buckets[category].append(item)
-
-    outfit = {}
-    for key, candidates in buckets.items():
-        if candidates:
-            outfit[key] = choice(candidates)
-        else:
-            outfit[key] = None
+        raw = item.get("category", "")
+        if raw not in slot_of:
+            slot_of[raw] = normalize_category(raw)
+        category = slot_of[raw]
+        if category not in seen:
+            continue
+
+        # Keep the n-th candidate with probability 1/n -> uniform over the slot
+        seen[category] += 1
+        if rng.randrange(seen[category]) == 0:
+            outfit[category] = item
 
     return outfit
 
@@ -111,8 +141,8 @@ def filter_by_brand(items: List[Dict], brands: List[str]) -> List[Dict]:
     if not brands:
         return items
 
-    brand_set = {b.lower().replace(" ", "_").replace("-", "_") for b in brands}
+    brand_set = {brand_key(b) for b in brands}
     return [
         i for i in items
-        if i.get("brand", "").lower().replace(" ", "_").replace("-", "_") in brand_set
+        if brand_key(i.get("brand", "")) in brand_set
     ]
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Color Harmony - Scores color combinations in CIE Lab.
+
+Name/hex parsing and item colors live in colorlab and are re-exported here.
+"""
+
+import math
+from typing import List, Optional
+
+from colorlab import (
+    COLOR_HEX, LIGHTNESS_MODIFIERS, Lab, delta_e, hex_to_lab, item_labs,
+    item_primary_lab, lab_to_hex, palette_labs, parse_color_name, parse_color_value,
+)
+
+NEUTRAL_CHROMA = 12.0
+
+
+# =============================================================================
+# SCORING
+# =============================================================================
+
+def chroma(lab: Lab) -> float:
+    return math.hypot(lab[1], lab[2])
+
+
+def hue_angle(lab: Lab) -> float:
+    return math.degrees(math.atan2(lab[2], lab[1])) % 360
+
+
+def is_neutral(lab: Lab) -> bool:
+    return chroma(lab) < NEUTRAL_CHROMA
+
+
+def palette_fit(lab: Optional[Lab], labs: List[Lab]) -> float:
+    """
+    Score 0..1 for how well a color sits in the palette.
+    Neutrals always fit reasonably; chromatic colors must be close to a palette color.
+    """
+    if lab is None or not labs:
+        return 0.5
+    closest = min(delta_e(lab, p) for p in labs)
+    fit = max(0.0, 1.0 - closest / 60.0)
+    if is_neutral(lab):
+        fit = max(fit, 0.6)
+    return fit
+
+
+def harmony(a: Optional[Lab], b: Optional[Lab]) -> float:
+    """
+    Score 0..1 for two garment colors worn together.
+    Neutrals pair with anything; chromatic pairs score by hue relationship.
+    """
+    if a is None or b is None:
+        return 0.5
+
+    if is_neutral(a) or is_neutral(b):
+        # Avoid two near-identical tones, which read as a failed match
+        return 0.65 if delta_e(a, b) < 6 else 0.85
+
+    diff = abs(hue_angle(a) - hue_angle(b))
+    diff = min(diff, 360 - diff)
+
+    if diff < 30:
+        score = 0.9       # analogous
+    elif 150 <= diff <= 210:
+        score = 0.8       # complementary
+    elif 100 <= diff < 150:
+        score = 0.6       # triadic / split complementary
+    else:
+        score = 0.3
+
+    # Two loud colors fight each other
+    if chroma(a) > 50 and chroma(b) > 50 and diff >= 30:
+        score -= 0.2
+
+    return max(0.0, score)
@@ -0,0 +1,396 @@
+"""
+Compatibility Graph - Precomputed top -> (pants, layer) neighbors for instant outfit assembly.
+
+Offline job: for every top in the catalog, keep the top-k most compatible pants and
+layers (color harmony, style, gender) as flat int32/float32 adjacency arrays. The
+graph is written to Haine/_index/compat_graph.bin and rebuilt incrementally: only
+brand files whose content hash changed are rescored (a changed dominant colors
+sidecar rescores everything).
+
+The header records the stat and hash of every source file. get_graph() ignores
+a graph whose sources changed since it was built until it is rebuilt.
+
+Run:  python -m processor.compatgraph [--k 16] [--force]
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .clotheselector import get_category
+from .colorharmony import harmony, item_primary_lab
+
+GRAPH_VERSION = 4
+DEFAULT_K = 16
+NEIGHBOR_SLOTS = ("pants", "layer")
+
+# Pair score weights
+HARMONY_WEIGHT = 2.0
+STYLE_WEIGHT = 1.0
+
+# Seconds between source freshness checks of the loaded graph
+FRESHNESS_INTERVAL = float(os.getenv("COMPAT_GRAPH_CHECK_INTERVAL", "30"))
+
+_loaded_graph = None
+_loaded_mtime = None
+_checked_at = 0.0
+_stale = False
+
+
+def get_graph_path() -> Path:
+    from local.local_store import get_haine_folder
+    return get_haine_folder() / "_index" / "compat_graph.bin"
+
+
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def colors_file_hash(haine: Path) -> Optional[str]:
+    """
+    Hash of the dominant colors per item only: the sidecar's stat/hash
+    bookkeeping changes when an image is merely touched, the scores don't.
+    """
+    from local.local_store import DOMINANT_COLORS_FILE, load_dominant_colors
+    if not (haine / DOMINANT_COLORS_FILE).exists():
+        return None
+    colors = {item_id: entry.get("colors") for item_id, entry in load_dominant_colors(haine).items()}
+    return hashlib.sha1(json.dumps(colors, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def source_stats(haine: Path) -> Dict[str, List[int]]:
+    """(mtime_ns, size) of every brand file and the dominant colors sidecar."""
+    from local.local_store import DOMINANT_COLORS_FILE, list_catalog_files
+
+    paths = list_catalog_files(haine)
+    if (haine / DOMINANT_COLORS_FILE).exists():
+        paths.append(haine / DOMINANT_COLORS_FILE)
+
+    stats = {}
+    for path in paths:
+        st = path.stat()
+        stats[str(path.relative_to(haine))] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+
+def genders_compatible(a: Dict, b: Dict) -> bool:
+    ga = a.get("gender", "unisex").lower()
+    gb = b.get("gender", "unisex").lower()
+    return ga == gb or "unisex" in (ga, gb)
+
+
+def pair_score(top: Dict, other: Dict, top_lab=None, other_lab=None) -> float:
+    """Compatibility of a top with a pants/layer item (higher is better)."""
+    score = HARMONY_WEIGHT * harmony(top_lab, other_lab)
+    if top.get("style", "").lower() == other.get("style", "").lower():
+        score += STYLE_WEIGHT
+    return score
+
+
+# =============================================================================
+# GRAPH
+# =============================================================================
+
+class CompatGraph:
+    """
+    Adjacency arrays indexed by top position:
+        adjacency[slot][t * k : (t + 1) * k]  -> item indices (-1 = empty)
+        scores[slot][t * k : (t + 1) * k]     -> pair scores
+    """
+
+    def __init__(self, k: int, ids: List[str], item_files: List[int], files: Dict[str, str],
+                 tops: List[int], adjacency: Dict[str, array], scores: Dict[str, array],
+                 top_genders: List[str], colors_hash: Optional[str] = None,
+                 stats: Optional[Dict[str, List[int]]] = None):
+        self.k = k
+        self.ids = ids
+        self.item_files = item_files
+        self.files = files
+        self.tops = tops
+        self.adjacency = adjacency
+        self.scores = scores
+        self.top_genders = top_genders
+        self.colors_hash = colors_hash
+        self.stats = stats or {}
+        self.index_of = {item_id: i for i, item_id in enumerate(ids)}
+        self.top_row = {ids[t]: row for row, t in enumerate(tops)}
+
+        self.tops_by_gender: Dict[str, List[int]] = {}
+        for t, gender in zip(tops, top_genders):
+            self.tops_by_gender.setdefault(gender, []).append(t)
+
+    def top_ids(self, gender: Optional[str] = None) -> List[str]:
+        """
+        Ids of the tops collect_candidates would prefer for gender (exact match);
+        every top when no gender is given or none match.
+        """
+        positions = self.tops_by_gender.get((gender or "").lower()) if gender else None
+        return [self.ids[t] for t in (positions or self.tops)]
+
+    def is_current(self, haine: Path) -> bool:
+        """
+        True if the source files still match the build. Stats are compared first;
+        files whose stats moved are hashed, so a touch without edits stays current.
+        """
+        stats = source_stats(haine)
+        if stats == self.stats:
+            return True
+
+        from local.local_store import DOMINANT_COLORS_FILE
+        colors_name = str(DOMINANT_COLORS_FILE)
+        if set(stats) - {colors_name} != set(self.files):
+            return False
+        for name in stats:
+            if stats[name] == self.stats.get(name):
+                continue
+            if name == colors_name:
+                if colors_file_hash(haine) != self.colors_hash:
+                    return False
+            elif file_hash(haine / name) != self.files[name]:
+                return False
+        if colors_name not in stats and self.colors_hash is not None:
+            return False
+
+        self.stats = stats
+        return True
+
+    def neighbors(self, top_id: str, slot: str) -> List[Tuple[str, float]]:
+        """(item_id, pair_score) for the stored neighbors of a top, best first."""
+        row = self.top_row.get(top_id)
+        if row is None:
+            return []
+        start = row * self.k
+        adj = self.adjacency[slot]
+        sc = self.scores[slot]
+        result = []
+        for pos in range(start, start + self.k):
+            idx = adj[pos]
+            if idx < 0:
+                break
+            result.append((self.ids[idx], sc[pos]))
+        return result
+
+    def save(self, path: Path):
+        header = {
+            "version": GRAPH_VERSION,
+            "k": self.k,
+            "ids": self.ids,
+            "item_files": self.item_files,
+            "files": self.files,
+            "tops": self.tops,
+            "top_genders": self.top_genders,
+            "colors_hash": self.colors_hash,
+            "stats": self.stats,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for slot in NEIGHBOR_SLOTS:
+                f.write(self.adjacency[slot].tobytes())
+                f.write(self.scores[slot].tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["CompatGraph"]:
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            header = json.loads(f.readline().decode("utf-8"))
+            if header.get("version") != GRAPH_VERSION:
+                return None
+            size = len(header["tops"]) * header["k"]
+            adjacency, scores = {}, {}
+            for slot in NEIGHBOR_SLOTS:
+                adjacency[slot] = array("i")
+                adjacency[slot].frombytes(f.read(size * adjacency[slot].itemsize))
+                scores[slot] = array("f")
+                scores[slot].frombytes(f.read(size * scores[slot].itemsize))
+        return cls(header["k"], header["ids"], header["item_files"], header["files"],
+                   header["tops"], adjacency, scores, header["top_genders"],
+                   header.get("colors_hash"), header.get("stats"))
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def _top_k_row(top: Dict, top_lab, candidates: List[Tuple[int, Dict, object]], k: int,
+               seed: List[Tuple[float, int]] = ()) -> List[Tuple[float, int]]:
+    """Best k (score, index) for a top among candidates, merged with an existing row."""
+    heap = list(seed)
+    heapq.heapify(heap)
+    for idx, item, lab in candidates:
+        if not genders_compatible(top, item):
+            continue
+        entry = (pair_score(top, item, top_lab, lab), idx)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return sorted(heap, reverse=True)
+
+
+def build_graph(k: int = DEFAULT_K, previous: Optional[CompatGraph] = None,
+                verbose: bool = True) -> CompatGraph:
+    """
+    Build the graph from the current Haine files. With a previous graph of the
+    same k, rows are only rescored against items from changed brand files.
+    """
+    from local.local_store import (
+        get_haine_folder, list_catalog_files, load_dominant_colors, merge_dominant_colors, read_catalog_file
+    )
+
+    haine = get_haine_folder()
+    stats = source_stats(haine)
+    colors_hash = colors_file_hash(haine)
+    files = {}
+    ids, items, item_files = [], [], []
+
+    for file_no, path in enumerate(list_catalog_files(haine)):
+        name = str(path.relative_to(haine))
+        files[name] = file_hash(path)
+        for item in read_catalog_file(path):
+            ids.append(item["id"])
+            items.append(item)
+            item_files.append(file_no)
+
+    # Same colors as request time (load_all_items merges the sidecar too)
+    merge_dominant_colors(items, load_dominant_colors(haine))
+
+    file_names = list(files.keys())
+    labs = [item_primary_lab(item) for item in items]
+    # Same slots as the assemblers, so graph and fallback paths agree
+    slots = [get_category(item.get("category", "")) for item in items]
+
+    if previous is not None and (previous.k != k or previous.colors_hash != colors_hash):
+        previous = None
+
+    changed_files = set(file_names)
+    if previous is not None:
+        changed_files = {name for name in file_names if previous.files.get(name) != files[name]}
+        removed_files = set(previous.files) - set(files)
+        if not changed_files and not removed_files:
+            if verbose:
+                print("Compat graph up to date")
+            previous.stats = stats
+            return previous
+
+    changed_positions = {i for i, f in enumerate(item_files) if file_names[f] in changed_files}
+
+    candidates = {slot: [] for slot in NEIGHBOR_SLOTS}
+    changed_candidates = {slot: [] for slot in NEIGHBOR_SLOTS}
+    for i, slot in enumerate(slots):
+        if slot in candidates:
+            candidates[slot].append((i, items[i], labs[i]))
+            if i in changed_positions:
+                changed_candidates[slot].append((i, items[i], labs[i]))
+
+    tops = [i for i, slot in enumerate(slots) if slot == "top"]
+    new_index = {item_id: i for i, item_id in enumerate(ids)}
+    adjacency = {slot: array("i") for slot in NEIGHBOR_SLOTS}
+    scores = {slot: array("f") for slot in NEIGHBOR_SLOTS}
+    rescored = 0
+
+    for t in tops:
+        for slot in NEIGHBOR_SLOTS:
+            row = None
+
+            if previous is not None and t not in changed_positions:
+                kept = []
+                for item_id, score in previous.neighbors(ids[t], slot):
+                    idx = new_index.get(item_id)
+                    # A neighbor that vanished or changed may hide better candidates
+                    if idx is None or idx in changed_positions:
+                        kept = None
+                        break
+                    kept.append((score, idx))
+                if kept is not None:
+                    row = _top_k_row(items[t], labs[t], changed_candidates[slot], k, kept)
+
+            if row is None:
+                row = _top_k_row(items[t], labs[t], candidates[slot], k)
+                rescored += 1
+
+            for score, idx in row:
+                adjacency[slot].append(idx)
+                scores[slot].append(score)
+            for _ in range(k - len(row)):
+                adjacency[slot].append(-1)
+                scores[slot].append(0.0)
+
+    if verbose:
+        mode = "incremental" if previous is not None else "full"
+        print(f"✓ Compat graph ({mode}): {len(tops)} tops, k={k}, "
+              f"{rescored} rows fully rescored, {len(changed_files)} changed files")
+
+    top_genders = [items[t].get("gender", "").lower() for t in tops]
+    return CompatGraph(k, ids, item_files, files, tops, adjacency, scores, top_genders, colors_hash, stats)
+
+
+def update_graph(k: int = DEFAULT_K, force: bool = False, verbose: bool = True) -> CompatGraph:
+    """Incrementally rebuild the graph on disk (full rebuild when force=True)."""
+    path = get_graph_path()
+    previous = None if force else CompatGraph.load(path)
+    graph = build_graph(k, previous, verbose)
+    # Saved even when unchanged: the header's file stats may have moved
+    graph.save(path)
+    return graph
+
+
+def get_graph() -> Optional[CompatGraph]:
+    """
+    Graph for request-time use, or None if missing or stale. Reloaded when the
+    file on disk changes; sources are rechecked every FRESHNESS_INTERVAL seconds.
+    """
+    global _loaded_graph, _loaded_mtime, _checked_at, _stale
+    from local.local_store import get_haine_folder
+
+    path = get_graph_path()
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+
+    now = time.monotonic()
+    if _loaded_graph is None or mtime != _loaded_mtime:
+        _loaded_graph = CompatGraph.load(path)
+        _loaded_mtime = mtime
+        _checked_at = 0.0
+
+    if _loaded_graph is not None and now - _checked_at >= FRESHNESS_INTERVAL:
+        _checked_at = now
+        stale = not _loaded_graph.is_current(get_haine_folder())
+        if stale and not _stale:
+            print("⚠️ Compat graph is stale (catalog changed); ignored until "
+                  "python -m processor.compatgraph rebuilds it")
+        _stale = stale
+
+    return None if _stale else _loaded_graph
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the top -> pants/layer compatibility graph")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="neighbors kept per top and slot")
+    parser.add_argument("--force", action="store_true", help="ignore the existing graph")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = update_graph(args.k, args.force)
+    print(f"Done in {(time.perf_counter() - start) * 1000:.0f} ms -> {get_graph_path()}")
+
+    if graph.tops:
+        top_id = graph.ids[graph.tops[0]]
+        print(f"{top_id}: pants={graph.neighbors(top_id, 'pants')[:3]}")
@@ -0,0 +1,258 @@
+"""
+Dominant colors of product images.
+
+Offline job: every product image is downsampled, its background removed
+(transparent pixels, or a uniform border color), and its pixels clustered with
+vectorized k-means in CIE Lab. The clusters are written to a sidecar
+(<Haine>/_index/dominant_colors.json) that local_store merges into each item as
+item["dominant_colors"] = [{"hex", "lab", "weight"}, ...], heaviest first.
+Images whose size and mtime are unchanged are skipped without reading; changed
+ones are re-clustered only if their content hash differs.
+
+Run:  python -m processor.dominantcolors [--k 3] [--workers N] [--force]
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from colorlab import lab_to_hex
+from .imagederivatives import source_hash
+from .imagestore import IMAGE_ROOT, scan_images
+
+DEFAULT_K = 3
+SAMPLE_EDGE = 96          # pixels on the longest side before clustering
+KMEANS_ITERATIONS = 20
+MIN_WEIGHT = 0.05         # clusters smaller than this share of pixels are dropped
+BACKGROUND_SPREAD = 6.0   # border counts as a uniform background below this mean ΔE
+BACKGROUND_DELTA = 12.0   # pixels this close to the background are removed
+SIDECAR_VERSION = 1
+
+
+def get_sidecar_path() -> Path:
+    from local.local_store import DOMINANT_COLORS_FILE, get_haine_folder
+    return get_haine_folder() / DOMINANT_COLORS_FILE
+
+
+# =============================================================================
+# COLOR MATH
+# =============================================================================
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """(N, 3) uint8 sRGB -> (N, 3) CIE Lab (D65), same constants as colorlab.hex_to_lab."""
+    c = rgb.astype(np.float64) / 255.0
+    lin = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+    xyz = lin @ np.array([
+        [0.4124, 0.2126, 0.0193],
+        [0.3576, 0.7152, 0.1192],
+        [0.1805, 0.0722, 0.9505],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack([
+        116 * f[:, 1] - 16,
+        500 * (f[:, 0] - f[:, 1]),
+        200 * (f[:, 1] - f[:, 2]),
+    ], axis=1)
+
+
+def kmeans(points: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS,
+           seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lloyd's k-means with k-means++ seeding, fully vectorized over points.
+    Returns (centers (k', 3), pixel counts (k',)); k' <= k for few distinct colors.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(points)
+
+    centers = [points[rng.integers(n)]]
+    nearest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, min(k, n)):
+        total = nearest.sum()
+        if total <= 0:
+            break
+        chosen = points[rng.choice(n, p=nearest / total)]
+        centers.append(chosen)
+        nearest = np.minimum(nearest, ((points - chosen) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=len(centers))
+
+        sums = np.stack([np.bincount(labels, weights=points[:, c], minlength=len(centers))
+                         for c in range(3)], axis=1)
+        moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        converged = np.abs(moved - centers).max() < 0.05
+        centers = moved
+        if converged:
+            break
+
+    distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    counts = np.bincount(distances.argmin(axis=1), minlength=len(centers))
+    return centers, counts
+
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+def foreground_lab(image: Image.Image) -> np.ndarray:
+    """Lab values of the downsampled image's garment pixels."""
+    image = image.copy()
+    image.thumbnail((SAMPLE_EDGE, SAMPLE_EDGE), Image.BILINEAR)
+
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        rgba = np.asarray(image.convert("RGBA"))
+        pixels = rgba[..., :3].reshape(-1, 3)
+        mask = rgba[..., 3].reshape(-1) >= 128
+        if mask.sum() >= 16:
+            return rgb_to_lab(pixels[mask])
+
+    rgb = np.asarray(image.convert("RGB"))
+    lab = rgb_to_lab(rgb.reshape(-1, 3))
+
+    # A uniform border is the studio background: drop pixels close to it
+    grid = lab.reshape(rgb.shape[0], rgb.shape[1], 3)
+    border = np.concatenate([grid[0], grid[-1], grid[:, 0], grid[:, -1]])
+    background = np.median(border, axis=0)
+    if np.sqrt(((border - background) ** 2).sum(axis=1)).mean() < BACKGROUND_SPREAD:
+        keep = np.sqrt(((lab - background) ** 2).sum(axis=1)) >= BACKGROUND_DELTA
+        if keep.sum() >= 16:
+            return lab[keep]
+
+    return lab
+
+
+def extract(path: str, k: int = DEFAULT_K) -> List[Dict]:
+    """Dominant colors of one image, heaviest first."""
+    with Image.open(path) as image:
+        image.load()
+        lab = foreground_lab(image)
+
+    centers, counts = kmeans(lab, k)
+    total = counts.sum()
+    colors = []
+    for center, count in sorted(zip(centers, counts), key=lambda pair: -pair[1]):
+        weight = count / total
+        if weight < MIN_WEIGHT:
+            continue
+        L, a, b = (round(float(v), 2) for v in center)
+        colors.append({"hex": lab_to_hex((L, a, b)), "lab": [L, a, b], "weight": round(float(weight), 3)})
+    return colors
+
+
+def _extract_task(task: Tuple[str, str, int]) -> Tuple[str, List[Dict]]:
+    item_id, path, k = task
+    return item_id, extract(path, k)
+
+
+# =============================================================================
+# BATCH JOB
+# =============================================================================
+
+def load_sidecar(path: Optional[Path] = None) -> Dict:
+    try:
+        with open(path or get_sidecar_path(), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") == SIDECAR_VERSION:
+            return sidecar
+    except (OSError, ValueError):
+        pass
+    return {"version": SIDECAR_VERSION, "k": DEFAULT_K, "items": {}}
+
+
+def build(root: Path = IMAGE_ROOT, k: int = DEFAULT_K, workers: Optional[int] = None,
+          force: bool = False, sidecar_path: Optional[Path] = None) -> Dict:
+    """
+    Recompute dominant colors for new or changed images and rewrite the sidecar.
+    Returns {"computed", "skipped", "removed", "failed", "total"}.
+    """
+    sidecar_path = Path(sidecar_path or get_sidecar_path())
+    sidecar = load_sidecar(sidecar_path)
+    previous = sidecar["items"] if sidecar.get("k") == k and not force else {}
+
+    root = Path(root)
+    items = {}
+    tasks = []
+    for (brand, item_id), source in scan_images(root).items():
+        stat = source.stat()
+        entry = previous.get(item_id)
+        relative_source = str(source.relative_to(root))
+        same_source = entry is not None and entry.get("brand") == brand and entry.get("source") == relative_source
+
+        if same_source and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("bytes") == stat.st_size:
+            items[item_id] = entry
+            continue
+
+        digest = source_hash(source)
+        if same_source and entry.get("hash") == digest:
+            # Touched but identical: only refresh the stat fields
+            items[item_id] = dict(entry, mtime_ns=stat.st_mtime_ns, bytes=stat.st_size)
+            continue
+
+        items[item_id] = {
+            "brand": brand, "source": relative_source, "hash": digest,
+            "mtime_ns": stat.st_mtime_ns, "bytes": stat.st_size, "colors": [],
+        }
+        tasks.append((item_id, str(source), k))
+
+    computed = failed = 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(task[0], pool.submit(_extract_task, task)) for task in tasks]
+            for item_id, future in futures:
+                try:
+                    _, colors = future.result()
+                except Exception as e:
+                    print(f"⚠️ Could not extract colors for {item_id}: {e}")
+                    items.pop(item_id)
+                    failed += 1
+                    continue
+                items[item_id]["colors"] = colors
+                computed += 1
+
+    # Rewrite only on a change, so readers watching the file's stat stay current
+    if items != sidecar["items"] or sidecar.get("k") != k or not sidecar_path.exists():
+        sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = sidecar_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SIDECAR_VERSION, "k": k, "items": items}, f, separators=(",", ":"))
+        os.replace(tmp, sidecar_path)
+
+    return {
+        "computed": computed,
+        "skipped": len(items) - computed,
+        "removed": len(set(sidecar["items"]) - set(items)),
+        "failed": failed,
+        "total": len(items),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Extract dominant colors from the product images")
+    parser.add_argument("--root", default=str(IMAGE_ROOT), help="image root (default: PRODUCT_IMAGE_ROOT)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="clusters per image")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="recompute every image")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print(build(Path(args.root), args.k, args.workers, args.force))
+    print(f"Done in {time.perf_counter() - start:.2f}s -> {get_sidecar_path()}")
+
+    # Pair scores depend on item colors: refresh an existing compatibility graph
+    from .compatgraph import get_graph_path, update_graph
+    if get_graph_path().exists():
+        update_graph()
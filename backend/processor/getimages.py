@@ -1,10 +1,11 @@
-from PIL import Image
-import os
+try:
+    from .imagestore import get_store
+except ImportError:
+    # Imported top-level, with processor/ itself on sys.path (as processquery does)
+    from imagestore import get_store
+
 
 def get(item):
-    if item is not None:
-        if os.path.exists(rf'C:\Users\ioncr\OneDrive\Desktop\test0\my-app\Haine{item["brand"]}\{item["id"]}.png'):
-            return Image.open(rf'C:\Users\ioncr\OneDrive\Desktop\test0\my-app\Haine{item["brand"]}\{item["id"]}.png')
-    else:
-        return None
-    # "brand" -> 'brand' pt alte versiuni in afara de 3.10
\ No newline at end of file
+    # Decoded product image for item (None if the item or its file is missing).
+    # Served from the image store's LRU; see imagestore for the root and cache size.
+    return get_store().get(item)
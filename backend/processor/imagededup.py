@@ -0,0 +1,301 @@
+"""
+Near-duplicate product detection with perceptual hashes.
+
+Offline job: a 64-bit DCT pHash per product image (process pool; images with
+unchanged size/mtime reuse their stored hash), then clustering through
+multi-index hashing: each hash is split into 4 x 16-bit chunks, and two hashes
+within MAX_DISTANCE bits must agree on some chunk within MAX_DISTANCE // 4
+bits (pigeonhole). Only those bucket neighbors are compared, never all pairs;
+matches are merged with union-find. The result goes to
+<Haine>/_index/duplicates.json with one representative (smallest id) per cluster.
+
+At request time get_representatives() maps item ids to their cluster. The
+outfit assemblers and the brand sampler keep, per cluster, the first member
+that passes the request's filters, so the representative itself never has to
+match them.
+
+Run:  python -m processor.imagededup [--max-distance 7] [--workers N]
+"""
+
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .imagestore import IMAGE_ROOT, scan_images
+
+HASH_SIZE = 8              # 8x8 low frequencies -> 64 bits
+DCT_SIZE = 32
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+DEFAULT_MAX_DISTANCE = 7   # Hamming bits; 7 -> chunks must match within 1 bit
+SIDECAR_VERSION = 1
+
+DUPLICATES_FILE = Path("_index") / "duplicates.json"
+
+
+def get_sidecar_path() -> Path:
+    from local.local_store import get_haine_folder
+    return get_haine_folder() / DUPLICATES_FILE
+
+
+# =============================================================================
+# PERCEPTUAL HASH
+# =============================================================================
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT perceptual hash (transparent areas count as white)."""
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        rgba = image.convert("RGBA")
+        background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, rgba)
+
+    gray = image.convert("L")
+    gray.draft("L", (DCT_SIZE * 4, DCT_SIZE * 4))
+    pixels = np.asarray(gray.resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].reshape(-1)
+    # Median without the DC term, which only encodes overall brightness
+    bits = low > np.median(low[1:])
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _phash_task(task: Tuple[str, str]) -> Tuple[str, int]:
+    item_id, path = task
+    with Image.open(path) as image:
+        image.load()
+        return item_id, phash(image)
+
+
+# =============================================================================
+# MULTI-INDEX HASHING + UNION-FIND
+# =============================================================================
+
+def _chunk_masks(radius: int) -> List[int]:
+    """Every CHUNK_BITS-bit mask with at most radius bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), r):
+            mask = 0
+            for p in positions:
+                mask |= 1 << p
+            masks.append(mask)
+    return masks
+
+
+def _chunks(value: int) -> List[int]:
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (i * CHUNK_BITS)) & mask for i in range(CHUNKS)]
+
+
+class MultiIndexHash:
+    """Sub-linear Hamming-radius lookup over 64-bit hashes."""
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.masks = _chunk_masks(max_distance // CHUNKS)
+        self.tables = [defaultdict(list) for _ in range(CHUNKS)]
+        self.hashes: List[int] = []
+
+    def add(self, value: int) -> int:
+        index = len(self.hashes)
+        self.hashes.append(value)
+        for table, chunk in zip(self.tables, _chunks(value)):
+            table[chunk].append(index)
+        return index
+
+    def neighbors(self, value: int) -> List[int]:
+        """Indices of stored hashes within max_distance of value."""
+        candidates = set()
+        for table, chunk in zip(self.tables, _chunks(value)):
+            for mask in self.masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        return [i for i in candidates if hamming(self.hashes[i], value) <= self.max_distance]
+
+
+class UnionFind:
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def cluster(hashes: Dict[str, int], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[List[str]]:
+    """
+    Near-duplicate clusters (2+ members) of {item id: phash}.
+    Each cluster is sorted by id, so its first id is the representative.
+    """
+    ids = sorted(hashes)
+    index = MultiIndexHash(max_distance)
+    groups = UnionFind(len(ids))
+
+    for i, item_id in enumerate(ids):
+        # Neighbors among the hashes inserted so far: every pair is checked once
+        for j in index.neighbors(hashes[item_id]):
+            groups.union(i, j)
+        index.add(hashes[item_id])
+
+    members = defaultdict(list)
+    for i, item_id in enumerate(ids):
+        members[groups.find(i)].append(item_id)
+    return sorted((group for group in members.values() if len(group) > 1), key=lambda g: g[0])
+
+
+# =============================================================================
+# BATCH JOB
+# =============================================================================
+
+def load_sidecar(path: Optional[Path] = None) -> Dict:
+    try:
+        with open(path or get_sidecar_path(), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") == SIDECAR_VERSION:
+            return sidecar
+    except (OSError, ValueError):
+        pass
+    return {"version": SIDECAR_VERSION, "items": {}, "clusters": []}
+
+
+def build(root: Path = IMAGE_ROOT, max_distance: int = DEFAULT_MAX_DISTANCE,
+          workers: Optional[int] = None, force: bool = False, sidecar_path: Optional[Path] = None) -> Dict:
+    """Hash new or changed images, recluster everything, rewrite the sidecar."""
+    sidecar_path = Path(sidecar_path or get_sidecar_path())
+    previous = {} if force else load_sidecar(sidecar_path)["items"]
+
+    items = {}
+    tasks = []
+    for (brand, item_id), source in scan_images(Path(root)).items():
+        stat = source.stat()
+        entry = previous.get(item_id)
+        if (entry is not None and entry.get("brand") == brand
+                and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("bytes") == stat.st_size):
+            items[item_id] = entry
+            continue
+        items[item_id] = {"brand": brand, "mtime_ns": stat.st_mtime_ns, "bytes": stat.st_size}
+        tasks.append((item_id, str(source)))
+
+    hashed = failed = 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(task[0], pool.submit(_phash_task, task)) for task in tasks]
+            for item_id, future in futures:
+                try:
+                    _, value = future.result()
+                except Exception as e:
+                    print(f"⚠️ Could not hash {item_id}: {e}")
+                    items.pop(item_id)
+                    failed += 1
+                    continue
+                items[item_id]["phash"] = f"{value:016x}"
+                hashed += 1
+
+    clusters = cluster({item_id: int(entry["phash"], 16) for item_id, entry in items.items()}, max_distance)
+
+    sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = sidecar_path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": SIDECAR_VERSION,
+            "max_distance": max_distance,
+            "items": items,
+            "clusters": clusters,
+        }, f, separators=(",", ":"))
+    os.replace(tmp, sidecar_path)
+
+    return {
+        "hashed": hashed,
+        "reused": len(items) - hashed,
+        "failed": failed,
+        "clusters": len(clusters),
+        "duplicates": sum(len(c) - 1 for c in clusters),
+        "total": len(items),
+    }
+
+
+# =============================================================================
+# REQUEST TIME
+# =============================================================================
+
+_representatives: Dict[str, str] = {}
+_representatives_mtime = None
+
+
+def get_representatives() -> Dict[str, str]:
+    """
+    Item id -> cluster representative id for every clustered item (reloaded on
+    change). The same dict object is returned until the sidecar changes.
+    """
+    global _representatives, _representatives_mtime
+
+    path = get_sidecar_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        _representatives, _representatives_mtime = {}, None
+        return _representatives
+
+    if mtime != _representatives_mtime:
+        clusters = load_sidecar(path).get("clusters", [])
+        _representatives = {item_id: group[0] for group in clusters for item_id in group}
+        _representatives_mtime = mtime
+    return _representatives
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Cluster near-duplicate product images by perceptual hash")
+    parser.add_argument("--root", default=str(IMAGE_ROOT), help="image root (default: PRODUCT_IMAGE_ROOT)")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="max Hamming distance")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rehash every image")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print(build(Path(args.root), args.max_distance, args.workers, args.force))
+    print(f"Done in {time.perf_counter() - start:.2f}s -> {get_sidecar_path()}")
@@ -0,0 +1,187 @@
+"""
+Product image derivatives.
+
+Batch job that turns every source image under the image root into resized
+WebP derivatives (see SIZES) on a process pool, and writes a manifest
+{item id -> brand, source hash, derivative paths}. Sources whose size and mtime
+are unchanged are skipped without reading; changed ones are re-encoded only
+if their content hash differs. The image store and the outfit renderer read
+derivatives instead of decoding full-size PNGs on the request path.
+
+Run:  python -m processor.imagederivatives [--workers N] [--force]
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from .imagestore import DERIVATIVES_MANIFEST, IMAGE_ROOT, scan_images
+
+# name -> (longest edge in px, WebP quality)
+SIZES = {
+    "thumb": (160, 70),
+    "card": (480, 80),
+    "full": (1200, 85),
+}
+
+MANIFEST_VERSION = 1
+
+
+def get_output_dir(root: Path = IMAGE_ROOT) -> Path:
+    return Path(root) / "_index" / "derivatives"
+
+
+def get_manifest_path(root: Path = IMAGE_ROOT) -> Path:
+    return Path(root) / DERIVATIVES_MANIFEST
+
+
+def source_hash(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(root: Path = IMAGE_ROOT) -> Dict:
+    try:
+        with open(get_manifest_path(root), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "sizes": {}, "items": {}}
+
+
+def _render(task: Tuple[str, str, str, Dict]) -> Dict[str, str]:
+    """Worker: decode one source once and write every derivative. Returns size -> path."""
+    source, output_dir, item_id, sizes = task
+    written = {}
+
+    with Image.open(source) as image:
+        image.load()
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        # Largest first, each smaller size is resampled from the previous one
+        for name, (edge, quality) in sorted(sizes.items(), key=lambda kv: -kv[1][0]):
+            scale = min(1.0, edge / max(image.width, image.height))
+            if scale < 1.0:
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.LANCZOS)
+            path = Path(output_dir) / f"{item_id}.{name}.webp"
+            tmp = path.with_suffix(".tmp")
+            image.save(tmp, "WEBP", quality=quality, method=4)
+            os.replace(tmp, path)
+            written[name] = str(path)
+
+    return written
+
+
+def build(root: Path = IMAGE_ROOT, workers: Optional[int] = None, force: bool = False) -> Dict:
+    """
+    Bring derivatives and manifest up to date with the source images.
+    Returns {"rendered", "skipped", "removed", "failed", "total"}.
+    """
+    root = Path(root)
+    output_root = get_output_dir(root)
+    manifest = load_manifest(root)
+    sizes_changed = manifest.get("sizes") != {k: list(v) for k, v in SIZES.items()}
+    previous = manifest["items"]
+
+    items = {}
+    tasks = []
+    for (brand, item_id), source in scan_images(root).items():
+        stat = source.stat()
+        entry = previous.get(item_id)
+        relative_source = str(source.relative_to(root))
+        unchanged_stat = (
+            entry is not None and entry.get("source") == relative_source
+            and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("bytes") == stat.st_size
+        )
+        outputs_exist = entry is not None and all((root / p).exists() for p in entry.get("sizes", {}).values())
+
+        if not force and not sizes_changed and unchanged_stat and outputs_exist:
+            items[item_id] = entry
+            continue
+
+        digest = source_hash(source)
+        if not force and not sizes_changed and entry is not None and entry.get("hash") == digest and outputs_exist:
+            # Touched but identical: only refresh the stat fields
+            items[item_id] = dict(entry, source=relative_source, mtime_ns=stat.st_mtime_ns, bytes=stat.st_size)
+            continue
+
+        output_dir = output_root / brand
+        output_dir.mkdir(parents=True, exist_ok=True)
+        items[item_id] = {
+            "brand": brand, "source": relative_source, "hash": digest,
+            "mtime_ns": stat.st_mtime_ns, "bytes": stat.st_size, "sizes": {},
+        }
+        tasks.append((str(source), str(output_dir), item_id, SIZES))
+
+    rendered = failed = 0
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(task[2], pool.submit(_render, task)) for task in tasks]
+            for item_id, future in futures:
+                try:
+                    written = future.result()
+                except Exception as e:
+                    print(f"⚠️ Could not render derivatives for {item_id}: {e}")
+                    # Keep serving the previous derivatives, if any
+                    if item_id in previous:
+                        items[item_id] = previous[item_id]
+                    else:
+                        items.pop(item_id, None)
+                    failed += 1
+                    continue
+                items[item_id]["sizes"] = {name: str(Path(p).relative_to(root)) for name, p in written.items()}
+                rendered += 1
+
+    # Derivatives of sources that disappeared
+    removed = 0
+    for item_id, entry in previous.items():
+        if item_id not in items:
+            for relative in entry.get("sizes", {}).values():
+                try:
+                    (root / relative).unlink()
+                except OSError:
+                    pass
+            removed += 1
+
+    manifest = {"version": MANIFEST_VERSION, "sizes": {k: list(v) for k, v in SIZES.items()}, "items": items}
+    path = get_manifest_path(root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+    return {
+        "rendered": rendered,
+        "skipped": len(items) - rendered,
+        "removed": removed,
+        "failed": failed,
+        "total": len(items),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build WebP derivatives of the product images")
+    parser.add_argument("--root", default=str(IMAGE_ROOT), help="image root (default: PRODUCT_IMAGE_ROOT)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render every image")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print(build(Path(args.root), args.workers, args.force))
+    print(f"Done in {time.perf_counter() - start:.2f}s -> {get_manifest_path(Path(args.root))}")
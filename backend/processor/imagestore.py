@@ -0,0 +1,246 @@
+"""
+Product image store.
+
+Indexes PRODUCT_IMAGE_ROOT/<brand>/<id>.<ext> once (rescanned on a miss at
+most every RESCAN_INTERVAL seconds) and keeps decoded images in an LRU bounded
+by PRODUCT_IMAGE_CACHE_MB. Files are only opened and decoded when an image is
+first requested; the four outfit slots load concurrently.
+
+Callers that ask for a size ("thumb", "card", "full") get the WebP derivative
+from imagederivatives when the manifest has one, the source image otherwise.
+
+Cached images are shared between requests: copy() before drawing on one.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from local.local_store import brand_key
+except ImportError:
+    # Imported top-level with processor/ on sys.path and the repo root as cwd (processquery)
+    from backend.local.local_store import brand_key
+
+IMAGE_EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg")
+
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent.parent / "Haine"
+IMAGE_ROOT = Path(os.getenv("PRODUCT_IMAGE_ROOT", str(DEFAULT_ROOT)))
+CACHE_BYTES = int(float(os.getenv("PRODUCT_IMAGE_CACHE_MB", "256")) * 1024 * 1024)
+RESCAN_INTERVAL = 30.0
+DERIVATIVES_MANIFEST = Path("_index") / "image_derivatives.json"
+LOAD_WORKERS = 4
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Decoded size: pixels x bands (x2 for 16-bit / 4 for 32-bit modes)."""
+    bytes_per_band = 4 if image.mode in ("I", "F") else 2 if image.mode.startswith("I;16") else 1
+    return image.width * image.height * len(image.getbands()) * bytes_per_band
+
+
+def scan_images(root: Path) -> Dict[Tuple[str, str], Path]:
+    """(brand key, id) -> source image for every root/<brand>/<id>.<ext>."""
+    paths = {}
+    if not root.is_dir():
+        return paths
+
+    for brand_dir in sorted(root.iterdir()):
+        # Skip files and generated folders like _index
+        if not brand_dir.is_dir() or brand_dir.name.startswith("_"):
+            continue
+        brand = brand_key(brand_dir.name)
+        for file in brand_dir.iterdir():
+            suffix = file.suffix.lower()
+            if suffix not in IMAGE_EXTENSIONS:
+                continue
+            # First extension in IMAGE_EXTENSIONS order wins for duplicates
+            current = paths.get((brand, file.stem))
+            if current is None or IMAGE_EXTENSIONS.index(suffix) < IMAGE_EXTENSIONS.index(current.suffix.lower()):
+                paths[(brand, file.stem)] = file
+
+    return paths
+
+
+class ImageStore:
+
+    def __init__(self, root: Path = IMAGE_ROOT, max_bytes: int = CACHE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._paths: Dict[Tuple[str, str], Path] = {}
+        self._scanned_at = 0.0
+        self._derivatives: Dict[str, Dict] = {}
+        self._manifest_mtime = None
+        self._manifest_checked_at = float("-inf")
+        self._cache: "OrderedDict[Path, Tuple[Image.Image, int]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------------------------------
+    # (brand, id) -> file index
+    # -------------------------------------------------------------------------
+
+    def scan(self) -> int:
+        """Rebuild the (brand, id) -> path index. Returns the number of images."""
+        paths = scan_images(self.root)
+        with self._lock:
+            self._paths = paths
+            self._scanned_at = time.monotonic()
+        return len(paths)
+
+    def _load_manifest(self):
+        """Re-read the derivatives manifest if it changed (checked every RESCAN_INTERVAL)."""
+        now = time.monotonic()
+        if now - self._manifest_checked_at < RESCAN_INTERVAL:
+            return
+        self._manifest_checked_at = now
+
+        path = self.root / DERIVATIVES_MANIFEST
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            self._derivatives, self._manifest_mtime = {}, None
+            return
+        if mtime == self._manifest_mtime:
+            return
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._derivatives = json.load(f).get("items", {})
+            self._manifest_mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read {path}: {e}")
+
+    def derivative_for(self, item: Optional[Dict], size: str) -> Optional[Path]:
+        if not item or not item.get("id"):
+            return None
+        self._load_manifest()
+
+        entry = self._derivatives.get(str(item["id"]))
+        if entry is None or entry.get("brand") != brand_key(item.get("brand", "")):
+            return None
+        relative = entry.get("sizes", {}).get(size)
+        return self.root / relative if relative else None
+
+    def path_for(self, item: Optional[Dict], size: Optional[str] = None) -> Optional[Path]:
+        if not item or not item.get("id"):
+            return None
+
+        if size:
+            derivative = self.derivative_for(item, size)
+            if derivative is not None and derivative.exists():
+                return derivative
+
+        key = (brand_key(item.get("brand", "")), str(item["id"]))
+        path = self._paths.get(key)
+        if path is None and time.monotonic() - self._scanned_at > RESCAN_INTERVAL:
+            self.scan()
+            path = self._paths.get(key)
+        return path
+
+    # -------------------------------------------------------------------------
+    # Decoded image LRU
+    # -------------------------------------------------------------------------
+
+    def _cache_get(self, path: Path) -> Optional[Image.Image]:
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+
+    def _cache_put(self, path: Path, image: Image.Image):
+        size = image_nbytes(image)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._cache.pop(path, None)
+            if old is not None:
+                self._cached_bytes -= old[1]
+            self._cache[path] = (image, size)
+            self._cached_bytes += size
+            while self._cached_bytes > self.max_bytes:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted
+
+    def get(self, item: Optional[Dict], size: Optional[str] = None) -> Optional[Image.Image]:
+        """Decoded image for item (derivative of size if available), None when it has no image."""
+        path = self.path_for(item, size)
+        if path is None:
+            return None
+
+        image = self._cache_get(path)
+        if image is not None:
+            return image
+
+        try:
+            with Image.open(path) as opened:
+                opened.load()
+                image = opened.copy() if opened.mode in ("RGB", "RGBA") else opened.convert("RGBA")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load image {path}: {e}")
+            return None
+
+        self._cache_put(path, image)
+        return image
+
+    def get_many(self, items: Dict[str, Optional[Dict]],
+                 size: Optional[str] = None) -> Dict[str, Optional[Image.Image]]:
+        """Load several slots (e.g. top/pants/shoe/layer) concurrently."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=LOAD_WORKERS,
+                                                        thread_name_prefix="imagestore")
+
+        futures = {slot: self._executor.submit(self.get, item, size) for slot, item in items.items()}
+        return {slot: future.result() for slot, future in futures.items()}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._cached_bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "indexed": len(self._paths),
+                "derivatives": len(self._derivatives),
+                "cached": len(self._cache),
+                "cached_mb": round(self._cached_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_store: Optional[ImageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ImageStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ImageStore()
+                _store.scan()
+    return _store
+
+
+if __name__ == "__main__":
+    store = get_store()
+    print(f"Indexed {store.scan()} images under {store.root}")
@@ -0,0 +1,315 @@
+"""
+Outfit Assembler - Ranks (top, pants, layer) combinations instead of picking each slot blindly.
+
+Each slot is pruned to its best candidates (palette fit, style, brand) in a single
+pass over the catalog, then the small cross product is scored for color harmony
+between the pieces. Work stays bounded at O(items + top_k^3).
+
+The ranked list is diversified (an item appears in at most max_repeats outfits)
+and pick_outfit samples from it score-weighted, so requests don't all land on
+the single best combination.
+
+clusters (item id -> near-duplicate cluster id, from imagededup) keeps only the
+first member of each cluster that passes the gender preference, in catalog order.
+"""
+
+import heapq
+import math
+import os
+import random
+from itertools import product
+from typing import Callable, Dict, List, Optional
+
+from .brandsampler import FALLBACK_WEIGHT, brand_key, brand_weights, favorite_brands
+from .clotheselector import get_category
+from .colorharmony import harmony, item_primary_lab, palette_fit, palette_labs
+
+SLOTS = ("top", "pants", "layer")
+
+WEIGHTS = {
+    "palette": 3.0,
+    "style": 2.0,
+    "brand": 1.5,
+    "harmony": 2.0,
+}
+
+# Random jitter added to per-item scores so equal candidates rotate between requests
+JITTER = 0.5
+
+DEFAULT_TOP_K = 8
+
+# pick_outfit samples among the best SAMPLE_TOP_N outfits with softmax(score / temperature);
+# lower temperature sticks closer to the top score
+SAMPLE_TOP_N = int(os.getenv("OUTFIT_SAMPLE_TOP_N", "20"))
+SAMPLE_TEMPERATURE = float(os.getenv("OUTFIT_SAMPLE_TEMPERATURE", "1.5"))
+MAX_REPEATS = int(os.getenv("OUTFIT_MAX_REPEATS", "2"))
+
+
+def score_item(item: Dict, filters: Dict, fit: float, brand_pref: Optional[Dict[str, float]] = None) -> float:
+    """
+    Unary score: palette fit (precomputed, 0..1), style match and brand preference.
+    brand_pref maps brand -> rank weight (see brandsampler.brand_weights).
+    """
+    score = WEIGHTS["palette"] * fit
+
+    style = filters.get("style")
+    if style and item.get("style", "").lower() == style.lower():
+        score += WEIGHTS["style"]
+
+    if brand_pref:
+        score += WEIGHTS["brand"] * brand_pref.get(brand_key(item.get("brand", "")), FALLBACK_WEIGHT)
+
+    return score
+
+
+def collect_candidates(items: List[Dict], filters: Dict, palette: Optional[Dict] = None,
+                       top_k: int = DEFAULT_TOP_K, slots=SLOTS,
+                       categorize: Callable[[str], Optional[str]] = get_category,
+                       rng=None, clusters: Optional[Dict[str, str]] = None) -> Dict[str, List[tuple]]:
+    """
+    Single pass over items keeping the top_k scored candidates per slot.
+    Items of the requested gender are preferred; other genders are only used
+    for a slot that would otherwise be empty (same fallback as select_item).
+    With clusters, a near-duplicate is skipped once an earlier member of its
+    cluster landed in the same slot and pool.
+
+    Returns {slot: [(score, item), ...]} sorted best first.
+    """
+    rng = rng or random
+    gender = (filters.get("gender") or "").lower()
+    labs = palette_labs(palette)
+    brand_pref = brand_weights(favorite_brands(filters))
+
+    matched = {slot: [] for slot in slots}
+    fallback = {slot: [] for slot in slots}
+    slot_of = {}
+    fit_of = {}
+    seen_clusters = set()
+
+    for position, item in enumerate(items):
+        raw = item.get("category", "")
+        if raw not in slot_of:
+            slot_of[raw] = categorize(raw)
+        slot = slot_of[raw]
+        if slot not in matched:
+            continue
+
+        target = matched if not gender or item.get("gender", "").lower() == gender else fallback
+        if clusters:
+            cluster = clusters.get(str(item.get("id")))
+            if cluster is not None:
+                key = (target is matched, slot, cluster)
+                if key in seen_clusters:
+                    continue
+                seen_clusters.add(key)
+
+        lab = item_primary_lab(item)
+        if lab not in fit_of:
+            fit_of[lab] = palette_fit(lab, labs)
+
+        score = score_item(item, filters, fit_of[lab], brand_pref) + rng.random() * JITTER
+        # Catalog position breaks score ties so seeded runs are reproducible
+        entry = (score, position, item)
+
+        heap = target[slot]
+        if len(heap) < top_k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    candidates = {}
+    for slot in slots:
+        pool = matched[slot] or fallback[slot]
+        candidates[slot] = [(score, item) for score, _, item in sorted(pool, reverse=True)]
+
+    return candidates
+
+
+def diversify(ranked: List[tuple], max_results: int, max_repeats: Optional[int]) -> List[tuple]:
+    """
+    Best-first (score, outfit) entries where no item appears in more than
+    max_repeats outfits. None keeps the plain top max_results.
+    """
+    if max_repeats is None:
+        return ranked[:max_results]
+
+    used: Dict[str, int] = {}
+    kept = []
+    for score, outfit in ranked:
+        ids = [item["id"] for item in outfit.values() if item is not None]
+        if any(used.get(item_id, 0) >= max_repeats for item_id in ids):
+            continue
+        for item_id in ids:
+            used[item_id] = used.get(item_id, 0) + 1
+        kept.append((score, outfit))
+        if len(kept) == max_results:
+            break
+    return kept
+
+
+def pick_outfit(outfits: List[Dict], rng=None, temperature: float = SAMPLE_TEMPERATURE) -> Optional[Dict]:
+    """Score-weighted pick from a ranked outfit list (softmax over score / temperature)."""
+    if not outfits:
+        return None
+    rng = rng or random
+    best = outfits[0]["score"]
+    weights = [math.exp((outfit["score"] - best) / temperature) for outfit in outfits]
+    return rng.choices(outfits, weights=weights)[0]
+
+
+def rank_combinations(candidates: Dict[str, List[tuple]], max_results: int = 5,
+                      max_repeats: Optional[int] = None) -> List[Dict]:
+    """
+    Score every combination of the pruned candidates. Empty slots stay None.
+    Returns outfits best first: {"top": ..., "pants": ..., "layer": ..., "score": float}
+    max_repeats: see diversify (needs the full ranking, at most top_k^3 entries).
+    """
+    slots = list(candidates.keys())
+    options = [candidates[slot] or [(0.0, None)] for slot in slots]
+
+    lab_cache = {}
+
+    def lab_of(item):
+        key = id(item)
+        if key not in lab_cache:
+            lab_cache[key] = item_primary_lab(item)
+        return lab_cache[key]
+
+    ranked = []
+    for n, combo in enumerate(product(*options)):
+        score = sum(s for s, _ in combo)
+        pieces = [item for _, item in combo if item is not None]
+
+        # Pairwise color harmony between the pieces actually worn together
+        pairs = 0
+        pair_score = 0.0
+        for i in range(len(pieces)):
+            for j in range(i + 1, len(pieces)):
+                pair_score += harmony(lab_of(pieces[i]), lab_of(pieces[j]))
+                pairs += 1
+        if pairs:
+            score += WEIGHTS["harmony"] * pair_score / pairs * (len(pieces) - 1)
+
+        entry = (score, [item for _, item in combo])
+        if max_repeats is not None or len(ranked) < max_results:
+            heapq.heappush(ranked, (score, -n, entry))
+        elif score > ranked[0][0]:
+            heapq.heapreplace(ranked, (score, -n, entry))
+
+    ranked = [(score, dict(zip(slots, items)))
+              for score, _, (_, items) in sorted(ranked, key=lambda x: x[0], reverse=True)]
+
+    return [dict(outfit, score=round(score, 3))
+            for score, outfit in diversify(ranked, max_results, max_repeats)]
+
+
+def first_per_cluster(found: List[tuple], clusters: Dict[str, str],
+                      position: Dict[str, int]) -> List[tuple]:
+    """(item_id, ...) entries with one per cluster: the member earliest in catalog order."""
+    first = {}
+    for entry in found:
+        cluster = clusters.get(entry[0], entry[0])
+        kept = first.get(cluster)
+        if kept is None or position.get(entry[0], 0) < position.get(kept[0], 0):
+            first[cluster] = entry
+    keep = {id(entry) for entry in first.values()}
+    return [entry for entry in found if id(entry) in keep]
+
+
+def assemble_outfits(items: List[Dict], filters: Dict, palette: Optional[Dict] = None,
+                     top_k: int = DEFAULT_TOP_K, max_results: int = 5, slots=SLOTS,
+                     categorize: Callable[[str], Optional[str]] = get_category,
+                     rng=None, max_repeats: Optional[int] = None,
+                     clusters: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Build a ranked list of outfits for the given filters and Sanzo Wada palette.
+
+    filters: same dict as build_semantic_filters (gender, style, brand)
+    palette: palette dict from sanzo_wada_colors (uses its hex colors)
+    """
+    candidates = collect_candidates(items, filters, palette, top_k, slots, categorize, rng, clusters)
+    if not any(candidates.values()):
+        return []
+    return rank_combinations(candidates, max_results, max_repeats)
+
+
+def assemble_from_graph(graph, get_item: Callable[[str], Optional[Dict]], filters: Dict,
+                        palette: Optional[Dict] = None, top_k: int = DEFAULT_TOP_K,
+                        max_results: int = 5, rng=None, max_repeats: Optional[int] = None,
+                        clusters: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Fast path over a precomputed CompatGraph (see compatgraph.py).
+    Only tops are scored; pants and layers come from the adjacency arrays.
+
+    get_item: id -> item lookup for the loaded catalog (stale ids are skipped)
+    Only tops of the requested gender are looked up (all tops if there are none).
+    Neighbors are already gender-compatible, so per top and slot the cluster
+    member first in catalog order is kept.
+    """
+    tops = [get_item(top_id) for top_id in graph.top_ids(filters.get("gender"))]
+    candidates = collect_candidates([t for t in tops if t], filters, palette, top_k,
+                                    slots=("top",), rng=rng, clusters=clusters)
+    if not candidates["top"]:
+        return []
+
+    rng = rng or random
+    labs = palette_labs(palette)
+    brand_pref = brand_weights(favorite_brands(filters))
+
+    def unary(item):
+        fit = palette_fit(item_primary_lab(item), labs)
+        return score_item(item, filters, fit, brand_pref) + rng.random() * JITTER
+
+    ranked = []
+    for top_score, top in candidates["top"]:
+        neighbors = {}
+        for slot in ("pants", "layer"):
+            found = []
+            for item_id, pair in graph.neighbors(top["id"], slot)[:top_k]:
+                item = get_item(item_id)
+                if item is not None:
+                    found.append((item_id, pair, item))
+            if clusters:
+                found = first_per_cluster(found, clusters, graph.index_of)
+            options = [(unary(item) + pair, item) for item_id, pair, item in found]
+            neighbors[slot] = options or [(0.0, None)]
+
+        for pants_score, pants in neighbors["pants"]:
+            for layer_score, layer in neighbors["layer"]:
+                score = top_score + pants_score + layer_score
+                if pants is not None and layer is not None:
+                    score += WEIGHTS["harmony"] * harmony(item_primary_lab(pants), item_primary_lab(layer))
+                ranked.append((score, {"top": top, "pants": pants, "layer": layer}))
+
+    if max_repeats is None:
+        ranked = heapq.nlargest(max_results, ranked, key=lambda x: x[0])
+    else:
+        ranked = diversify(sorted(ranked, key=lambda x: x[0], reverse=True), max_results, max_repeats)
+    return [dict(outfit, score=round(score, 3)) for score, outfit in ranked]
+
+
+# =============================================================================
+# TESTING
+# =============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    palette = {"name": "Classic Noir",
+               "colors": ["Charcoal (#36454F)", "Deep Navy (#000080)", "Burgundy (#800020)"]}
+
+    sample_items = [
+        {"id": "1", "brand": "zara", "category": "t-shirt", "gender": "man", "style": "casual", "colors": ["white"]},
+        {"id": "2", "brand": "hm", "category": "shirt", "gender": "man", "style": "smart", "colors": ["burgundy"]},
+        {"id": "3", "brand": "zara", "category": "jeans", "gender": "man", "style": "casual", "colors": ["navy"]},
+        {"id": "4", "brand": "hm", "category": "trousers", "gender": "man", "style": "smart", "colors": ["pink"]},
+        {"id": "5", "brand": "zara", "category": "coat", "gender": "man", "style": "smart", "colors": ["charcoal"]},
+    ]
+
+    for outfit in assemble_outfits(sample_items, {"gender": "man", "style": "smart"}, palette):
+        print(outfit["score"], {k: v["id"] for k, v in outfit.items() if isinstance(v, dict)})
+
+    big = [dict(item, id=f"{item['id']}_{n}") for n in range(2000) for item in sample_items]
+    start = time.perf_counter()
+    assemble_outfits(big, {"gender": "man", "style": "smart"}, palette)
+    print(f"{len(big)} items: {(time.perf_counter() - start) * 1000:.1f} ms")
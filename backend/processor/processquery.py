@@ -1,26 +1,60 @@
 from backend.database import dbread
-from random import shuffle
+import asyncio
+import random
 import clotheselector as clotheselector
-import getimages as getimages
+import imagestore as imagestore
 
 
-def process(filters: dict) -> dict:
-    data = dbread.query(filters)
+def process(filters: dict, rng=None, per_category: int = 1, streaming: bool = False) -> dict:
+    rng = rng or random
 
-    shuffle(data)
+    if streaming:
+        # Single pass over a server-side cursor, reservoir-sampled per slot: O(slots) memory
+        data = dbread.stream(filters)
+    else:
+        # Random sampling happens in Postgres: only a candidate pool per slot is fetched
+        # (DB_SAMPLE_POOL rows, fixed seed, served from dbcache on repeats). rng picks
+        # from it, so seeded requests stay reproducible.
+        data = dbread.sample_pool(
+            filters,
+            clotheselector.CATEGORY_MAP,
+            per_category=per_category
+        )
 
-    outfit = clotheselector.select_outfit_items(data)
+    outfit = clotheselector.select_outfit_items(data, rng)
 
     is_valid, missing = clotheselector.validate_outfit(outfit)
 
 
-    images = {
-        'top': getimages.get(outfit.get('top')),
-        'pants': getimages.get(outfit.get('pants')),
-        'shoe': getimages.get(outfit.get('shoe')),
-        'layer': getimages.get(outfit.get('layer'))
+    # Indexed paths + decoded-image LRU, the four slots loaded concurrently
+    images = imagestore.get_store().get_many(outfit)
+
+    return {
+        'items': outfit,
+        'images': images,
+        'valid': is_valid,
+        'missing': missing
     }
 
+
+async def process_async(filters: dict, rng=None, per_category: int = 1) -> dict:
+    # Same result as process(), for async endpoints: the sampled read goes through
+    # the asyncpg pool and the image loads run off the event loop.
+    from backend.database import asyncdb
+
+    rng = rng or random
+    data = await asyncdb.sample_pool(
+        filters,
+        clotheselector.CATEGORY_MAP,
+        per_category=per_category
+    )
+
+    outfit = clotheselector.select_outfit_items(data, rng)
+
+    is_valid, missing = clotheselector.validate_outfit(outfit)
+
+    images = await asyncio.to_thread(imagestore.get_store().get_many, outfit)
+
     return {
         'items': outfit,
         'images': images,
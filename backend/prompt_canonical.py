@@ -0,0 +1,333 @@
+"""
+Prompt Canonical - Quantized image prompts so similar requests share one image.
+
+build_image_prompt embeds exact chest/waist centimeters and the shoe's random
+material, so almost every prompt is unique. Here the body is snapped to a
+BMI band x height band (measurements recomputed from the band centers), colors
+are mapped onto a small vocabulary and category/shoe names onto families. The
+canonical key is a hash of the resulting prompt, so equal keys always mean
+equal prompts.
+
+PRECISIONS trades fidelity for hit rate. Every request is keyed at every
+precision (plus the raw prompt as "exact") so metrics() shows what each
+bucket size would hit; only PROMPT_CACHE_PRECISION drives the image cache.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from body_measurements import compute_body_measurements
+from colorlab import delta_e, hex_to_lab, parse_color_name
+from prompts import build_image_prompt
+
+# fine | medium | coarse | off (no image cache; metrics still collected)
+PROMPT_CACHE_PRECISION = os.getenv("PROMPT_CACHE_PRECISION", "medium")
+PROMPT_IMAGE_CACHE_SIZE = int(os.getenv("PROMPT_IMAGE_CACHE_SIZE", "2048"))
+# Keys remembered per precision when simulating hit rates
+PROMPT_KEY_WINDOW = int(os.getenv("PROMPT_KEY_WINDOW", "10000"))
+
+# bmi_step None = WHO bands; colors None = catalog names kept as-is
+PRECISIONS = {
+    "fine": {"bmi_step": 1.0, "height_step": 2, "colors": None, "shoe_families": False},
+    "medium": {"bmi_step": 2.5, "height_step": 5, "colors": "extended", "shoe_families": True},
+    "coarse": {"bmi_step": None, "height_step": 10, "colors": "basic", "shoe_families": True},
+}
+
+# (upper bound, band center)
+WHO_BMI_BANDS = [(18.5, 17.5), (25.0, 22.0), (30.0, 27.5), (math.inf, 33.0)]
+
+BASIC_COLORS = {
+    "black": "#111111", "white": "#F5F5F5", "grey": "#8C8C8C", "navy": "#1F2A44",
+    "blue": "#2F5DA8", "brown": "#6B4423", "beige": "#D8C8A8", "green": "#3A7D44",
+    "red": "#B22222", "pink": "#F4A7B9", "orange": "#E87722", "yellow": "#F2D13A",
+    "purple": "#6A4C93",
+}
+EXTENDED_COLORS = {
+    **BASIC_COLORS,
+    "charcoal": "#36454F", "light grey": "#C0C0C0", "cream": "#FFFDD0", "camel": "#C19A6B",
+    "dark brown": "#3B2414", "khaki": "#8F8654", "olive": "#6B6B2E", "light blue": "#87CEEB",
+    "denim": "#4F6D8F", "teal": "#008080", "burgundy": "#800020", "mustard": "#D9A93A",
+    "lavender": "#B7A6D9",
+}
+_VOCABULARY_LABS = {
+    name: {color: hex_to_lab(hex_value) for color, hex_value in vocabulary.items()}
+    for name, vocabulary in (("basic", BASIC_COLORS), ("extended", EXTENDED_COLORS))
+}
+
+# Spellings of the same garment across brand catalogs
+CATEGORY_SYNONYMS = {
+    "trackpants": "track pants", "track_pants": "track pants", "jogger": "joggers",
+    "jumper": "sweater", "polo_shirt": "polo shirt", "track_top": "track top",
+    "long_sleeve": "long sleeve t-shirt", "tank_top": "tank top", "suit_jacket": "blazer",
+    "tee": "t-shirt", "tshirt": "t-shirt", "pants": "trousers",
+}
+
+# First matching keyword wins
+SHOE_FAMILIES = [
+    ("boot", "boots"),
+    ("heel", "heels"), ("stiletto", "heels"), ("pump", "heels"), ("slingback", "heels"),
+    ("oxford", "leather dress shoes"), ("derby", "leather dress shoes"),
+    ("brogue", "leather dress shoes"), ("monk", "leather dress shoes"), ("loafer", "loafers"),
+    ("flat", "flats"), ("mule", "mules"),
+    ("sneaker", "sneakers"), ("trainer", "sneakers"), ("high-top", "sneakers"),
+    ("slip-on", "sneakers"), ("dad shoe", "sneakers"), ("running", "sneakers"),
+    ("platform", "sneakers"), ("basketball", "sneakers"),
+]
+
+
+# =============================================================================
+# BUCKETING
+# =============================================================================
+
+def bucket_center(value: float, step: float) -> float:
+    return (math.floor(value / step) + 0.5) * step
+
+
+def bmi_band(bmi: float, step: Optional[float]) -> float:
+    if step is None:
+        return next(center for upper, center in WHO_BMI_BANDS if bmi < upper)
+    return round(bucket_center(bmi, step), 2)
+
+
+def canonical_measurements(measurements: Dict, settings: Dict) -> Dict:
+    """Measurements recomputed from the centers of the user's height and BMI bands."""
+    height = bucket_center(measurements["height"], settings["height_step"])
+    bmi = bmi_band(measurements["bmi"], settings["bmi_step"])
+    weight = bmi * (height / 100) ** 2
+    return compute_body_measurements(height=height, weight=weight, sex=measurements["sex"])
+
+
+# =============================================================================
+# VOCABULARY
+# =============================================================================
+
+def canonical_color(name: str, vocabulary: Optional[str]) -> str:
+    """Nearest vocabulary color (CIE76); unparseable names ("striped") are kept."""
+    cleaned = (name or "black").lower().replace("_", " ").strip()
+    if vocabulary is None:
+        return cleaned
+    lab = parse_color_name(name)
+    if lab is None:
+        return cleaned
+    labs = _VOCABULARY_LABS[vocabulary]
+    return min(labs, key=lambda color: delta_e(lab, labs[color]))
+
+
+def canonical_category(category: str) -> str:
+    category = (category or "").lower()
+    return CATEGORY_SYNONYMS.get(category, category.replace("_", " "))
+
+
+def canonical_item(item: Optional[Dict], vocabulary: Optional[str]) -> Optional[Dict]:
+    """The two fields the image prompt reads from an item: first color and category."""
+    if not item:
+        return item
+    colors = item.get("colors") or ["black"]
+    if isinstance(colors, str):
+        colors = [colors]
+    return {
+        "colors": [canonical_color(colors[0], vocabulary)],
+        "category": canonical_category(item.get("category", "")),
+    }
+
+
+def canonical_shoe(ai_shoe: Optional[Dict], settings: Dict) -> Optional[Dict]:
+    """Drops the randomly picked material and collapses the shoe type to a family."""
+    if not ai_shoe or not settings["shoe_families"]:
+        return ai_shoe
+    description = ai_shoe.get("description", "").lower()
+    color = canonical_color((ai_shoe.get("colors") or ["black"])[0], settings["colors"])
+    family = next((family for keyword, family in SHOE_FAMILIES if keyword in description), "shoes")
+    return {**ai_shoe, "description": f"{color} {family}", "colors": [color]}
+
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:32]
+
+
+def canonical_prompt(user_data: Dict, selected_items: Dict, ai_shoe: Optional[Dict],
+                     measurements: Dict, color_palette: Dict = None,
+                     precision: str = PROMPT_CACHE_PRECISION) -> Tuple[str, str]:
+    """(key, prompt) for the request at the given precision ("exact" = unquantized)."""
+    if precision == "exact":
+        prompt = build_image_prompt(user_data, selected_items, ai_shoe, measurements, color_palette)
+        return prompt_key(prompt), prompt
+
+    settings = PRECISIONS[precision]
+    items = {slot: canonical_item(item, settings["colors"]) for slot, item in selected_items.items()}
+    prompt = build_image_prompt(
+        user_data,
+        items,
+        canonical_shoe(ai_shoe, settings),
+        canonical_measurements(measurements, settings),
+        color_palette
+    )
+    return prompt_key(prompt), prompt
+
+
+# =============================================================================
+# HIT-RATE METRICS
+# =============================================================================
+
+class KeyStats:
+    """Would-be hit rate of one precision: a key hits if seen in the last `window` keys."""
+
+    def __init__(self, window: int = PROMPT_KEY_WINDOW):
+        self.window = window
+        self.requests = 0
+        self.hits = 0
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+
+    def record(self, key: str) -> bool:
+        self.requests += 1
+        hit = key in self._seen
+        if hit:
+            self.hits += 1
+            self._seen.move_to_end(key)
+        else:
+            self._seen[key] = None
+            if len(self._seen) > self.window:
+                self._seen.popitem(last=False)
+        return hit
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0,
+            "distinct_keys": len(self._seen),
+        }
+
+
+class ImageCache:
+    """LRU of canonical key -> image URL (self-hosted /media URLs do not expire)."""
+
+    def __init__(self, max_entries: int = PROMPT_IMAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        url = self._entries.get(key)
+        if url is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return url
+
+    def put(self, key: str, url: str):
+        self._entries[key] = url
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_lock = threading.Lock()
+_key_stats = {precision: KeyStats() for precision in ("exact", *PRECISIONS)}
+_image_cache = ImageCache()
+
+
+def observe(user_data: Dict, selected_items: Dict, ai_shoe: Optional[Dict],
+            measurements: Dict, color_palette: Dict = None) -> Tuple[str, str]:
+    """
+    Key the request at every precision for the metrics and return (key, prompt)
+    at PROMPT_CACHE_PRECISION ("exact" when the cache is off).
+    """
+    active = PROMPT_CACHE_PRECISION if PROMPT_CACHE_PRECISION in PRECISIONS else "exact"
+    result = None
+    for precision in _key_stats:
+        key, prompt = canonical_prompt(user_data, selected_items, ai_shoe, measurements,
+                                       color_palette, precision)
+        with _lock:
+            _key_stats[precision].record(key)
+        if precision == active:
+            result = key, prompt
+    return result
+
+
+def image_cache_key(key: str, seed: Optional[int] = None) -> str:
+    # A seeded request must get that seed's image
+    return key if seed is None else f"{key}:{seed}"
+
+
+def cached_image(key: str, seed: Optional[int] = None) -> Optional[str]:
+    if PROMPT_CACHE_PRECISION not in PRECISIONS:
+        return None
+    with _lock:
+        return _image_cache.get(image_cache_key(key, seed))
+
+
+def store_image(key: str, url: str, seed: Optional[int] = None):
+    if PROMPT_CACHE_PRECISION not in PRECISIONS or not url:
+        return
+    with _lock:
+        _image_cache.put(image_cache_key(key, seed), url)
+
+
+def metrics() -> Dict:
+    with _lock:
+        buckets = {}
+        for precision, stats in _key_stats.items():
+            buckets[precision] = {**PRECISIONS.get(precision, {}), **stats.snapshot()}
+        return {
+            "precision": PROMPT_CACHE_PRECISION,
+            "image_cache": _image_cache.snapshot(),
+            "buckets": buckets,
+        }
+
+
+# =============================================================================
+# TESTING
+# =============================================================================
+
+if __name__ == "__main__":
+    import random
+
+    from local.local_store import load_all_items
+    from prompts import generate_ai_shoe_description
+
+    rng = random.Random(0)
+    items = load_all_items()
+    by_slot = {
+        "top": [i for i in items if i.get("category") in ("t-shirt", "shirt", "sweater", "hoodie")],
+        "pants": [i for i in items if i.get("category") in ("jeans", "trousers", "joggers")],
+        "layer": [i for i in items if i.get("category") in ("jacket", "coat", "blazer")],
+    }
+
+    # Popular outfits repeat; bodies and shoe picks vary per request
+    outfits = [{slot: rng.choice(pool) for slot, pool in by_slot.items()} for _ in range(25)]
+
+    for _ in range(10000):
+        sex = rng.choice(["male", "female"])
+        height = rng.randint(155, 195)
+        weight = rng.randint(50, 110)
+        user_data = {"sex": sex, "height": height, "weight": weight,
+                     "body_type": rng.choice(["slim", "athletic", "average"]),
+                     "style_description": rng.choice(["casual", "smart office", "street"])}
+        selected = rng.choice(outfits)
+        shoe = generate_ai_shoe_description("casual", "man" if sex == "male" else "woman",
+                                            selected["top"].get("colors", []), "SS", rng=rng)
+        observe(user_data, selected, shoe, compute_body_measurements(height, weight, sex))
+
+    for precision, stats in metrics()["buckets"].items():
+        print(f"{precision:7s} hit rate {stats['hit_rate']:.3f} ({stats['distinct_keys']} keys)")
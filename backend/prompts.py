@@ -181,7 +181,9 @@ def build_semantic_filters(keywords: dict, user_data: dict, season: str) -> dict
 
     brands = user_data.get('favorite_brands', [])
     if brands:
+        # 'brand' stays the top favorite; 'brands' keeps the full ranking for weighted picks
         filters['brand'] = brands[0].lower().replace(' ', '_')
+        filters['brands'] = [b.lower().replace(' ', '_') for b in brands]
 
     return filters
 
@@ -191,11 +193,12 @@ def build_semantic_filters(keywords: dict, user_data: dict, season: str) -> dict
 # =============================================================================
 
 def generate_ai_shoe_description(style: str, gender: str, outfit_colors: list, season: str,
-                                 body_type: str = "average") -> dict:
+                                 body_type: str = "average", rng=None) -> dict:
+    rng = rng or random
     rec = get_shoe_recommendation(body_type, style, gender)
 
-    shoe_type = random.choice(rec["shoe_types"])
-    material = random.choice(rec["materials"])
+    shoe_type = rng.choice(rec["shoe_types"])
+    material = rng.choice(rec["materials"])
 
     # Color matching
     if outfit_colors:
@@ -209,9 +212,9 @@ def generate_ai_shoe_description(style: str, gender: str, outfit_colors: list, s
         elif "white" in c or "cream" in c:
             color = "white"
         else:
-            color = random.choice(rec["colors"])
+            color = rng.choice(rec["colors"])
     else:
-        color = random.choice(rec["colors"])
+        color = rng.choice(rec["colors"])
 
     # FW = boots
     if season == "FW" and "sneaker" in shoe_type.lower():
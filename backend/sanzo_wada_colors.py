@@ -279,14 +279,84 @@ SANZO_WADA_PALETTES = {
 _recent_palettes = []
 _MAX_RECENT = 5
 
+# =============================================================================
+# KEYWORD INDEX (built once at import)
+# =============================================================================
+# Scoring is per (style keyword, palette keyword) pair:
+#   +2 if one contains the other, else +1 if a word of the style keyword is inside it.
+# Postings count each palette keyword per palette, so sums match the old pairwise loops.
+
+def _build_keyword_index() -> Tuple[Dict[str, Dict[str, int]], Dict[str, set]]:
+    """
+    palette keyword -> {palette key: occurrences}, and every substring (including "")
+    -> the palette keywords containing it.
+    """
+    postings: Dict[str, Dict[str, int]] = {}
+    for palette_key, palette in SANZO_WADA_PALETTES.items():
+        for palette_keyword in palette["keywords"]:
+            counts = postings.setdefault(palette_keyword, {})
+            counts[palette_key] = counts.get(palette_key, 0) + 1
+
+    substrings: Dict[str, set] = {}
+    for palette_keyword in postings:
+        for start in range(len(palette_keyword) + 1):
+            for end in range(start, len(palette_keyword) + 1):
+                substrings.setdefault(palette_keyword[start:end], set()).add(palette_keyword)
+
+    return postings, substrings
+
+
+_KEYWORD_POSTINGS, _SUBSTRING_INDEX = _build_keyword_index()
+_MAX_PALETTE_KEYWORD_LEN = max(map(len, _KEYWORD_POSTINGS), default=0)
+
+# Style keywords come from a small extracted vocabulary; scores are cached per keyword
+_keyword_score_cache: Dict[str, Dict[str, int]] = {}
+_MAX_CACHED_KEYWORDS = 4096
+
+
+def _palette_keywords_inside(keyword: str) -> set:
+    """Palette keywords that are substrings of keyword."""
+    found = set()
+    for start in range(len(keyword) + 1):
+        for end in range(start, min(len(keyword), start + _MAX_PALETTE_KEYWORD_LEN) + 1):
+            if keyword[start:end] in _KEYWORD_POSTINGS:
+                found.add(keyword[start:end])
+    return found
+
+
+def _keyword_scores(keyword: str) -> Dict[str, int]:
+    """palette key -> score contributed by one lowercased style keyword."""
+    cached = _keyword_score_cache.get(keyword)
+    if cached is not None:
+        return cached
+
+    full = _SUBSTRING_INDEX.get(keyword, set()) | _palette_keywords_inside(keyword)
+    partial = set()
+    for word in keyword.split():
+        partial |= _SUBSTRING_INDEX.get(word, set())
+
+    scores: Dict[str, int] = {}
+    for palette_keyword, points in [(k, 2) for k in full] + [(k, 1) for k in partial - full]:
+        for palette_key, count in _KEYWORD_POSTINGS[palette_keyword].items():
+            scores[palette_key] = scores.get(palette_key, 0) + points * count
+
+    if len(_keyword_score_cache) >= _MAX_CACHED_KEYWORDS:
+        _keyword_score_cache.clear()
+    _keyword_score_cache[keyword] = scores
+    return scores
+
+
 def get_palettes_for_season(season: str) -> Dict[str, dict]:
     """Filters palettes by season."""
     return {k: v for k, v in SANZO_WADA_PALETTES.items() if v["season"] == season}
 
-def match_palette_to_keywords(style_keywords: List[str], season: str, avoid_recent: bool = True) -> dict:
+def match_palette_to_keywords(style_keywords: List[str], season: str, avoid_recent: bool = True,
+                              rng=None) -> dict:
     """
     Enhanced matching with diversity - avoids recently used palettes.
+    rng: per-request random.Random for reproducible tie-breaking (global RNG if None).
     """
+    rng = rng or random
     seasonal_palettes = get_palettes_for_season(season)
 
     if not seasonal_palettes:
@@ -299,37 +369,32 @@ def match_palette_to_keywords(style_keywords: List[str], season: str, avoid_rece
         if available:
             seasonal_palettes = available
 
-    # Score each palette based on keyword matches
-    scored_palettes = []
+    # Sum keyword postings, then one pass over the candidates
+    keyword_scores: Dict[str, int] = {}
+    for keyword in style_keywords:
+        for palette_key, points in _keyword_scores(keyword.lower()).items():
+            keyword_scores[palette_key] = keyword_scores.get(palette_key, 0) + points
+    style_text = ' '.join(style_keywords).lower()
+
+    # Ties on the best score go to the highest random draw: a uniform pick that
+    # draws rng.random() once per candidate in order, as the old sort key did,
+    # so seeded requests keep their palettes
+    best = None
     for palette_key, palette in seasonal_palettes.items():
-        score = 0
-        # Exact keyword matches
-        for keyword in style_keywords:
-            keyword_lower = keyword.lower()
-            for palette_keyword in palette["keywords"]:
-                if keyword_lower in palette_keyword or palette_keyword in keyword_lower:
-                    score += 2  # Exact match gets higher score
-                elif any(word in palette_keyword for word in keyword_lower.split()):
-                    score += 1  # Partial match
-
+        score = keyword_scores.get(palette_key, 0)
         # Bonus for mood match
-        if any(mood in ' '.join(style_keywords).lower()
-               for mood in [palette["mood"]]):
+        if palette["mood"] in style_text:
             score += 3
+        rank = (score, rng.random())
+        if best is None or rank > best[0]:
+            best = (rank, palette_key, palette)
 
-        scored_palettes.append((score, palette_key, palette))
-
-    # Sort by score, then add randomness for variety
-    scored_palettes.sort(key=lambda x: (x[0], random.random()), reverse=True)
-
-    # Get top matches
-    if scored_palettes and scored_palettes[0][0] > 0:
+    if best[0][0] > 0:
         # Use top scored palette
-        selected = scored_palettes[0][2]
-        palette_key = scored_palettes[0][1]
+        palette_key, selected = best[1], best[2]
     else:
         # No matches - pick random to ensure variety
-        palette_key = random.choice(list(seasonal_palettes.keys()))
+        palette_key = rng.choice(list(seasonal_palettes.keys()))
         selected = seasonal_palettes[palette_key]
 
     # Track usage
@@ -339,11 +404,13 @@ def match_palette_to_keywords(style_keywords: List[str], season: str, avoid_rece
 
     return selected
 
-def get_two_color_palettes(style_keywords: List[str]) -> Tuple[dict, dict]:
+def get_two_color_palettes(style_keywords: List[str], rng=None, avoid_recent: bool = True) -> Tuple[dict, dict]:
     """
     Returns TWO different palettes for current season with enhanced diversity.
     Primary for outfit, alternative for tips.
+    Seeded requests should pass avoid_recent=False: recent-palette tracking is process state.
     """
+    rng = rng or random
     current_season = get_current_season()
     seasonal_palettes = get_palettes_for_season(current_season)
 
@@ -352,7 +419,7 @@ def get_two_color_palettes(style_keywords: List[str]) -> Tuple[dict, dict]:
         return all_palettes[0], all_palettes[1]
 
     # Get primary palette with diversity
-    primary = match_palette_to_keywords(style_keywords, current_season, avoid_recent=True)
+    primary = match_palette_to_keywords(style_keywords, current_season, avoid_recent=avoid_recent, rng=rng)
 
     # Get alternative - must be different name AND different mood
     alternative_options = [
@@ -369,7 +436,7 @@ def get_two_color_palettes(style_keywords: List[str]) -> Tuple[dict, dict]:
 
     if alternative_options:
         # Add randomness to alternative selection
-        alternative = random.choice(alternative_options)
+        alternative = rng.choice(alternative_options)
     else:
         alternative = primary
 
@@ -0,0 +1,257 @@
+"""
+Local stand-ins for the OpenAI and Together APIs used by llm_service.
+
+Implements the subset the pipeline calls:
+    POST /v1/chat/completions      (OpenAI chat completions)
+    POST /v1/images/generations    (Together / Flux image generation)
+    GET  /stub-images/{key}.png    (the image URLs returned above)
+
+Payloads are deterministic functions of the request (same prompt -> same
+keywords, tips and image). Latency, error rate and 429 rate limiting are
+configurable per API through env vars or POST /stub/config at runtime.
+
+Run:   python stub_servers.py [--port 8100]
+Use:   USE_STUB_APIS=1 uvicorn main:app   (or OPENAI_BASE_URL / TOGETHER_BASE_URL)
+
+Latency specs: "fixed:MS", "uniform:MIN_MS,MAX_MS", "lognormal:MEDIAN_MS,SIGMA".
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+APIS = ("openai", "together")
+
+DEFAULTS = {
+    "openai": {"latency": "lognormal:1200,0.35", "error_rate": 0.0, "rate_limit_rate": 0.0, "retry_after": 1},
+    "together": {"latency": "lognormal:2500,0.3", "error_rate": 0.0, "rate_limit_rate": 0.0, "retry_after": 2},
+}
+
+STYLE_WORDS = ["casual", "sporty", "smart", "elegant", "street", "urban", "grunge", "classy", "formal", "minimal"]
+COLOR_WORDS = ["black", "white", "navy", "grey", "beige", "olive", "burgundy", "brown", "blue", "green", "cream"]
+TIPS = [
+    "Tuck the top loosely to define the waist. Roll the sleeves once for a relaxed finish.",
+    "Keep the layer open to lengthen the silhouette. Let the shoes pick up the darkest tone.",
+    "Balance the volume: fitted on top, straight below. One accent color is enough.",
+    "Match belt and shoes for a cleaner line. Push the jacket sleeves up slightly.",
+]
+
+
+def _env_config(api: str) -> Dict:
+    prefix = f"STUB_{api.upper()}_"
+    config = dict(DEFAULTS[api])
+    config["latency"] = os.getenv(prefix + "LATENCY", config["latency"])
+    config["error_rate"] = float(os.getenv(prefix + "ERROR_RATE", config["error_rate"]))
+    config["rate_limit_rate"] = float(os.getenv(prefix + "RATE_LIMIT_RATE", config["rate_limit_rate"]))
+    config["retry_after"] = int(os.getenv(prefix + "RETRY_AFTER", config["retry_after"]))
+    return config
+
+
+def parse_latency(spec: str):
+    """Latency spec -> function(rng) returning seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values[0], values[1] if len(values) > 1 else 0.3
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+def digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class StubState:
+    """Per-API config, fault injection RNG and counters."""
+
+    def __init__(self, seed: int = 0):
+        self._lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.config = {api: _env_config(api) for api in APIS}
+        self.latency = {api: parse_latency(self.config[api]["latency"]) for api in APIS}
+        self.stats = {api: {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0} for api in APIS}
+
+    def update(self, api: str, values: Dict):
+        with self._lock:
+            config = dict(self.config[api], **values)
+            self.latency[api] = parse_latency(config["latency"])
+            self.config[api] = config
+
+    def draw(self, api: str):
+        """(delay seconds, outcome) with outcome in ok / error / rate_limited."""
+        with self._lock:
+            config = self.config[api]
+            delay = self.latency[api](self.rng)
+            roll = self.rng.random()
+            if roll < config["rate_limit_rate"]:
+                outcome = "rate_limited"
+            elif roll < config["rate_limit_rate"] + config["error_rate"]:
+                outcome = "error"
+            else:
+                outcome = "ok"
+            self.stats[api]["requests"] += 1
+            self.stats[api][{"ok": "ok", "error": "errors", "rate_limited": "rate_limited"}[outcome]] += 1
+            return delay, outcome
+
+
+state = StubState(int(os.getenv("STUB_SEED", "0")))
+app = FastAPI(title="OpenAI / Together stand-ins", version="1.0.0")
+
+
+async def inject_faults(api: str) -> Optional[JSONResponse]:
+    delay, outcome = state.draw(api)
+    if outcome == "rate_limited":
+        # Rejected fast, as the real APIs do
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(state.config[api]["retry_after"])},
+            content={"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}}
+        )
+
+    await asyncio.sleep(delay)
+    if outcome == "error":
+        return JSONResponse(status_code=500, content={"error": {"message": "Internal error (stub)", "type": "server_error"}})
+    return None
+
+
+# =============================================================================
+# CANNED PAYLOADS
+# =============================================================================
+
+def style_keywords_payload(prompt: str) -> Dict:
+    """Keywords the real model would plausibly extract, from words in the prompt."""
+    match = re.search(r'Extract keywords from: "(.*?)"', prompt, re.S)
+    text = (match.group(1) if match else prompt).lower()
+    key = int(digest(prompt)[:8], 16)
+
+    styles = [w for w in STYLE_WORDS if w in text] or [STYLE_WORDS[key % len(STYLE_WORDS)]]
+    colors = [w for w in COLOR_WORDS if w in text] or [COLOR_WORDS[key % len(COLOR_WORDS)]]
+    return {"style_keywords": styles[:3], "color_preferences": colors[:3]}
+
+
+def chat_content(messages) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if "json" in system.lower():
+        return json.dumps(style_keywords_payload(user))
+    return TIPS[int(digest(user)[:8], 16) % len(TIPS)]
+
+
+def stub_png(key: str, width: int, height: int) -> bytes:
+    """Solid-color PNG derived from key (Pillow only needed for this route)."""
+    from PIL import Image
+
+    color = tuple(int(key[i:i + 2], 16) for i in (0, 2, 4))
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# =============================================================================
+# ROUTES
+# =============================================================================
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await inject_faults("openai")
+    if failure is not None:
+        return failure
+
+    messages = body.get("messages", [])
+    content = chat_content(messages)
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+
+    return {
+        "id": "chatcmpl-stub-" + digest(json.dumps(messages, sort_keys=True))[:24],
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-5-mini"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content.split()),
+            "total_tokens": prompt_tokens + len(content.split())
+        }
+    }
+
+
+@app.post("/v1/images/generations")
+async def images_generations(request: Request):
+    body = await request.json()
+    failure = await inject_faults("together")
+    if failure is not None:
+        return failure
+
+    width, height = int(body.get("width", 768)), int(body.get("height", 1024))
+    key = digest(json.dumps([body.get("prompt"), body.get("seed"), width, height, body.get("steps")]))
+    base = str(request.base_url).rstrip("/")
+
+    return {
+        "id": "img-stub-" + key[:24],
+        "model": body.get("model", "black-forest-labs/FLUX.1-schnell"),
+        "object": "list",
+        "data": [
+            {"index": i, "url": f"{base}/stub-images/{key}.png?w={width}&h={height}"}
+            for i in range(int(body.get("n", 1)))
+        ]
+    }
+
+
+@app.get("/stub-images/{key}.png")
+async def stub_image(key: str, w: int = 768, h: int = 1024):
+    if not re.fullmatch(r"[0-9a-f]{40}", key):
+        return JSONResponse(status_code=404, content={"error": "unknown image"})
+    data = await asyncio.to_thread(stub_png, key, min(w, 2048), min(h, 2048))
+    return Response(content=data, media_type="image/png")
+
+
+@app.get("/stub/config")
+async def get_config():
+    return {"config": state.config, "stats": state.stats}
+
+
+@app.post("/stub/config/{api}")
+async def set_config(api: str, request: Request):
+    """Change latency / error_rate / rate_limit_rate / retry_after of one API at runtime."""
+    if api not in APIS:
+        return JSONResponse(status_code=404, content={"error": f"unknown api '{api}'"})
+    values = await request.json()
+    try:
+        state.update(api, {k: v for k, v in values.items() if k in DEFAULTS[api]})
+    except (ValueError, IndexError) as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"config": state.config[api]}
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the OpenAI / Together stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port)